@@ -1,8 +1,10 @@
+import argparse
 import sys
-import clang.cindex as cl
 
-# M1/M2/M3 mac 基本都是这个路径：
-cl.Config.set_library_file("/opt/homebrew/opt/llvm/lib/libclang.dylib")
+# clang.cindex 在用到的函数里才 import；libclang 的位置第一次创建 Index 时才查找
+# （环境变量 / pip 包 / 磁盘缓存 / 常见安装目录），见 translator/frontend/libclang.py
+from translator.frontend.libclang import create_index
+from translator.frontend.selection import PARSE_NONE, PARSE_PROFILES, FunctionSelection, select_functions
 
 # 简单的类型映射：C++ -> Carbon
 def map_cxx_type_to_carbon(cxx_type: str) -> str:
@@ -25,24 +27,25 @@ def get_source_text(node) -> str:
 
 def emit_expr(node) -> str:
     """根据 AST 节点生成 Carbon 表达式（极简版，只处理常见几种）。"""
+    from clang.cindex import CursorKind
     kind = node.kind
 
     # 变量引用
-    if kind == cl.CursorKind.DECL_REF_EXPR:
+    if kind == CursorKind.DECL_REF_EXPR:
         return node.spelling
 
     # 字面量（整数）
-    if kind == cl.CursorKind.INTEGER_LITERAL:
+    if kind == CursorKind.INTEGER_LITERAL:
         # 对于 literal，直接用 token 文本
         return get_source_text(node)
 
     # 二元运算：a + b / a * b 等
-    if kind == cl.CursorKind.BINARY_OPERATOR:
+    if kind == CursorKind.BINARY_OPERATOR:
         # 简单起见：直接用 token 拼接，实际工程可以改成递归解析左右子树
         return get_source_text(node)
 
     # 一元运算、函数调用等，可以按需要扩展
-    if kind == cl.CursorKind.CALL_EXPR:
+    if kind == CursorKind.CALL_EXPR:
         return get_source_text(node)
 
     # 兜底：直接输出 token 文本
@@ -65,15 +68,16 @@ def emit_var_decl_from_cursor(node, indent: int = 0) -> str:
 
 def emit_stmt(node, indent: int = 0) -> list[str]:
     """根据语句节点生成一到多行 Carbon 代码（返回 list）。"""
+    from clang.cindex import CursorKind
     ind = "    " * indent
     kind = node.kind
     lines: list[str] = []
 
     # 1. 声明语句：int x = 1; int y = 2; 这一类
-    if kind == cl.CursorKind.DECL_STMT:
+    if kind == CursorKind.DECL_STMT:
         # 里面通常包着一个或多个 VAR_DECL
         for child in node.get_children():
-            if child.kind == cl.CursorKind.VAR_DECL:
+            if child.kind == CursorKind.VAR_DECL:
                 lines.append(emit_var_decl_from_cursor(child, indent))
             else:
                 # 其他声明，也可以递归处理
@@ -81,12 +85,12 @@ def emit_stmt(node, indent: int = 0) -> list[str]:
         return lines
 
     # 2. 单个 VAR_DECL（有些场景可能直接出现）
-    if kind == cl.CursorKind.VAR_DECL:
+    if kind == CursorKind.VAR_DECL:
         lines.append(emit_var_decl_from_cursor(node, indent))
         return lines
 
     # 3. return 语句
-    if kind == cl.CursorKind.RETURN_STMT:
+    if kind == CursorKind.RETURN_STMT:
         children = list(node.get_children())
         if children:
             ret_expr = emit_expr(children[0])
@@ -96,7 +100,7 @@ def emit_stmt(node, indent: int = 0) -> list[str]:
         return lines
 
     # 4. 表达式语句：形如 `z = add(x, y);`
-    if kind == cl.CursorKind.EXPR_STMT:
+    if kind == CursorKind.EXPR_STMT:
         # 取唯一子节点作为表达式
         children = list(node.get_children())
         if children:
@@ -105,13 +109,13 @@ def emit_stmt(node, indent: int = 0) -> list[str]:
         return lines
 
     # 5. 直接把某些表达式当语句（兜底）
-    if kind in (cl.CursorKind.BINARY_OPERATOR, cl.CursorKind.CALL_EXPR):
+    if kind in (CursorKind.BINARY_OPERATOR, CursorKind.CALL_EXPR):
         expr = emit_expr(node)
         lines.append(f"{ind}{expr};")
         return lines
 
     # 6. 复合语句（代码块），由 emit_compound_stmt 统一处理，这里不直接输出
-    if kind == cl.CursorKind.COMPOUND_STMT:
+    if kind == CursorKind.COMPOUND_STMT:
         return []
 
     # 7. 其他暂不支持的语句
@@ -134,13 +138,14 @@ def emit_compound_stmt(node, indent: int = 0) -> str:
 
 def emit_function(node) -> str:
     """把一个 C++ 函数定义翻译成 Carbon fn。"""
+    from clang.cindex import CursorKind
     func_name = node.spelling
     ret_type = map_cxx_type_to_carbon(node.result_type.spelling)
 
     # 处理参数
     params = []
     for c in node.get_children():
-        if c.kind == cl.CursorKind.PARM_DECL:
+        if c.kind == CursorKind.PARM_DECL:
             p_name = c.spelling
             p_type = map_cxx_type_to_carbon(c.type.spelling)
             params.append(f"{p_name}: {p_type}")
@@ -150,7 +155,7 @@ def emit_function(node) -> str:
     # 查找函数体
     body = None
     for c in node.get_children():
-        if c.kind == cl.CursorKind.COMPOUND_STMT:
+        if c.kind == CursorKind.COMPOUND_STMT:
             body = c
             break
 
@@ -165,35 +170,57 @@ def emit_function(node) -> str:
     return header + "\n" + body_str + "\n" + footer
 
 
-def translate_cpp_to_carbon(filename: str) -> str:
-    """主入口：解析一个 C++ 文件，输出 Carbon 源码字符串。"""
-    index = cl.Index.create()
-    tu = index.parse(filename, args=["-std=c++14"])
+# 头文件里的函数体跳过不解析
+FAST_PARSE_OPTIONS = PARSE_PROFILES["fast"].options
 
-    carbon_funcs = []
 
-    for cursor in tu.cursor.get_children():
-        # 只处理最外层的函数定义
-        if cursor.kind == cl.CursorKind.FUNCTION_DECL and cursor.is_definition():
-            carbon_code = emit_function(cursor)
-            carbon_funcs.append(carbon_code)
+def translate_cpp_to_carbon(filename: str, names=None, pattern: str | None = None,
+                            main_file_only: bool = True, fast: bool = False) -> str:
+    """
+    主入口：解析一个 C++ 文件，输出 Carbon 源码字符串。
+    names / pattern 只翻译指定的函数（按名字 / 正则全匹配），main_file_only 跳过头文件里的定义。
+    """
+    return "\n\n".join(iter_cpp_to_carbon(filename, names, pattern, main_file_only, fast))
 
-    return "\n\n".join(carbon_funcs)
 
+def write_cpp_to_carbon(filename: str, out, **kwargs) -> int:
+    """流式写出：翻译完一个函数就写一个，不在内存里攒整个文件。返回函数个数。"""
+    n = 0
+    for code in iter_cpp_to_carbon(filename, **kwargs):
+        if n:
+            out.write("\n\n")
+        out.write(code)
+        n += 1
+    return n
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python translator.py <source.cpp>")
-        sys.exit(1)
 
-    src_file = sys.argv[1]
-    carbon_code = translate_cpp_to_carbon(src_file)
+def iter_cpp_to_carbon(filename: str, names=None, pattern: str | None = None,
+                       main_file_only: bool = True, fast: bool = False):
+    """按源码顺序逐个产出函数的 Carbon 代码。"""
+    index = create_index()
+    options = FAST_PARSE_OPTIONS if fast else PARSE_NONE
+    tu = index.parse(filename, args=["-std=c++14"], options=options)
+    # 和 IR 前端用同一套函数选择（最外层的函数定义，按名字 / 正则 / 主文件过滤）
+    selection = FunctionSelection.of(names or (), pattern, main_file_only=main_file_only)
+    for cursor in select_functions(tu, selection):
+        yield emit_function(cursor)
 
-    out_file = "output.carbon"
-    with open(out_file, "w", encoding="utf-8") as f:
-        f.write(carbon_code)
 
-    print(f"Carbon code written to: {out_file}")
+def main():
+    ap = argparse.ArgumentParser(description="Translate one C++ file to Carbon")
+    ap.add_argument("source")
+    ap.add_argument("-o", "--output", default="output.carbon",
+                    help="output file (default: output.carbon in the current directory, '-' for stdout)")
+    ns = ap.parse_args()
+
+    if ns.output == "-":
+        write_cpp_to_carbon(ns.source, sys.stdout)
+        sys.stdout.write("\n")
+        return
+    with open(ns.output, "w", encoding="utf-8") as f:
+        write_cpp_to_carbon(ns.source, f)
+
+    print(f"Carbon code written to: {ns.output}")
 
 
 
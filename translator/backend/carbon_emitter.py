@@ -1,4 +1,13 @@
+from typing import Callable, Iterator, TextIO
+
 from translator.ir.nodes import *
+from translator.ir.flat import (
+    BIN_OPS, UN_OPS, LITERAL, VAR, BINARY, UNARY,
+    S_EXPR, S_VARDECL, S_ASSIGN, S_RETURN, S_IF, S_WHILE, S_BLOCK,
+    FlatFunction, expr_refcounts,
+)
+from translator.ir.hashcons import shared_exprs
+from translator.ir.passes import FunctionPass
 from translator.ir.types import Type
 from translator.backend.ruleset import RuleSet
 
@@ -11,15 +20,31 @@ BIN_OP = {
 
 UN_OP = { UnOp.NOT: "not" }
 
+# 缩进字符串缓存：_PADS[k] == "  " * k；_NL_PADS[k] 前面多一个换行（缓冲模式每行的开头）
+_PADS: list[str] = [""]
+_NL_PADS: list[str] = ["\n"]
+
+def _pad(indent: int) -> str:
+    while len(_PADS) <= indent:
+        _PADS.append(_PADS[-1] + "  ")
+        _NL_PADS.append("\n" + _PADS[-1])
+    return _PADS[indent]
+
+def _nl_pad(indent: int) -> str:
+    _pad(indent)
+    return _NL_PADS[indent]
+
+# 缓冲模式下攒够这么多片段才写一次 out
+_FLUSH_FRAGMENTS = 4096
+
 def emit_var(emitter, expr):
     return expr.name
 
 def emit_blockstmt(emitter, stmt: BlockStmt, indent: int) -> list[str]:
-    pad = "  " * indent
+    pad = _pad(indent)
     lines = [f"{pad}{{"]
     for s in stmt.block.stmts:
-        fn = emitter.rules.stmt(s)
-        lines += fn(emitter, s, indent + 1)
+        lines += emitter.stmt_rule(s)(emitter, s, indent + 1)
     lines.append(f"{pad}}}")
     return lines
     
@@ -34,37 +59,40 @@ def emit_cast(emitter, expr):
     return f"({inner}) as {emitter.emit_type(expr.to_ty)}"
 
 def emit_literal(emitter, expr):
-    if expr.ty.kind == "bool":
-        return "true" if bool(expr.value) else "false"
-    if expr.ty.kind == "int":
-        return str(int(expr.value))
-    if expr.ty.kind == "float":
-        return str(float(expr.value))
-    raise NotImplementedError(f"Literal type not supported: {expr.ty}")
+    return _literal_code(expr.ty, expr.value)
+
+def _literal_code(ty: Type, value) -> str:
+    if ty.kind == "bool":
+        return "true" if bool(value) else "false"
+    if ty.kind == "int":
+        return str(int(value))
+    if ty.kind == "float":
+        return str(float(value))
+    raise NotImplementedError(f"Literal type not supported: {ty}")
 
 def emit_vardecl(emitter, stmt, indent):
-    pad = "  " * indent
+    pad = _pad(indent)
     if stmt.init is None:
         return [f"{pad}var {stmt.var.name}: {emitter.emit_type(stmt.var.ty)};"]
     return [f"{pad}var {stmt.var.name}: {emitter.emit_type(stmt.var.ty)} = {emitter.emit_expr(stmt.init)};"]
 
 def emit_assign(emitter, stmt, indent):
-    pad = "  " * indent
+    pad = _pad(indent)
     return [f"{pad}{stmt.target.name} = {emitter.emit_expr(stmt.value)};"]
 
 def emit_return(emitter, stmt, indent):
-    pad = "  " * indent
+    pad = _pad(indent)
     return [f"{pad}return {emitter.emit_expr(stmt.value)};"]
 
 def emit_while(emitter, stmt, indent):
-    pad = "  " * indent
+    pad = _pad(indent)
     lines = [f"{pad}while ({emitter.emit_expr(stmt.cond)}) {{"]
     lines += emitter.emit_block(stmt.body, indent + 1)
     lines.append(f"{pad}}}")
     return lines
 
 def emit_if(emitter, stmt, indent):
-    pad = "  " * indent
+    pad = _pad(indent)
     lines = [f"{pad}if ({emitter.emit_expr(stmt.cond)}) {{"]
     lines += emitter.emit_block(stmt.then_body, indent + 1)
     if stmt.else_body is None:
@@ -76,36 +104,182 @@ def emit_if(emitter, stmt, indent):
     return lines
 
 def emit_exprstmt(emitter, stmt: ExprStmt, indent: int) -> list[str]:
-    pad = "  " * indent
+    pad = _pad(indent)
     return [f"{pad}{emitter.emit_expr(stmt.expr)};"]
 
 class CarbonEmitter:
-    def __init__(self, rules: RuleSet):
+    def __init__(self, rules: RuleSet, buffered: bool = True, dag: bool = False):
+        """
+        buffered=True（默认）时 emit_function / write_function 把代码直接追加进一个
+        复用的片段缓冲，默认规则的语句就地写入，不再给每条语句 / 每个块建列表；
+        overlay 换掉的语句规则照常调用（签名不变），返回的行再写进缓冲。
+        buffered=False 是原来的按行拼列表的路径。
+        dag: 同 PassManager，IR 经过 hash-consing 时打开，先扫一遍找出共享子树，
+        它们的代码在整个函数内保留；普通的树不需要这次扫描。
+        """
         self.rules = rules
+        self.buffered = buffered
+        self.dag = dag
+        # 编译好的分派表；每个节点的规则查找只剩一次 dict 查询
+        self.dispatch = rules.compile()
+        self.expr_rule = self.dispatch.expr
+        self.stmt_rule = self.dispatch.stmt
+        # 缓冲模式：语句的具体类 -> 写入函数（默认规则的就地版本，或包装自定义规则）
+        self._writers: dict[type, Callable[[CarbonEmitter, Stmt, int], None]] = {}
+        self._buf: list[str] = []
+        self._out: TextIO | None = None
+        # id(node) -> (node, 代码)：非递归 emit_expr 时子表达式的结果
+        self._expr_memo: dict[int, tuple[Expr, str]] = {}
+        self._in_expr = False
+        # 当前函数里被多处引用的表达式（hash-consing 后的 DAG），它们的代码在整个函数内保留
+        self._shared: set[int] = set()
     
     def emit_function(self, fn: Function) -> str:
+        if not self.buffered:
+            return "\n".join(self.iter_function(fn))
+        buf = self._buf
+        try:
+            self._write_function(fn)
+            return "".join(buf)
+        finally:
+            buf.clear()
+
+    def write_function(self, fn: Function, out: TextIO) -> None:
+        """把一个函数的代码写进 out（不带结尾换行）；缓冲满了才 write，不按语句 / 行做 I/O。"""
+        buf = self._buf
+        self._out = out
+        try:
+            self._write_function(fn)
+            out.write("".join(buf))
+        finally:
+            buf.clear()
+            self._out = None
+
+    # ---- 缓冲模式 ----
+
+    def _write_function(self, fn: Function) -> None:
+        buf = self._buf
+        out = self._out
+        params = ", ".join(f"{p.name}: {self.emit_type(p.ty)}" for p in fn.params)
+        buf.append(f"fn {fn.name}({params}) -> {self.emit_type(fn.ret_ty)} {{")
+        if self.dag:
+            self._shared = shared_exprs(fn)
+        try:
+            for stmt in fn.body.stmts:
+                self._write_stmt(stmt, 1)
+                if out is not None and len(buf) >= _FLUSH_FRAGMENTS:
+                    out.write("".join(buf))
+                    buf.clear()
+        finally:
+            self._shared = set()
+            self._expr_memo.clear()
+        buf.append("\n}")
+
+    def _write_block(self, stmts, indent: int) -> None:
+        for stmt in stmts:
+            self._write_stmt(stmt, indent)
+
+    def _write_stmt(self, stmt: Stmt, indent: int) -> None:
+        writer = self._writers.get(type(stmt))
+        if writer is None:
+            writer = self._bind_writer(stmt)
+        writer(self, stmt, indent)
+
+    def _bind_writer(self, stmt: Stmt):
+        rule = self.stmt_rule(stmt)
+        writer = _STREAM_WRITERS.get(rule)
+        if writer is None:
+            # 自定义规则：按原签名拿到行，再写进缓冲
+            def writer(em: CarbonEmitter, s: Stmt, indent: int) -> None:
+                buf = em._buf
+                for line in rule(em, s, indent):
+                    buf.append("\n")
+                    buf.append(line)
+        self._writers[type(stmt)] = writer
+        return writer
+
+    def iter_function(self, fn: Function) -> Iterator[str]:
+        """按行产出一个函数的 Carbon 代码，每条顶层语句 emit 完就交出去。"""
         params = ", ".join(
             f"{p.name}: {self.emit_type(p.ty)}" for p in fn.params
         )
-        lines = [f"fn {fn.name}({params}) -> {self.emit_type(fn.ret_ty)} {{"]
-        lines += self.emit_block(fn.body, indent=1)
-        lines.append("}")
-        return "\n".join(lines)
+        yield f"fn {fn.name}({params}) -> {self.emit_type(fn.ret_ty)} {{"
+        if self.dag:
+            self._shared = shared_exprs(fn)
+        try:
+            for stmt in fn.body.stmts:
+                yield from self.stmt_rule(stmt)(self, stmt, 1)
+        finally:
+            self._shared = set()
+            self._expr_memo.clear()
+        yield "}"
     
     def emit_block(self, block, indent):
         lines = []
         for stmt in block.stmts:
-            fn = self.rules.stmt(stmt)
-            print(fn)
-            lines += fn(self, stmt, indent)
+            lines += self.stmt_rule(stmt)(self, stmt, indent)
         return lines
 
     def emit_expr(self, expr: Expr) -> str:
+        # 规则（emit_binary 等）照旧调用 emitter.emit_expr(子节点)；
+        # 这里先用显式栈把子树按后序全部 emit 进 memo，规则再取子节点时直接命中，
+        # 所以调用深度和表达式嵌套深度无关。
+        memo = self._expr_memo
+        shared = self._shared
+        expr_rule = self.expr_rule
+        hit = memo.get(id(expr))
+        if hit is not None and hit[0] is expr:
+            return hit[1]
+
+        top = not self._in_expr
+        self._in_expr = True
         try:
-            fn = self.rules.expr(expr)
-        except KeyError:
-            raise NotImplementedError(f"No expr emitter for {type(expr).__name__}")
-        return fn(self, expr)
+            stack: list[tuple[Expr, bool]] = [(expr, False)]
+            while stack:
+                node, expanded = stack.pop()
+                if not expanded:
+                    hit = memo.get(id(node))
+                    if hit is not None and hit[0] is node:
+                        continue
+                    kids = expr_children(node)
+                    if kids:
+                        stack.append((node, True))
+                        for k in reversed(kids):
+                            stack.append((k, False))
+                        continue
+                code = expr_rule(node)(self, node)
+                if expanded:
+                    # 父节点拼好后子节点的字符串就没用了，及时丢掉，
+                    # 否则一条很深的链会把每一层的中间结果都留在内存里；
+                    # 共享子树例外，后面还会再用到
+                    for k in expr_children(node):
+                        if id(k) not in shared:
+                            memo.pop(id(k), None)
+                memo[id(node)] = (node, code)
+            return memo[id(expr)][1]
+        finally:
+            if top:
+                if not shared:
+                    memo.clear()
+                elif id(expr) not in shared:
+                    memo.pop(id(expr), None)
+                self._in_expr = False
+
+    def emit_flat_function(self, ff: FlatFunction) -> str:
+        return "\n".join(self.iter_flat_function(ff))
+
+    def iter_flat_function(self, ff: FlatFunction) -> Iterator[str]:
+        """
+        直接在 FlatFunction 上 emit，输出和 emit_function(ff.to_function()) 相同。
+        默认规则走数组上的快路径；某类节点的规则被 overlay 换掉时，
+        只把那个节点转回对象 IR 交给规则处理。
+        """
+        params = ", ".join(
+            f"{ff.names[n]}: {self.emit_type(ff.types[t])}" for n, t in ff.params
+        )
+        yield f"fn {ff.name}({params}) -> {self.emit_type(ff.ret_ty)} {{"
+        yield from _FlatEmit(self, ff).block(0, 1)
+        yield "}"
 
     def emit_type(self, ty: Type) -> str:
         if ty.kind == "int" and ty.bits == 32:
@@ -120,4 +294,216 @@ class CarbonEmitter:
     def emit_unary_op(self, op: UnOp) -> str:
         return UN_OP[op]
 
-    
+
+# ---- 缓冲模式下默认语句规则的就地版本（输出和对应的 emit_* 完全一致） ----
+
+def _write_vardecl(em: CarbonEmitter, stmt: VarDecl, indent: int) -> None:
+    head = f"{_nl_pad(indent)}var {stmt.var.name}: {em.emit_type(stmt.var.ty)}"
+    em._buf.append(f"{head};" if stmt.init is None else f"{head} = {em.emit_expr(stmt.init)};")
+
+def _write_assign(em: CarbonEmitter, stmt: Assign, indent: int) -> None:
+    em._buf.append(f"{_nl_pad(indent)}{stmt.target.name} = {em.emit_expr(stmt.value)};")
+
+def _write_return(em: CarbonEmitter, stmt: Return, indent: int) -> None:
+    em._buf.append(f"{_nl_pad(indent)}return {em.emit_expr(stmt.value)};")
+
+def _write_exprstmt(em: CarbonEmitter, stmt: ExprStmt, indent: int) -> None:
+    em._buf.append(f"{_nl_pad(indent)}{em.emit_expr(stmt.expr)};")
+
+def _write_if(em: CarbonEmitter, stmt: If, indent: int) -> None:
+    nl = _nl_pad(indent)
+    em._buf.append(f"{nl}if ({em.emit_expr(stmt.cond)}) {{")
+    em._write_block(stmt.then_body.stmts, indent + 1)
+    if stmt.else_body is not None:
+        em._buf.append(f"{nl}}} else {{")
+        em._write_block(stmt.else_body.stmts, indent + 1)
+    em._buf.append(f"{nl}}}")
+
+def _write_while(em: CarbonEmitter, stmt: While, indent: int) -> None:
+    nl = _nl_pad(indent)
+    em._buf.append(f"{nl}while ({em.emit_expr(stmt.cond)}) {{")
+    em._write_block(stmt.body.stmts, indent + 1)
+    em._buf.append(f"{nl}}}")
+
+def _write_blockstmt(em: CarbonEmitter, stmt: BlockStmt, indent: int) -> None:
+    nl = _nl_pad(indent)
+    em._buf.append(f"{nl}{{")
+    em._write_block(stmt.block.stmts, indent + 1)
+    em._buf.append(f"{nl}}}")
+
+# 默认规则 -> 就地版本；规则被 overlay 换掉时查不到，走通用路径
+_STREAM_WRITERS = {
+    emit_vardecl: _write_vardecl, emit_assign: _write_assign, emit_return: _write_return,
+    emit_exprstmt: _write_exprstmt, emit_if: _write_if, emit_while: _write_while,
+    emit_blockstmt: _write_blockstmt,
+}
+
+_DEFAULT_EXPR_RULES = ((Literal, emit_literal), (Var, emit_var), (Binary, emit_binary),
+                       (Unary, emit_unary), (Cast, emit_cast))
+_DEFAULT_STMT_RULES = {
+    S_EXPR: (ExprStmt, emit_exprstmt), S_VARDECL: (VarDecl, emit_vardecl), S_ASSIGN: (Assign, emit_assign),
+    S_RETURN: (Return, emit_return), S_IF: (If, emit_if), S_WHILE: (While, emit_while),
+    S_BLOCK: (BlockStmt, emit_blockstmt),
+}
+
+class _FlatEmit:
+    """一次 iter_flat_function 的状态：表达式代码按下标线性生成，用完即释放。"""
+
+    def __init__(self, emitter: CarbonEmitter, ff: FlatFunction):
+        self.em = emitter
+        self.ff = ff
+        self.codes: list[str | None] = [None] * len(ff)
+        self.refs = expr_refcounts(ff)
+        self.next = 0
+        # 转回对象 IR 时共用的 memo（只有规则被换掉时才用到）
+        self.memo: dict = {}
+        d = emitter.dispatch
+        # opcode 顺序和 _DEFAULT_EXPR_RULES 一致
+        self.fast_expr = [d.expr_rule(cls) is fn for cls, fn in _DEFAULT_EXPR_RULES]
+        self.fast_stmt = {op: d.stmt_rule(cls) is fn for op, (cls, fn) in _DEFAULT_STMT_RULES.items()}
+
+    def _use(self, i: int) -> str:
+        code = self.codes[i]
+        self.refs[i] -= 1
+        if self.refs[i] == 0:
+            self.codes[i] = None
+        return code
+
+    def expr(self, root: int) -> str:
+        ff, em, codes, fast = self.ff, self.em, self.codes, self.fast_expr
+        e_op, e_a, e_b, e_sub = ff.e_op, ff.e_a, ff.e_b, ff.e_sub
+        for i in range(self.next, root + 1):
+            op = e_op[i]
+            if not fast[op]:
+                node = ff.expr(i, self.memo)
+                codes[i] = em.expr_rule(node)(em, node)
+                # 子表达式的代码由规则自己重新生成了，这里只需要扣掉引用
+                if op == BINARY:
+                    self._use(e_a[i])
+                    self._use(e_b[i])
+                elif op != LITERAL and op != VAR:
+                    self._use(e_a[i])
+            elif op == VAR:
+                codes[i] = ff.names[e_a[i]]
+            elif op == LITERAL:
+                codes[i] = _literal_code(ff.types[ff.e_ty[i]], ff.literals[e_a[i]])
+            elif op == BINARY:
+                lhs = self._use(e_a[i])
+                rhs = self._use(e_b[i])
+                codes[i] = f"({lhs} {em.emit_op(BIN_OPS[e_sub[i]])} {rhs})"
+            elif op == UNARY:
+                codes[i] = f"({em.emit_unary_op(UN_OPS[e_sub[i]])} {self._use(e_a[i])})"
+            else:
+                codes[i] = f"({self._use(e_a[i])}) as {em.emit_type(ff.types[ff.e_ty[i]])}"
+        if root >= self.next:
+            self.next = root + 1
+        return self._use(root)
+
+    def block(self, k: int, indent: int) -> Iterator[str]:
+        for i in self.ff.block_stmts(k):
+            yield from self.stmt(i, indent)
+
+    def stmt(self, i: int, indent: int) -> Iterator[str]:
+        ff, em = self.ff, self.em
+        op = ff.s_op[i]
+        e = ff.s_expr[i]
+        pad = _pad(indent)
+        if not self.fast_stmt[op]:
+            node = ff.stmt(i, self.memo)
+            # 规则自己处理整棵子树；这里照常推进线性扫描（共享的子表达式后面可能还要用）
+            self._skip_stmt(i)
+            yield from em.stmt_rule(node)(em, node, indent)
+            return
+        if op == S_VARDECL:
+            decl = f"{pad}var {ff.names[ff.s_name[i]]}: {em.emit_type(ff.types[ff.s_ty[i]])}"
+            yield f"{decl};" if e < 0 else f"{decl} = {self.expr(e)};"
+        elif op == S_EXPR:
+            yield f"{pad}{self.expr(e)};"
+        elif op == S_ASSIGN:
+            yield f"{pad}{ff.names[ff.s_name[i]]} = {self.expr(e)};"
+        elif op == S_RETURN:
+            yield f"{pad}return {self.expr(e)};"
+        elif op == S_IF:
+            yield f"{pad}if ({self.expr(e)}) {{"
+            yield from self.block(ff.s_a[i], indent + 1)
+            if ff.s_b[i] < 0:
+                yield f"{pad}}}"
+                return
+            yield f"{pad}}} else {{"
+            yield from self.block(ff.s_b[i], indent + 1)
+            yield f"{pad}}}"
+        elif op == S_WHILE:
+            yield f"{pad}while ({self.expr(e)}) {{"
+            yield from self.block(ff.s_a[i], indent + 1)
+            yield f"{pad}}}"
+        else:
+            yield f"{pad}{{"
+            yield from self.block(ff.s_a[i], indent + 1)
+            yield f"{pad}}}"
+
+    def _skip_stmt(self, i: int) -> None:
+        ff = self.ff
+        stmts = [i]
+        while stmts:
+            j = stmts.pop()
+            if ff.s_expr[j] >= 0:
+                self.expr(ff.s_expr[j])
+            op = ff.s_op[j]
+            if op == S_IF or op == S_WHILE or op == S_BLOCK:
+                # 逆序压栈，保持前序（和表达式下标递增的顺序一致）
+                if ff.s_b[j] >= 0:
+                    stmts.extend(reversed(ff.block_stmts(ff.s_b[j])))
+                stmts.extend(reversed(ff.block_stmts(ff.s_a[j])))
+
+
+class EmitPass(FunctionPass):
+    """
+    用 CarbonEmitter 的规则生成代码。表达式在遍历时就按后序生成（子节点的代码
+    临时放进 emitter 的 memo 供规则读取），顶层语句结束时再调用语句规则，
+    这时语句里所有表达式的代码都已经在 memo 里，不会再走一遍表达式树。
+    """
+
+    name = "emit"
+
+    def __init__(self, emitter):
+        self.emitter = emitter
+
+    def begin_function(self, fn: Function) -> None:
+        em = self.emitter
+        params = ", ".join(f"{p.name}: {em.emit_type(p.ty)}" for p in fn.params)
+        self.lines = [f"fn {fn.name}({params}) -> {em.emit_type(fn.ret_ty)} {{"]
+        em._expr_memo.clear()
+
+    def expr(self, node, kids):
+        em = self.emitter
+        if not kids:
+            # 叶子（变量、字面量）的规则不读子节点，不用经过 memo
+            return em.expr_rule(node)(em, node)
+        memo = em._expr_memo
+        children = expr_children(node)
+        for k, code in zip(children, kids):
+            memo[id(k)] = (k, code)
+        try:
+            return em.expr_rule(node)(em, node)
+        finally:
+            for k in children:
+                memo.pop(id(k), None)
+
+    def stmt(self, stmt, results) -> None:
+        # 语句的根表达式留到顶层语句 emit 时用
+        memo = self.emitter._expr_memo
+        for e, code in zip(stmt_exprs(stmt), results):
+            memo[id(e)] = (e, code)
+
+    def end_stmt(self, stmt, depth) -> None:
+        if depth:
+            return
+        em = self.emitter
+        self.lines += em.stmt_rule(stmt)(em, stmt, 1)
+        em._expr_memo.clear()
+
+    def end_function(self, fn: Function) -> str:
+        self.lines.append("}")
+        out = "\n".join(self.lines)
+        self.lines = []
+        return out
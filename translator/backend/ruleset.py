@@ -1,37 +1,116 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Callable, Dict, Type
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Type
 
 from translator.ir.nodes import Expr, Stmt
 
 ExprEmitter = Callable[[object, Expr], str]
 StmtEmitter = Callable[[object, Stmt, int], list[str]]
 
-@dataclass(frozen=True)
-class RuleSet:
-    expr_emitters: Dict[Type[Expr], ExprEmitter]
-    stmt_emitters: Dict[Type[Stmt], StmtEmitter]
+
+class Dispatch:
+    """
+    RuleSet 编译后的查表结构。
+    表的 key 是节点的具体类：声明过规则的类直接命中；子类第一次出现时沿 MRO
+    找最近的声明并写回表里，之后同一个类的节点都只查一次 dict。
+    """
+
+    __slots__ = ("expr_rules", "stmt_rules", "_expr", "_stmt")
+
+    def __init__(self, expr_rules: Dict[type, ExprEmitter], stmt_rules: Dict[type, StmtEmitter]):
+        # 所有层合并后的声明（类型 -> 规则），只读
+        self.expr_rules = expr_rules
+        self.stmt_rules = stmt_rules
+        # 具体类 -> 规则，包括 MRO 解析出来的结果
+        self._expr = dict(expr_rules)
+        self._stmt = dict(stmt_rules)
+
+    @staticmethod
+    def _resolve(table: dict, rules: dict, cls: type):
+        for base in cls.__mro__:
+            rule = rules.get(base)
+            if rule is not None:
+                table[cls] = rule
+                return rule
+        return None
+
+    def expr_rule(self, cls: type) -> Optional[ExprEmitter]:
+        """cls 对应的表达式规则，没有时返回 None。"""
+        rule = self._expr.get(cls)
+        return rule if rule is not None else self._resolve(self._expr, self.expr_rules, cls)
+
+    def stmt_rule(self, cls: type) -> Optional[StmtEmitter]:
+        rule = self._stmt.get(cls)
+        return rule if rule is not None else self._resolve(self._stmt, self.stmt_rules, cls)
 
     def expr(self, node: Expr) -> ExprEmitter:
         try:
-            return self.expr_emitters[type(node)]
+            return self._expr[type(node)]
         except KeyError:
-            raise NotImplementedError(f"No expr rule for {type(node).__name__}")
+            rule = self._resolve(self._expr, self.expr_rules, type(node))
+            if rule is None:
+                raise NotImplementedError(f"No expr rule for {type(node).__name__}") from None
+            return rule
 
     def stmt(self, node: Stmt) -> StmtEmitter:
         try:
-            return self.stmt_emitters[type(node)]
+            return self._stmt[type(node)]
         except KeyError:
-            print(node)
-            raise NotImplementedError(f"No stmt rule for {type(node).__name__}")
+            rule = self._resolve(self._stmt, self.stmt_rules, type(node))
+            if rule is None:
+                raise NotImplementedError(f"No stmt rule for {type(node).__name__}") from None
+            return rule
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """
+    节点类型 -> emit 规则；子类节点没有自己的规则时用最近的基类规则。
+    expr_emitters / stmt_emitters 是这一层自己的规则，base 是被它覆盖的下层。
+    overlay 不复制字典，只是把层叠起来；第一次查表时 compile() 把所有层
+    合并成一个 Dispatch 并缓存，之后和层数无关。规则字典在 overlay 之后不要再改。
+    """
+
+    expr_emitters: Dict[Type[Expr], ExprEmitter]
+    stmt_emitters: Dict[Type[Stmt], StmtEmitter]
+    base: Optional["RuleSet"] = field(default=None, repr=False)
+
+    def layers(self) -> list["RuleSet"]:
+        """从最底层到这一层。"""
+        out = []
+        rs: Optional[RuleSet] = self
+        while rs is not None:
+            out.append(rs)
+            rs = rs.base
+        out.reverse()
+        return out
+
+    def compile(self) -> Dispatch:
+        d = self.__dict__.get("_dispatch")
+        if d is None:
+            expr: dict = {}
+            stmt: dict = {}
+            for layer in self.layers():
+                expr.update(layer.expr_emitters)
+                stmt.update(layer.stmt_emitters)
+            d = Dispatch(expr, stmt)
+            # frozen dataclass：缓存不算字段，绕过 __setattr__ 写进实例字典
+            object.__setattr__(self, "_dispatch", d)
+        return d
+
+    def expr(self, node: Expr) -> ExprEmitter:
+        return self.compile().expr(node)
+
+    def stmt(self, node: Stmt) -> StmtEmitter:
+        return self.compile().stmt(node)
 
     def overlay(self, other: "RuleSet") -> "RuleSet":
         """
-        规则叠加：other 覆盖 self（同类型节点时以 other 为准）
+        规则叠加：other 覆盖 self（同类型节点时以 other 为准）。
+        other 自己也是叠出来的时候，把它的每一层按顺序接到 self 上面。
         """
-        expr = dict(self.expr_emitters)
-        expr.update(other.expr_emitters)
-        stmt = dict(self.stmt_emitters)
-        stmt.update(other.stmt_emitters)
-        return RuleSet(expr_emitters=expr, stmt_emitters=stmt)
+        result = self
+        for layer in other.layers():
+            result = RuleSet(expr_emitters=layer.expr_emitters, stmt_emitters=layer.stmt_emitters, base=result)
+        return result
@@ -0,0 +1,340 @@
+"""
+批量翻译：把一批源文件 / 目录分给多个 worker 进程。
+
+每个 worker 进程只创建一次 cindex.Index 并一直复用；
+结果按输入顺序返回（和 worker 完成的先后无关），方便 diff。
+
+    python -m translator.cli.batch dataset -j 8 -o out/
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from translator.common.files import write_if_changed
+
+SOURCE_SUFFIXES = (".c", ".cc", ".cpp", ".cxx")
+
+
+@dataclass(frozen=True)
+class FileResult:
+    path: str
+    ok: bool
+    seconds: float
+    output: Optional[str] = None
+    error: Optional[str] = None
+    # --check 模式：DiagnosticBag.to_dict()
+    diagnostics: Optional[dict] = None
+
+
+def _glob_root(pattern: str) -> Path:
+    """glob 里第一个通配符之前的目录部分，匹配到的文件相对它输出。"""
+    parts = Path(pattern).parts
+    for i, part in enumerate(parts):
+        if glob.has_magic(part):
+            return Path(*parts[:i]) if i else Path(".")
+    return Path(pattern).parent
+
+
+def collect_sources(paths: Iterable[str], suffixes=SOURCE_SUFFIXES) -> list[tuple[str, str]]:
+    """
+    展开输入：返回 (源文件路径, 相对输出路径)。
+    目录递归查找；含通配符的输入按 glob 展开（支持 **），相对路径从通配符前的目录算起。
+    目录 / glob 内按路径排序，保证每次顺序一致；同一个文件只出现一次。
+    """
+    out: list[tuple[str, str]] = []
+    seen: set[str] = set()
+
+    def add(f: Path, rel: Path) -> None:
+        key = os.path.abspath(f)
+        if key not in seen:
+            seen.add(key)
+            out.append((str(f), str(rel)))
+
+    for p in paths:
+        root = Path(p)
+        if glob.has_magic(p):
+            base = _glob_root(p)
+            for m in sorted(glob.glob(p, recursive=True)):
+                f = Path(m)
+                if f.is_file() and f.suffix in suffixes:
+                    add(f, f.relative_to(base))
+        elif root.is_dir():
+            for f in sorted(root.rglob("*")):
+                if f.is_file() and f.suffix in suffixes:
+                    add(f, f.relative_to(root))
+        else:
+            add(root, Path(root.name))
+    return out
+
+
+# ---- worker 侧 ----
+
+_INDEX = None
+_CACHE = None
+
+
+def _init_worker(cache_dir: str | None = None, cache_max_bytes: int | None = None) -> None:
+    global _INDEX, _CACHE
+    from translator.frontend.ir_cache import IRCache, DEFAULT_MAX_BYTES
+    from translator.frontend.libclang import create_index
+    _INDEX = create_index()
+    if cache_dir is not None:
+        _CACHE = IRCache(cache_dir, max_bytes=cache_max_bytes or DEFAULT_MAX_BYTES)
+
+
+def _translate_one(job: tuple[str, dict]) -> FileResult:
+    from translator.frontend.clang_frontend import translate_file
+
+    path, options = job
+    t0 = time.perf_counter()
+    try:
+        code = translate_file(path, index=_INDEX, cache=_CACHE, **options)
+    except Exception as e:
+        return FileResult(path=path, ok=False, seconds=time.perf_counter() - t0,
+                          error=f"{type(e).__name__}: {e}")
+    return FileResult(path=path, ok=True, seconds=time.perf_counter() - t0, output=code)
+
+
+def _check_one(job: tuple[str, dict]) -> FileResult:
+    from translator.frontend.clang_frontend import check_file
+
+    path, options = job
+    t0 = time.perf_counter()
+    try:
+        diags = check_file(path, index=_INDEX, cache=_CACHE, **options)
+    except Exception as e:
+        return FileResult(path=path, ok=False, seconds=time.perf_counter() - t0,
+                          error=f"{type(e).__name__}: {e}")
+    report = diags.to_dict()
+    error = None
+    if diags:
+        error = f"{len(diags)} diagnostic(s){' (truncated)' if diags.truncated else ''}, first: {diags.items[0]}"
+    return FileResult(path=path, ok=not diags, seconds=time.perf_counter() - t0,
+                      error=error, diagnostics=report)
+
+
+# ---- 调度 ----
+
+def translate_batch(files: list[str], jobs: int | None = None, args: list[str] | None = None,
+                    cache_dir: str | None = None, cache_max_bytes: int | None = None,
+                    pch=None, function_jobs: int | None = 1, selection=None,
+                    profile: str = "default", share: bool = False,
+                    optimize: bool = False, check_only: bool = False,
+                    max_errors: int | None = None) -> list[FileResult]:
+    """
+    翻译 files，结果顺序与 files 一致。jobs=1 时在当前进程里跑。
+    pch 是 build_pch() 的结果（所有文件共用），或者 build_pchs() 的 {语言: PCH}（按后缀给每个文件挑，
+    没有对应语言的文件不用 PCH）。
+    function_jobs 控制单个文件内按函数并行（适合少量大文件），只能和 jobs=1 一起用。
+    selection / profile 见 translator.frontend.selection；share 打开表达式 hash-consing；
+    optimize 打开常量折叠（translator.ir.fold）。
+    check_only=True 时不翻译，只收集每个文件的全部诊断（每个文件最多 max_errors 条）。
+    """
+    return list(iter_translate_batch(files, jobs=jobs, args=args, cache_dir=cache_dir,
+                                     cache_max_bytes=cache_max_bytes, pch=pch, function_jobs=function_jobs,
+                                     selection=selection, profile=profile, share=share, optimize=optimize,
+                                     check_only=check_only, max_errors=max_errors))
+
+
+def iter_translate_batch(files: list[str], jobs: int | None = None, args: list[str] | None = None,
+                         cache_dir: str | None = None, cache_max_bytes: int | None = None,
+                         pch=None, function_jobs: int | None = 1, selection=None,
+                         profile: str = "default", share: bool = False,
+                         optimize: bool = False, check_only: bool = False,
+                         max_errors: int | None = None) -> Iterator[FileResult]:
+    """
+    translate_batch 的生成器版本：按 files 的顺序，每个文件一完成就产出结果，
+    调用方可以边翻译边落盘 / 记录进度（cli.translate 的 manifest 靠这个断点续跑）。
+    """
+    if check_only:
+        # 诊断都在折叠之前的 IR 上，optimize 不影响检查结果
+        options = dict(args=args, pch=pch, profile=profile, max_errors=max_errors)
+        run_one = _check_one
+    else:
+        options = dict(args=args, pch=pch, function_jobs=function_jobs, profile=profile, share=share,
+                       optimize=optimize)
+        run_one = _translate_one
+    if selection is not None:
+        options["selection"] = selection
+    if isinstance(pch, dict):
+        from translator.frontend.selection import source_language
+        work = [(f, {**options, "pch": pch.get(source_language(f))}) for f in files]
+    else:
+        work = [(f, options) for f in files]
+    init_args = (cache_dir, cache_max_bytes)
+    if not work:
+        return
+    if jobs == 1 or len(work) <= 1:
+        _init_worker(*init_args)
+        for w in work:
+            yield run_one(w)
+        return
+    if function_jobs != 1 and not check_only:
+        # 每个 worker 每个文件再开一个进程池，会变成 jobs × function_jobs 个进程
+        raise ValueError("jobs and function_jobs cannot both be != 1; parallelize over files or over functions")
+
+    # 进程池只在真的多进程时才 import（concurrent.futures.process 会带进整个 multiprocessing）
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(work) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=init_args) as pool:
+        yield from pool.map(run_one, work, chunksize=chunksize)
+
+
+def output_path(out_dir: str, rel: str) -> Path:
+    """输入的相对路径 -> 输出树里对应的 .carbon 文件。"""
+    return Path(out_dir) / Path(rel).with_suffix(".carbon")
+
+
+def write_outputs(results: list[FileResult], rel_paths: list[str], out_dir: str) -> None:
+    for r, rel in zip(results, rel_paths):
+        if r.ok:
+            write_if_changed(output_path(out_dir, rel), r.output)
+
+
+def add_translation_options(ap: argparse.ArgumentParser) -> None:
+    """batch 和 translate 共用的翻译选项；对应的 translate_batch 参数见 translation_kwargs。"""
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    ap.add_argument("--function-jobs", type=int, default=1,
+                    help="typecheck/emit the functions of one file in this many processes (0: CPU count); "
+                         "files are then translated one at a time")
+    ap.add_argument("--clang-arg", action="append", dest="clang_args", default=None,
+                    help="extra clang argument (repeatable, default: -std=c11, or -std=c++14 for .cc/.cpp/.cxx)")
+    ap.add_argument("-f", "--function", action="append", dest="functions", default=[],
+                    help="only translate this function (repeatable)")
+    ap.add_argument("--match", default=None, help="only translate functions whose name fully matches this regex")
+    ap.add_argument("--include-headers", action="store_true",
+                    help="also translate function definitions that live in included headers")
+    ap.add_argument("--profile", default="default", choices=["default", "fast", "detailed"],
+                    help="libclang parse profile")
+    ap.add_argument("-O", "--optimize", action="store_true",
+                    help="fold constants, simplify identities and flatten redundant blocks before emitting")
+    ap.add_argument("--share-exprs", action="store_true",
+                    help="hash-cons expressions so repeated subtrees are stored, checked and emitted once")
+    ap.add_argument("--cache-dir", default=None, help="reuse lowered IR from this on-disk cache")
+    ap.add_argument("--cache-max-mb", type=int, default=None, help="cache size cap in MiB (LRU eviction)")
+
+
+def check_translation_options(ap: argparse.ArgumentParser, ns: argparse.Namespace) -> None:
+    """按文件并行和按函数并行只能选一个，两个都开会起 jobs × function_jobs 个进程。"""
+    if ns.function_jobs != 1 and ns.jobs not in (None, 1):
+        ap.error("-j/--jobs and --function-jobs cannot be combined; use -j 1 with --function-jobs")
+
+
+def translation_kwargs(ns: argparse.Namespace) -> dict:
+    """add_translation_options 解析出来的参数 -> translate_batch 的关键字参数。"""
+    from translator.frontend.selection import FunctionSelection
+    function_jobs = ns.function_jobs or None
+    return dict(
+        # 只给了 --function-jobs 时，核交给单个文件内的函数，文件逐个处理
+        jobs=1 if function_jobs != 1 and ns.jobs is None else ns.jobs,
+        args=ns.clang_args, cache_dir=ns.cache_dir,
+        cache_max_bytes=ns.cache_max_mb * 1024 * 1024 if ns.cache_max_mb else None,
+        function_jobs=function_jobs,
+        selection=FunctionSelection.of(ns.functions, ns.match, main_file_only=not ns.include_headers),
+        profile=ns.profile, share=ns.share_exprs, optimize=ns.optimize,
+    )
+
+
+def write_report(results: list[FileResult], stream) -> None:
+    """--check 的机器可读报告：每个文件一项，诊断字段同 Diagnostic.to_dict()。"""
+    files = []
+    for r in results:
+        entry = {"path": r.path, "ok": r.ok}
+        if r.diagnostics is not None:
+            entry.update(r.diagnostics)
+        else:
+            entry["error"] = r.error
+        files.append(entry)
+    total = sum(e.get("count", 0) for e in files)
+    json.dump({"files": files, "count": total}, stream, indent=2, ensure_ascii=False)
+    stream.write("\n")
+
+
+def print_summary(results: list[FileResult], wall: float, stream=sys.stdout) -> None:
+    for r in results:
+        status = "OK  " if r.ok else "FAIL"
+        line = f"{status} {r.seconds:8.3f}s  {r.path}"
+        if not r.ok:
+            line += f"  -- {r.error}"
+        print(line, file=stream)
+    n_ok = sum(r.ok for r in results)
+    cpu = sum(r.seconds for r in results)
+    print(
+        f"{n_ok}/{len(results)} ok, {len(results) - n_ok} failed, "
+        f"{cpu:.3f}s in workers, {wall:.3f}s wall",
+        file=stream,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Batch C/C++ -> Carbon translation")
+    ap.add_argument("inputs", nargs="+", help="source files, directories or globs")
+    add_translation_options(ap)
+    ap.add_argument("-o", "--out-dir", default=None, help="write <out-dir>/<relpath>.carbon for each input")
+    ap.add_argument("--check", action="store_true",
+                    help="only lower and typecheck; collect every diagnostic instead of stopping at the first")
+    ap.add_argument("--max-errors", type=int, default=100,
+                    help="with --check: stop collecting after this many diagnostics per file (0: no limit)")
+    ap.add_argument("--report", default=None,
+                    help="with --check: write a JSON report of all diagnostics here ('-' for stdout)")
+    ap.add_argument("--pch-header", action="append", default=[],
+                    help="precompile this header once per run and reuse it for every file (repeatable)")
+    ap.add_argument("--clear-cache", action="store_true", help="drop every cache entry before translating")
+    ap.add_argument("--invalidate", action="append", default=[], metavar="FILE",
+                    help="drop FILE's cache entry for the current options before translating (repeatable)")
+    ns = ap.parse_args(argv)
+    check_translation_options(ap, ns)
+
+    if ns.clear_cache and ns.cache_dir:
+        from translator.frontend.ir_cache import IRCache
+        IRCache(ns.cache_dir).clear()
+    elif ns.invalidate and ns.cache_dir:
+        from translator.frontend.clang_frontend import invalidate_cached
+        from translator.frontend.ir_cache import IRCache
+        cache = IRCache(ns.cache_dir)
+        kwargs = translation_kwargs(ns)
+        for f in ns.invalidate:
+            invalidate_cached(f, cache, args=kwargs["args"], selection=kwargs["selection"],
+                              profile=kwargs["profile"], share=kwargs["share"])
+
+    sources = collect_sources(ns.inputs)
+    files = [f for f, _ in sources]
+
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="translator-pch-") as pch_dir:
+        pch = None
+        if ns.pch_header:
+            from translator.frontend.pch import build_pchs
+            # C 和 C++ 文件的解析参数不同，各用自己的 PCH
+            pch = build_pchs(ns.pch_header, files, ns.clang_args or None, out_dir=pch_dir)
+        results = translate_batch(files, pch=pch, check_only=ns.check, max_errors=ns.max_errors or None,
+                                  **translation_kwargs(ns))
+    wall = time.perf_counter() - t0
+
+    if ns.out_dir and not ns.check:
+        write_outputs(results, [rel for _, rel in sources], ns.out_dir)
+    summary_stream = sys.stdout
+    if ns.check and ns.report:
+        if ns.report == "-":
+            write_report(results, sys.stdout)
+            summary_stream = sys.stderr
+        else:
+            with open(ns.report, "w", encoding="utf-8") as f:
+                write_report(results, f)
+    print_summary(results, wall, stream=summary_stream)
+    return 0 if all(r.ok for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
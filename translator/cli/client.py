@@ -0,0 +1,181 @@
+"""
+常驻翻译进程（translator.cli.daemon）的瘦客户端。
+
+只依赖标准库，不 import clang 和翻译流水线，启动开销就是解释器本身；
+解析 / lowering / emit 都在 daemon 里做。
+
+    python -m translator.cli.client dataset/test.c                  # 结果打到 stdout
+    python -m translator.cli.client dataset/test.c -o test.carbon
+    python -m translator.cli.client dataset/test.c --stdin < buf.c  # 翻译编辑器里还没保存的内容
+    python -m translator.cli.client dataset/test.c --check
+    python -m translator.cli.client --spawn dataset/test.c          # daemon 没在跑就先在后台启动
+    python -m translator.cli.client --ping | --stats | --shutdown
+
+协议：Unix socket 上一问一答，每条消息是 4 字节大端长度 + UTF-8 JSON（字段见 daemon 模块）。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+_HEADER = struct.Struct(">I")
+# 单条消息的上限，防止读到错乱的长度时一次分配几个 G
+MAX_MESSAGE = 256 * 1024 * 1024
+
+
+def default_socket_path() -> str:
+    """$TRANSLATOR_SOCKET，否则 $XDG_RUNTIME_DIR（或临时目录）下按用户区分的 socket。"""
+    env = os.environ.get("TRANSLATOR_SOCKET")
+    if env:
+        return env
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"translator-{os.getuid()}.sock")
+
+
+def send_message(sock: socket.socket, obj: dict) -> None:
+    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> Optional[bytes]:
+    chunks = []
+    while n:
+        chunk = sock.recv(min(n, 1 << 20))
+        if not chunk:
+            if chunks:
+                raise ConnectionError("connection closed in the middle of a message")
+            return None
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Optional[dict]:
+    """读一条消息；对方在消息边界关闭连接时返回 None。"""
+    head = _recv_exact(sock, _HEADER.size)
+    if head is None:
+        return None
+    (size,) = _HEADER.unpack(head)
+    if size > MAX_MESSAGE:
+        raise ConnectionError(f"message too large ({size} bytes)")
+    body = _recv_exact(sock, size) if size else b""
+    if body is None:
+        raise ConnectionError("connection closed in the middle of a message")
+    return json.loads(body.decode("utf-8"))
+
+
+def request(obj: dict, socket_path: str | None = None, timeout: float | None = None) -> dict:
+    """发一个请求、等回复。daemon 没在跑时抛 OSError（FileNotFoundError / ConnectionRefusedError）。"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(socket_path or default_socket_path())
+        send_message(s, obj)
+        resp = recv_message(s)
+    if resp is None:
+        raise ConnectionError("daemon closed the connection without replying")
+    return resp
+
+
+def spawn_daemon(socket_path: str | None = None, wait: float = 10.0, extra_args: list[str] | None = None) -> None:
+    """在后台启动 daemon（脱离当前会话），等到它能响应 ping 为止。"""
+    path = socket_path or default_socket_path()
+    subprocess.Popen(
+        [sys.executable, "-m", "translator.cli.daemon", "--socket", path, *(extra_args or [])],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            request({"op": "ping"}, path, timeout=wait)
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"daemon did not come up on {path} within {wait:.0f}s")
+            time.sleep(0.05)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Send a translate request to the resident translation daemon")
+    ap.add_argument("source", nargs="?", help="C/C++ file to translate")
+    ap.add_argument("-o", "--output", default=None, help="write the Carbon code here instead of stdout")
+    ap.add_argument("--stdin", action="store_true", help="translate the text on stdin as the contents of SOURCE")
+    ap.add_argument("--check", action="store_true", help="only typecheck and print every diagnostic")
+    ap.add_argument("--clang-arg", action="append", dest="clang_args", default=None)
+    ap.add_argument("-f", "--function", action="append", dest="functions", default=[])
+    ap.add_argument("--match", default=None)
+    ap.add_argument("--include-headers", action="store_true")
+    ap.add_argument("--profile", default="default", choices=["default", "fast", "detailed"])
+    ap.add_argument("-O", "--optimize", action="store_true")
+    ap.add_argument("--share-exprs", action="store_true")
+    ap.add_argument("--socket", default=None, help=f"daemon socket (default: {default_socket_path()})")
+    ap.add_argument("--spawn", action="store_true", help="start the daemon in the background if it is not running")
+    ap.add_argument("--timeout", type=float, default=None, help="seconds to wait for the reply")
+    ap.add_argument("--ping", action="store_true")
+    ap.add_argument("--stats", action="store_true")
+    ap.add_argument("--shutdown", action="store_true")
+    ns = ap.parse_args(argv)
+
+    if ns.ping or ns.stats or ns.shutdown:
+        req = {"op": "ping" if ns.ping else "stats" if ns.stats else "shutdown"}
+    else:
+        if ns.source is None:
+            ap.error("SOURCE is required")
+        req = {
+            "op": "check" if ns.check else "translate",
+            "path": os.path.abspath(ns.source),
+            # 相对的 -I 等参数按客户端的工作目录解释
+            "cwd": os.getcwd(),
+            "args": ns.clang_args,
+            "functions": ns.functions,
+            "match": ns.match,
+            "include_headers": ns.include_headers,
+            "profile": ns.profile,
+            "optimize": ns.optimize,
+            "share": ns.share_exprs,
+        }
+        if ns.stdin:
+            req["text"] = sys.stdin.read()
+
+    path = ns.socket or default_socket_path()
+    try:
+        resp = request(req, path, timeout=ns.timeout)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if not ns.spawn or ns.shutdown:
+            print(f"no translation daemon listening on {path} "
+                  f"(start one with `python -m translator.cli.daemon`, or pass --spawn)", file=sys.stderr)
+            return 2
+        spawn_daemon(path)
+        resp = request(req, path, timeout=ns.timeout)
+
+    if req["op"] in ("ping", "stats", "shutdown"):
+        print(json.dumps(resp, indent=2, ensure_ascii=False))
+        return 0 if resp.get("ok") else 1
+    if req["op"] == "check" and resp.get("diagnostics"):
+        for d in resp["diagnostics"]:
+            loc = d.get("location")
+            where = f"{loc['path']}:{loc['line']}:{loc['col']}: " if loc else ""
+            print(f"{where}{d['code']}: {d['message']}", file=sys.stderr)
+    elif resp.get("error"):
+        print(resp["error"], file=sys.stderr)
+    if not resp.get("ok"):
+        return 1
+    if req["op"] == "translate":
+        if ns.output:
+            from translator.common.files import write_if_changed
+            write_if_changed(ns.output, resp["output"])
+        else:
+            sys.stdout.write(resp["output"] + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
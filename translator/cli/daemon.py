@@ -0,0 +1,208 @@
+"""
+常驻翻译进程：clang 绑定、libclang、Index 和 emitter 都只初始化一次，
+之后通过 Unix socket 接收请求，每个请求只剩 parse + lower + typecheck + emit。
+瘦客户端见 translator.cli.client（编辑器 / IDE 的保存钩子里调用它）。
+
+    python -m translator.cli.daemon                         # socket 默认见 client.default_socket_path()
+    python -m translator.cli.daemon --socket /tmp/tr.sock --cache-dir .ircache --idle-timeout 600
+
+请求（JSON，格式见 client 模块）：
+    {"op": "translate" | "check", "path": 绝对路径, "text": 可选，未保存的文件内容,
+     "cwd": 可选，解释相对 clang 参数的目录, "args": [...], "functions": [...], "match": 正则,
+     "include_headers": bool, "profile": str, "optimize": bool, "share": bool, "max_errors": int}
+    {"op": "ping"} / {"op": "stats"} / {"op": "shutdown"}
+回复：
+    translate  {"ok": true, "output": Carbon 代码}
+    check      {"ok": 没有诊断, "diagnostics": [Diagnostic.to_dict(), ...], "truncated": bool}
+    失败        {"ok": false, "error": 文本, "diagnostics": [...]}（出错的是 Diagnostic 时带上它）
+
+请求按到达顺序逐个处理：libclang 的 Index 和流水线里的全局状态（SOURCES 等）都不是线程安全的，
+编辑器的保存请求本来也是串行的。
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import stat
+import sys
+import time
+from typing import Optional
+
+from translator.cli.client import default_socket_path, recv_message, request, send_message
+from translator.common.diagnostics import Diagnostic
+from translator.common.source import SOURCES
+from translator.frontend.clang_frontend import check_file, translate_file
+from translator.frontend.ir_cache import DEFAULT_MAX_BYTES, IRCache
+from translator.frontend.libclang import create_index
+from translator.frontend.selection import FunctionSelection
+
+# 单个连接上读一条请求最多等这么久，防止卡住的客户端把 daemon 堵死
+_CONNECTION_TIMEOUT = 30.0
+
+
+class TranslationDaemon:
+    def __init__(self, socket_path: str | None = None, cache_dir: str | None = None,
+                 cache_max_bytes: int | None = None, idle_timeout: float | None = None):
+        self.socket_path = socket_path or default_socket_path()
+        self.idle_timeout = idle_timeout
+        self.index = create_index()
+        self.cache = None
+        if cache_dir is not None:
+            self.cache = IRCache(cache_dir, max_bytes=cache_max_bytes or DEFAULT_MAX_BYTES)
+        self.started = time.time()
+        self.requests = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self._stop = False
+
+    # ---- 请求处理 ----
+
+    def handle(self, req: dict) -> dict:
+        op = req.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "stats":
+            return {"ok": True, "pid": os.getpid(), "uptime": round(time.time() - self.started, 3),
+                    "requests": self.requests, "failures": self.failures,
+                    "busy_seconds": round(self.busy_seconds, 3)}
+        if op == "shutdown":
+            self._stop = True
+            return {"ok": True}
+        if op not in ("translate", "check"):
+            return {"ok": False, "error": f"unknown op {op!r}"}
+
+        t0 = time.perf_counter()
+        try:
+            resp = self._run(req, check_only=op == "check")
+        finally:
+            self.requests += 1
+            self.busy_seconds += time.perf_counter() - t0
+        if not resp["ok"]:
+            self.failures += 1
+        return resp
+
+    def _run(self, req: dict, check_only: bool) -> dict:
+        path = req.get("path")
+        if not path:
+            return {"ok": False, "error": "missing 'path'"}
+        text: Optional[str] = req.get("text")
+        unsaved = None
+        if text is not None:
+            unsaved = [(path, text)]
+            # 诊断的行列也按这份内容算，而不是磁盘上的文件
+            SOURCES.set_contents(path, text.encode("utf-8"))
+        selection = FunctionSelection.of(req.get("functions") or (), req.get("match"),
+                                         main_file_only=not req.get("include_headers"))
+        options = dict(index=self.index, args=req.get("args"), cache=self.cache, selection=selection,
+                       profile=req.get("profile", "default"), unsaved_files=unsaved)
+        old_cwd = None
+        cwd = req.get("cwd")
+        try:
+            if cwd and cwd != os.getcwd():
+                old_cwd = os.getcwd()
+                os.chdir(cwd)
+            if check_only:
+                diags = check_file(path, max_errors=req.get("max_errors"), **options)
+                report = diags.to_dict()
+                return {"ok": not diags, "diagnostics": report["diagnostics"], "truncated": report["truncated"]}
+            code = translate_file(path, share=bool(req.get("share")), optimize=bool(req.get("optimize")), **options)
+            return {"ok": True, "output": code}
+        except Diagnostic as d:
+            return {"ok": False, "error": str(d), "diagnostics": [d.to_dict()]}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            if old_cwd is not None:
+                os.chdir(old_cwd)
+            if text is not None:
+                SOURCES.set_contents(path, None)
+
+    # ---- socket ----
+
+    def _bind(self) -> socket.socket:
+        path = self.socket_path
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            st = None
+        if st is not None:
+            # 只清理 socket：路径写错时不能把普通文件 / 目录 / 符号链接删掉
+            if not stat.S_ISSOCK(st.st_mode):
+                raise SystemExit(f"{path} exists and is not a socket; refusing to replace it")
+            try:
+                request({"op": "ping"}, path, timeout=1.0)
+            except OSError:
+                # 上一个 daemon 没清理掉的 socket 文件
+                os.unlink(path)
+            else:
+                raise SystemExit(f"a translation daemon is already listening on {path}")
+        srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # socket 文件一创建出来就只有自己能连，bind 之后再 chmod 中间有一段空档
+        old_umask = os.umask(0o077)
+        try:
+            srv.bind(path)
+        except BaseException:
+            srv.close()
+            raise
+        finally:
+            os.umask(old_umask)
+        srv.listen(16)
+        return srv
+
+    def _serve_connection(self, conn: socket.socket) -> None:
+        conn.settimeout(_CONNECTION_TIMEOUT)
+        while not self._stop:
+            try:
+                req = recv_message(conn)
+            except (OSError, ValueError):
+                return
+            if req is None:
+                return
+            try:
+                send_message(conn, self.handle(req))
+            except OSError:
+                return
+
+    def serve_forever(self) -> None:
+        """接受连接直到收到 shutdown，或者空闲超过 idle_timeout 秒。"""
+        srv = self._bind()
+        try:
+            srv.settimeout(self.idle_timeout)
+            while not self._stop:
+                try:
+                    conn, _ = srv.accept()
+                except socket.timeout:
+                    break
+                with conn:
+                    self._serve_connection(conn)
+        finally:
+            srv.close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Resident translation daemon listening on a Unix socket")
+    ap.add_argument("--socket", default=None, help=f"socket path (default: {default_socket_path()})")
+    ap.add_argument("--cache-dir", default=None, help="reuse lowered IR from this on-disk cache")
+    ap.add_argument("--cache-max-mb", type=int, default=None, help="cache size cap in MiB (LRU eviction)")
+    ap.add_argument("--idle-timeout", type=float, default=None,
+                    help="exit after this many seconds without a connection (default: never)")
+    ns = ap.parse_args(argv)
+
+    daemon = TranslationDaemon(ns.socket, cache_dir=ns.cache_dir,
+                               cache_max_bytes=ns.cache_max_mb * 1024 * 1024 if ns.cache_max_mb else None,
+                               idle_timeout=ns.idle_timeout)
+    print(f"[daemon] pid {os.getpid()} listening on {daemon.socket_path}", file=sys.stderr)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
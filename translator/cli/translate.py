@@ -1,10 +1,197 @@
-from translator.backend.carbon_emitter import CarbonEmitter
-from translator.frontend.demo_ir import *
+"""
+翻译命令行：源文件 / 目录 / glob -> 镜像目录结构的 .carbon 输出树。
 
-from translator.backend.carbon_rules import DEFAULT_CARBON_RULES
-from translator.backend.carbon_emitter import CarbonEmitter
+    python -m translator.cli.translate dataset -o out/
+    python -m translator.cli.translate 'src/**/*.c' include/extra.c -o out/ -j 8
+    python -m translator.cli.translate dataset -o out/ --force     # 忽略 manifest，全部重新翻译
+    python -m translator.cli.translate --demo                      # 打印内置的示例 IR 的翻译结果
 
-emitter = CarbonEmitter(rules=DEFAULT_CARBON_RULES)
-carbon_code = emitter.emit_function(build_demo_ir())
-print(carbon_code)
+输出目录里有一份 manifest（默认 <out>/.translate-manifest.jsonl），每翻译完一个文件追加一行：
+输入内容的 sha256、翻译选项的 hash、结果。再次运行时，输入和选项都没变、上次成功、
+输出文件也还在的文件直接跳过；运行中途崩溃 / 被杀掉，重新执行就从没有记录的文件继续。
+输出内容和磁盘上一样的文件不重写（mtime 不变，不会触发下游的增量构建）。
 
+manifest 只 hash 源文件本身，不跟踪 #include 的头文件；头文件改了用 --force。
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from translator import __version__
+from translator.cli.batch import (
+    add_translation_options, check_translation_options, collect_sources, iter_translate_batch, output_path,
+    translation_kwargs,
+)
+from translator.common.files import file_digest, write_if_changed
+
+MANIFEST_NAME = ".translate-manifest.jsonl"
+# 条目格式变化时加一，旧记录当作不存在
+MANIFEST_VERSION = 1
+
+
+def options_key(kwargs: dict) -> str:
+    """影响输出内容的选项（以及翻译器版本）的 hash；并行度、缓存位置这些不算。"""
+    from translator.frontend.selection import ALL_FUNCTIONS
+
+    selection = kwargs.get("selection") or ALL_FUNCTIONS
+    relevant = {
+        "version": __version__,
+        # None：每个文件按后缀用默认参数（selection.default_args），后缀已经在输出路径里
+        "args": kwargs.get("args") or None,
+        "selection": selection.cache_tag(),
+        "profile": kwargs.get("profile", "default"),
+        "share": bool(kwargs.get("share")),
+        "optimize": bool(kwargs.get("optimize")),
+    }
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class Manifest:
+    """
+    追加写的 JSON lines 文件，每个输出文件（按相对路径）以最后一条记录为准。
+    每条记录写完就 flush，崩溃时最多丢掉正在写的那一行；读的时候跳过写了一半的行。
+    close() 时把文件压缩成每个输出一行。
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self.entries: dict[str, dict] = {}
+        self._fp = None
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except OSError:
+            return
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and entry.get("v") == MANIFEST_VERSION and "output" in entry:
+                    self.entries[entry["output"]] = entry
+
+    def is_current(self, output: str, digest: Optional[str], options: str, out_file: Path) -> bool:
+        entry = self.entries.get(output)
+        return (entry is not None and digest is not None and entry["ok"]
+                and entry["sha256"] == digest and entry["options"] == options and out_file.is_file())
+
+    def record(self, entry: dict) -> None:
+        entry = {"v": MANIFEST_VERSION, **entry}
+        if self._fp is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fp = open(self.path, "a", encoding="utf-8")
+        self._fp.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._fp.flush()
+        self.entries[entry["output"]] = entry
+
+    def close(self) -> None:
+        if self._fp is None:
+            return
+        self._fp.close()
+        self._fp = None
+        write_if_changed(self.path, "".join(json.dumps(e, ensure_ascii=False) + "\n"
+                                            for e in self.entries.values()))
+
+
+def _output_key(rel: str) -> str:
+    """manifest 里的 key：输出文件相对输出根目录的路径。"""
+    return Path(rel).with_suffix(".carbon").as_posix()
+
+
+def translate_tree(inputs: list[str], out_dir: str, manifest_path: str | None = None, force: bool = False,
+                   quiet: bool = False, stream=sys.stdout, **kwargs) -> int:
+    """
+    翻译 inputs，写进 out_dir 的镜像目录；kwargs 直接交给 iter_translate_batch。
+    返回失败的文件数。两个输入对应同一个输出文件（a/x.c 和 b/x.c、x.c 和 x.cpp）时报 ValueError。
+    """
+    sources = collect_sources(inputs)
+    owners: dict[str, str] = {}
+    for src, rel in sources:
+        other = owners.setdefault(_output_key(rel), src)
+        if other != src:
+            raise ValueError(f"{other} and {src} both translate to {_output_key(rel)}; "
+                             f"translate them into separate output directories")
+    manifest = Manifest(manifest_path or os.path.join(out_dir, MANIFEST_NAME))
+    okey = options_key(kwargs)
+
+    todo: list[tuple[str, str, Optional[str]]] = []
+    skipped = 0
+    for src, rel in sources:
+        digest = file_digest(src)
+        if not force and manifest.is_current(_output_key(rel), digest, okey, output_path(out_dir, rel)):
+            skipped += 1
+            continue
+        todo.append((src, rel, digest))
+
+    written = unchanged = failed = 0
+    t0 = time.perf_counter()
+    try:
+        results = iter_translate_batch([src for src, _, _ in todo], **kwargs)
+        for (src, rel, digest), r in zip(todo, results):
+            dst = output_path(out_dir, rel)
+            if r.ok:
+                if write_if_changed(dst, r.output):
+                    written += 1
+                    status = "WROTE"
+                else:
+                    unchanged += 1
+                    status = "SAME "
+            else:
+                failed += 1
+                status = "FAIL "
+            manifest.record({"output": _output_key(rel), "source": src, "sha256": digest, "options": okey,
+                             "ok": r.ok, "error": r.error, "seconds": round(r.seconds, 4)})
+            if not quiet or not r.ok:
+                line = f"{status} {r.seconds:8.3f}s  {src} -> {dst}"
+                if not r.ok:
+                    line += f"  -- {r.error}"
+                print(line, file=stream)
+    finally:
+        manifest.close()
+    wall = time.perf_counter() - t0
+    print(f"{len(sources)} files: {written} written, {unchanged} unchanged, {skipped} skipped (up to date), "
+          f"{failed} failed, {wall:.3f}s", file=stream)
+    return failed
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Translate C/C++ sources into a mirrored tree of .carbon files")
+    ap.add_argument("inputs", nargs="*", help="source files, directories or globs")
+    ap.add_argument("-o", "--out-dir", default=None, help="output root (required unless --demo)")
+    add_translation_options(ap)
+    ap.add_argument("--manifest", default=None, help=f"manifest path (default: <out-dir>/{MANIFEST_NAME})")
+    ap.add_argument("--force", action="store_true", help="retranslate every input, ignoring the manifest")
+    ap.add_argument("-q", "--quiet", action="store_true", help="only print failures and the summary")
+    ap.add_argument("--demo", action="store_true", help="print the translation of the built-in demo IR and exit")
+    ns = ap.parse_args(argv)
+
+    if ns.demo:
+        from translator.backend.carbon_emitter import CarbonEmitter
+        from translator.backend.carbon_rules import DEFAULT_CARBON_RULES
+        from translator.frontend.demo_ir import build_demo_ir
+        print(CarbonEmitter(rules=DEFAULT_CARBON_RULES).emit_function(build_demo_ir()))
+        return 0
+    if not ns.inputs or ns.out_dir is None:
+        ap.error("inputs and -o/--out-dir are required")
+    check_translation_options(ap, ns)
+
+    try:
+        failed = translate_tree(ns.inputs, ns.out_dir, manifest_path=ns.manifest, force=ns.force,
+                                quiet=ns.quiet, **translation_kwargs(ns))
+    except ValueError as e:
+        ap.error(str(e))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+增量 / watch 模式：编辑 C 文件时只重新翻译改动过的函数。
+
+TranslationUnit 一直保留，文件变化后用 libclang 的 reparse（带 precompiled
+preamble，头文件部分不重新解析）；每个 FUNCTION_DECL 按 extent 原文做 hash，
+hash 没变的函数直接复用上次的 Carbon 输出，只对变了的函数重新
+lower -> typecheck -> emit，再按源码顺序拼回输出文件。
+
+    python -m translator.cli.watch dataset/test.c -o test.carbon
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+from typing import Optional
+
+from clang import cindex
+
+from translator.backend.carbon_emitter import CarbonEmitter
+from translator.backend.carbon_rules import DEFAULT_CARBON_RULES
+from translator.common.files import write_if_changed
+from translator.frontend.clang_frontend import (
+    check_parse_errors, function_definitions, parse_file,
+)
+from translator.frontend.clang_to_ir import lower_function
+from translator.frontend.libclang import create_index
+from translator.frontend.selection import default_args
+from translator.frontend.token_index import invalidate_token_index
+from translator.pipeline import check_and_emit
+
+
+class IncrementalTranslator:
+    def __init__(self, filename: str, args=None, index: Optional[cindex.Index] = None, check: bool = True):
+        self.filename = filename
+        self.args = default_args(filename) if args is None else args
+        self.check = check
+        self.emitter = CarbonEmitter(rules=DEFAULT_CARBON_RULES)
+        self.tu: Optional[cindex.TranslationUnit] = None
+        self._index = index or create_index()
+        # 源码顺序：[(函数名, extent hash, Carbon 代码)]
+        self._functions: list[tuple[str, str, str]] = []
+
+    def update(self) -> list[str]:
+        """
+        重新解析并翻译改动过的函数，返回本次重新翻译的函数名。
+        第一次调用做完整解析。
+        """
+        with open(self.filename, "rb") as f:
+            source = f.read()
+
+        if self.tu is None:
+            self.tu = parse_file(
+                self.filename, index=self._index, args=self.args,
+                options=cindex.TranslationUnit.PARSE_PRECOMPILED_PREAMBLE,
+            )
+        else:
+            # 用刚读到的内容 reparse，保证 offset 和 source 一致
+            self.tu.reparse(unsaved_files=[(self.filename, source.decode("utf-8"))])
+            invalidate_token_index(self.tu)
+            check_parse_errors(self.tu)
+
+        old = {}
+        for name, digest, code in self._functions:
+            old[(name, digest)] = code
+
+        changed: list[str] = []
+        functions: list[tuple[str, str, str]] = []
+        for c in function_definitions(self.tu):
+            ext = c.extent
+            if ext.start.file is None or ext.start.file.name != self.tu.spelling:
+                continue
+            digest = hashlib.sha1(source[ext.start.offset:ext.end.offset]).hexdigest()
+            name = c.spelling
+            code = old.get((name, digest))
+            if code is None:
+                code = check_and_emit(lower_function(c), self.emitter, check=self.check)
+                changed.append(name)
+            functions.append((name, digest, code))
+
+        self._functions = functions
+        return changed
+
+    def output(self) -> str:
+        return "\n\n".join(code for _, _, code in self._functions)
+
+
+def watch(filename: str, out_file: str, args=None, interval: float = 0.3) -> None:
+    inc = IncrementalTranslator(filename, args=args)
+    last_mtime = None
+    while True:
+        try:
+            mtime = os.stat(filename).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime != last_mtime:
+            last_mtime = mtime
+            t0 = time.perf_counter()
+            try:
+                changed = inc.update()
+            except Exception as e:
+                print(f"[watch] {filename}: {type(e).__name__}: {e}", file=sys.stderr)
+            else:
+                write_if_changed(out_file, inc.output())
+                dt = (time.perf_counter() - t0) * 1000
+                names = ", ".join(changed) if changed else "-"
+                print(f"[watch] {filename} -> {out_file} ({dt:.1f} ms, retranslated: {names})")
+        time.sleep(interval)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Re-translate a C/C++ file whenever it changes")
+    ap.add_argument("source")
+    ap.add_argument("-o", "--output", default=None, help="output .carbon file (default: <source>.carbon)")
+    ap.add_argument("--clang-arg", action="append", dest="clang_args", default=None)
+    ap.add_argument("--interval", type=float, default=0.3, help="polling interval in seconds")
+    ns = ap.parse_args(argv)
+
+    out = ns.output or os.path.splitext(ns.source)[0] + ".carbon"
+    try:
+        watch(ns.source, out, args=ns.clang_args, interval=ns.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,17 @@
 from __future__ import annotations
-from dataclasses import dataclass
+import dataclasses
+import json
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Optional
+from typing import Iterator, Optional
+
+from translator.common.source import Location, resolve_span
 
 
 class ErrorCode(str, Enum):
     E_INTERNAL = "E_INTERNAL"
     E_INVALID_IR = "E_INVALID_IR"
+    E_PARSE = "E_PARSE"
 
 
 @dataclass(frozen=True)
@@ -14,8 +19,82 @@ class Diagnostic(Exception):
     code: ErrorCode
     message: str
     node_hint: Optional[str] = None
+    # 收集模式下由 DiagnosticBag 填上所在函数
+    function: Optional[str] = None
+    # 出错节点的源码位置（translator.common.source 的打包 span），显示时才换算成行列
+    span: Optional[int] = None
+    # 跨进程传过来的诊断：span 在别的进程里才有意义，已经换算好的位置放这里
+    resolved: Optional[Location] = field(default=None, repr=False, compare=False)
+
+    @property
+    def location(self) -> Optional[Location]:
+        if self.resolved is not None:
+            return self.resolved
+        return resolve_span(self.span)
+
+    def __reduce__(self):
+        # pickle 时（进程池）先在本进程把 span 换算成位置
+        return (Diagnostic, (self.code, self.message, self.node_hint, self.function, None, self.location))
 
     def __str__(self) -> str:
+        text = f"{self.code}: {self.message}"
         if self.node_hint:
-            return f"{self.code}: {self.message} @ {self.node_hint}"
-        return f"{self.code}: {self.message}"
+            text = f"{text} @ {self.node_hint}"
+        loc = self.location
+        return f"{loc}: {text}" if loc is not None else text
+
+    def to_dict(self) -> dict:
+        loc = self.location
+        return {
+            "code": self.code.value,
+            "message": self.message,
+            "node_hint": self.node_hint,
+            "function": self.function,
+            "location": None if loc is None else loc._asdict(),
+        }
+
+
+class DiagnosticBag:
+    """
+    收集模式的诊断容器：检查遇到错误时记下来继续，而不是抛出。
+    limit 是条数上限（None 不限）；满了之后 add 直接丢弃，真的丢了诊断才标记 truncated。
+    检查代码看到 truncated 就可以提前停下：只是 full 的时候后面不一定还有错。
+    """
+
+    def __init__(self, limit: int | None = None):
+        self.limit = limit
+        self.items: list[Diagnostic] = []
+        self.truncated = False
+        # 当前正在检查的函数，add 时写进 Diagnostic.function
+        self.function: Optional[str] = None
+
+    @property
+    def full(self) -> bool:
+        return self.limit is not None and len(self.items) >= self.limit
+
+    def add(self, d: Diagnostic) -> None:
+        if self.full:
+            self.truncated = True
+            return
+        if d.function is None and self.function is not None:
+            d = dataclasses.replace(d, function=self.function)
+        self.items.append(d)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[Diagnostic]:
+        return iter(self.items)
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": len(self.items),
+            "truncated": self.truncated,
+            "diagnostics": [d.to_dict() for d in self.items],
+        }
+
+    def to_json(self, indent: int | None = None) -> str:
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False)
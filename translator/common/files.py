@@ -0,0 +1,53 @@
+"""输出文件的小工具：内容 hash、只在内容变化时才写（原子替换）。"""
+from __future__ import annotations
+
+import hashlib
+import os
+import stat
+import tempfile
+from typing import Optional
+
+# 进程的 umask 只能通过设置来读到；import 时读一次，不在写文件的时候临时改它（线程之间会互相干扰）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def file_digest(path: str | os.PathLike) -> Optional[str]:
+    """文件内容的 sha256；读不到时返回 None。"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def write_if_changed(path: str | os.PathLike, text: str) -> bool:
+    """
+    内容和现有文件相同就不写（mtime 不变，下游的增量构建不会被触发），返回是否写了。
+    写的时候先写同目录的临时文件再 os.replace，中途被杀掉也不会留下半个文件。
+    权限和普通 open() 一样：覆盖时沿用原文件的，新文件按 0o666 & ~umask（mkstemp 默认是 0600）。
+    """
+    data = text.encode("utf-8")
+    mode = 0o666 & ~_UMASK
+    try:
+        with open(path, "rb") as f:
+            mode = stat.S_IMODE(os.fstat(f.fileno()).st_mode)
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    directory = os.path.dirname(os.fspath(path)) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return True
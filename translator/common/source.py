@@ -0,0 +1,123 @@
+"""
+源码位置：文件登记表 + 紧凑的 span。
+
+IR 节点上的 span 是一个打包的 int：
+
+    span = file_id << 64 | start << 32 | end      （start / end 是文件内的字节 offset）
+
+lowering 时只记 offset，不算行列；真正要显示诊断时才通过 SourceRegistry
+把 offset 换成 行:列 —— 每个文件第一次用到时读一遍、建好换行符位置表，之后二分查找。
+
+file_id 只在当前进程内有意义（IR 缓存 / 二进制格式里存的是路径和 offset，读回时重新登记）。
+不在磁盘上的内容（daemon 收到的未保存文本）用 set_contents 登记。
+"""
+from __future__ import annotations
+
+import os
+from array import array
+from bisect import bisect_right
+from typing import NamedTuple, Optional
+
+_OFFSET_MASK = (1 << 32) - 1
+
+
+def pack_span(file_id: int, start: int, end: int) -> int:
+    return (file_id << 64) | (start << 32) | end
+
+
+def unpack_span(span: int) -> tuple[int, int, int]:
+    """-> (file_id, start, end)"""
+    return span >> 64, (span >> 32) & _OFFSET_MASK, span & _OFFSET_MASK
+
+
+class Location(NamedTuple):
+    path: str
+    line: int
+    col: int
+    end_line: int
+    end_col: int
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line}:{self.col}"
+
+
+def _newline_index(data: bytes) -> array:
+    """每行起始的字节 offset。"""
+    starts = array("I", [0])
+    i = data.find(b"\n")
+    while i >= 0:
+        starts.append(i + 1)
+        i = data.find(b"\n", i + 1)
+    return starts
+
+
+class SourceRegistry:
+    """路径 <-> file_id；每个文件的换行符位置表按需构建。"""
+
+    def __init__(self):
+        self._paths: list[str] = []
+        self._ids: dict[str, int] = {}
+        # file_id -> (mtime, 每行起始 offset)
+        self._lines: dict[int, tuple[float, array]] = {}
+        # file_id -> 每行起始 offset：内容不在磁盘上的文件（daemon 收到的未保存文本）
+        self._pinned: dict[int, array] = {}
+
+    def file_id(self, path: str) -> int:
+        fid = self._ids.get(path)
+        if fid is None:
+            fid = self._ids[path] = len(self._paths)
+            self._paths.append(path)
+        return fid
+
+    def path(self, file_id: int) -> str:
+        return self._paths[file_id]
+
+    def set_contents(self, path: str, data: bytes | None) -> None:
+        """
+        用 data 代替磁盘上的内容换算 path 的行列（和 libclang 的 unsaved_files 对应）；
+        data=None 取消，之后重新读磁盘。
+        """
+        fid = self.file_id(path)
+        if data is None:
+            self._pinned.pop(fid, None)
+        else:
+            self._pinned[fid] = _newline_index(data)
+
+    def _line_starts(self, file_id: int) -> array | None:
+        pinned = self._pinned.get(file_id)
+        if pinned is not None:
+            return pinned
+        path = self._paths[file_id]
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        hit = self._lines.get(file_id)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+        with open(path, "rb") as f:
+            starts = _newline_index(f.read())
+        self._lines[file_id] = (mtime, starts)
+        return starts
+
+    def line_col(self, file_id: int, offset: int) -> tuple[int, int]:
+        """offset -> (行, 列)，都从 1 开始；列按字节算（和 clang 一致）。文件读不到时返回 (0, 0)。"""
+        starts = self._line_starts(file_id)
+        if starts is None:
+            return 0, 0
+        line = bisect_right(starts, offset)
+        return line, offset - starts[line - 1] + 1
+
+    def resolve(self, span: int) -> Location:
+        file_id, start, end = unpack_span(span)
+        line, col = self.line_col(file_id, start)
+        end_line, end_col = self.line_col(file_id, end)
+        return Location(self._paths[file_id], line, col, end_line, end_col)
+
+
+# 进程内唯一的登记表
+SOURCES = SourceRegistry()
+
+
+def resolve_span(span: Optional[int]) -> Optional[Location]:
+    return None if span is None else SOURCES.resolve(span)
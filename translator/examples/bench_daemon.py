@@ -0,0 +1,74 @@
+"""
+单个小文件的翻译延迟：每次起一个新进程 vs 常驻 daemon。
+
+    python -m translator.examples.bench_daemon                  # 默认 dataset/test.c
+    python -m translator.examples.bench_daemon path/to/file.c -n 20
+
+三种方式：
+  cold     python -m translator.cli.batch FILE -j 1   （解释器 + clang 绑定 + libclang + Index 每次都来一遍）
+  client   python -m translator.cli.client FILE       （新进程，但只有解释器启动，活在 daemon 里做）
+  request  进程内直接 client.request(...)             （纯粹的 parse + lower + emit + socket 往返）
+
+daemon 在临时 socket 上启动，结束时关掉；三种方式的输出逐字比较。
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from translator.cli.client import request, spawn_daemon
+
+
+def _median_ms(fn, n: int) -> float:
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("source", nargs="?", default="dataset/test.c")
+    ap.add_argument("-n", "--repeat", type=int, default=10)
+    ns = ap.parse_args()
+
+    path = os.path.abspath(ns.source)
+    sock_dir = tempfile.mkdtemp(prefix="translator-bench-")
+    sock = os.path.join(sock_dir, "daemon.sock")
+    spawn_daemon(sock)
+    try:
+        with tempfile.TemporaryDirectory() as out_dir:
+            cold_cmd = [sys.executable, "-m", "translator.cli.batch", path, "-j", "1", "-o", out_dir]
+            client_cmd = [sys.executable, "-m", "translator.cli.client", path, "--socket", sock]
+            req = {"op": "translate", "path": path}
+
+            subprocess.run(cold_cmd, check=True, capture_output=True)
+            with open(os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + ".carbon"),
+                      encoding="utf-8") as f:
+                expected = f.read()
+            via_client = subprocess.run(client_cmd, check=True, capture_output=True, text=True).stdout
+            via_request = request(req, sock)["output"]
+            if via_client != expected + "\n" or via_request != expected:
+                raise SystemExit("output mismatch between cold run and daemon")
+
+            t_cold = _median_ms(lambda: subprocess.run(cold_cmd, check=True, capture_output=True), ns.repeat)
+            t_client = _median_ms(lambda: subprocess.run(client_cmd, check=True, capture_output=True), ns.repeat)
+            t_req = _median_ms(lambda: request(req, sock), ns.repeat)
+    finally:
+        request({"op": "shutdown"}, sock)
+        shutil.rmtree(sock_dir, ignore_errors=True)
+
+    print(f"{os.path.basename(path)}: cold {t_cold:8.1f} ms   client {t_client:8.1f} ms "
+          f"({t_cold / t_client:.1f}x)   request {t_req:8.2f} ms ({t_cold / t_req:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+CarbonEmitter：按行拼列表（buffered=False） vs 写进单个缓冲 / 流（默认）。
+
+    python -m translator.examples.bench_emit                   # 合成的大函数 + 深层嵌套
+    python -m translator.examples.bench_emit dataset/test.c    # 用真实文件
+    python -m translator.examples.bench_emit --stmts 20000 --nest 400
+    python -m translator.examples.bench_emit --layers 50        # 规则叠 50 层 overlay
+
+每种方式的输出逐字比较，不一致直接报错；另外用一个 overlay 换掉 Assign 规则，
+确认自定义规则（原签名，返回行列表）在缓冲模式下输出也不变。
+--layers 时规则集是 DEFAULT_CARBON_RULES 上再叠 N 层（每层重新登记同样的默认规则），
+编译后的分派和层数无关，计时应该和不叠层时一样。
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+
+from translator.backend.carbon_emitter import CarbonEmitter, emit_assign
+from translator.backend.carbon_rules import DEFAULT_CARBON_RULES
+from translator.backend.ruleset import RuleSet
+from translator.examples.bench_flat_ir import _median_ms, synthetic_function
+from translator.ir.nodes import Assign, BinOp, Binary, Block, Function, Literal, Return, Var, While
+from translator.ir.types import Type
+
+
+def nested_function(depth: int, per_level: int = 4) -> Function:
+    """while 套 while，每层几条赋值：列表路径每层都要把内层的行再拷贝一遍。"""
+    i32, b = Type.i32(), Type.bool()
+    x = Var(ty=i32, name="x")
+    cond = Binary(ty=b, op=BinOp.LT, lhs=x, rhs=Literal(ty=i32, value=10))
+    step = Assign(target=x, value=Binary(ty=i32, op=BinOp.ADD, lhs=x, rhs=Literal(ty=i32, value=1)))
+    body = Block(stmts=[step] * per_level)
+    for _ in range(depth):
+        body = Block(stmts=[*([step] * per_level), While(cond=cond, body=body)])
+    return Function(name="nested", params=[], ret_ty=i32, body=Block(stmts=[*body.stmts, Return(value=x)]))
+
+
+def _emit_assign_commented(emitter, stmt, indent):
+    return [*emit_assign(emitter, stmt, indent), "  " * indent + "// assign"]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("source", nargs="?", default=None, help="C file to lower (default: synthetic functions)")
+    ap.add_argument("-I", dest="include_dirs", action="append", default=[])
+    ap.add_argument("--stmts", type=int, default=2000)
+    ap.add_argument("--depth", type=int, default=6)
+    ap.add_argument("--nest", type=int, default=200, help="nesting depth of the second synthetic function")
+    ap.add_argument("--layers", type=int, default=0, help="stack this many overlays on the default rules")
+    ap.add_argument("-n", "--repeat", type=int, default=5)
+    ns = ap.parse_args()
+
+    if ns.source is None:
+        cases = [("flat", [synthetic_function(ns.stmts, ns.depth)]), ("nested", [nested_function(ns.nest)])]
+    else:
+        from translator.frontend.clang_frontend import lower_file
+        args = ["-std=c11", *(f"-I{d}" for d in ns.include_dirs)]
+        cases = [(os.path.basename(ns.source), lower_file(ns.source, args=args))]
+
+    rules = DEFAULT_CARBON_RULES
+    for _ in range(ns.layers):
+        rules = rules.overlay(RuleSet(expr_emitters=dict(DEFAULT_CARBON_RULES.expr_emitters),
+                                      stmt_emitters=dict(DEFAULT_CARBON_RULES.stmt_emitters)))
+    lists = CarbonEmitter(rules=rules, buffered=False)
+    buffered = CarbonEmitter(rules=rules)
+    custom = DEFAULT_CARBON_RULES.overlay(RuleSet(expr_emitters={}, stmt_emitters={Assign: _emit_assign_commented}))
+
+    with open(os.devnull, "w") as devnull:
+        for name, fns in cases:
+            for fn in fns:
+                expected = lists.emit_function(fn)
+                out = io.StringIO()
+                buffered.write_function(fn, out)
+                if buffered.emit_function(fn) != expected or out.getvalue() != expected:
+                    raise SystemExit(f"output mismatch in {fn.name}")
+                if (CarbonEmitter(custom).emit_function(fn)
+                        != CarbonEmitter(custom, buffered=False).emit_function(fn)):
+                    raise SystemExit(f"overlay output mismatch in {fn.name}")
+
+            t_list = _median_ms(lambda: [lists.emit_function(fn) for fn in fns], ns.repeat)
+            t_buf = _median_ms(lambda: [buffered.emit_function(fn) for fn in fns], ns.repeat)
+            t_stream = _median_ms(lambda: [buffered.write_function(fn, devnull) for fn in fns], ns.repeat)
+            size = sum(len(lists.emit_function(fn)) for fn in fns)
+            print(f"{name:<10} {size / 1024:9.1f} KiB   list {t_list:8.2f} ms   buffer {t_buf:8.2f} ms "
+                  f"({t_list / t_buf:.2f}x)   stream {t_stream:8.2f} ms ({t_list / t_stream:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
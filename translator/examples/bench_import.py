@@ -0,0 +1,88 @@
+"""
+启动开销：新进程从启动到做完一件小事的耗时。
+
+    python -m translator.examples.bench_import
+    python -m translator.examples.bench_import -n 20
+
+  python      空解释器（基线）
+  ir-only     demo_ir -> CarbonEmitter，不应该 import clang（会检查）
+  demo-cli    python -m translator.cli.translate --demo
+  full        import clang_frontend + create_index()（pip 的 libclang 包或磁盘缓存里的路径）
+  full-cold   同上，但每次都清掉 libclang 路径缓存（重新查找候选目录）
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_IR_ONLY = """
+import sys
+from translator.backend.carbon_emitter import CarbonEmitter
+from translator.backend.carbon_rules import DEFAULT_CARBON_RULES
+from translator.frontend.demo_ir import build_demo_ir
+CarbonEmitter(rules=DEFAULT_CARBON_RULES).emit_function(build_demo_ir())
+if any(m == "clang" or m.startswith("clang.") for m in sys.modules):
+    raise SystemExit("IR-only path imported clang")
+"""
+
+_FULL = """
+import translator.frontend.clang_frontend
+from translator.frontend.libclang import create_index
+create_index()
+"""
+
+
+def _median_ms(cmd: list[str], n: int, env: dict, before=None) -> float:
+    times = []
+    for _ in range(n):
+        if before is not None:
+            before()
+        t0 = time.perf_counter()
+        subprocess.run(cmd, check=True, env=env, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", "--repeat", type=int, default=10)
+    ns = ap.parse_args()
+
+    py = sys.executable
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, "libclang.json")
+        env = {**os.environ, "TRANSLATOR_LIBCLANG_CACHE": cache}
+
+        def drop_cache() -> None:
+            try:
+                os.unlink(cache)
+            except OSError:
+                pass
+
+        cases = [
+            ("python", [py, "-c", "pass"], None),
+            ("ir-only", [py, "-c", _IR_ONLY], None),
+            ("demo-cli", [py, "-m", "translator.cli.translate", "--demo"], None),
+            ("full", [py, "-c", _FULL], None),
+            ("full-cold", [py, "-c", _FULL], drop_cache),
+        ]
+        # 先各跑一遍：检查能跑通，顺便建好 .pyc 和 libclang 路径缓存
+        for _, cmd, _ in cases:
+            subprocess.run(cmd, check=True, env=env, stdout=subprocess.DEVNULL)
+        base = None
+        for name, cmd, before in cases:
+            t = _median_ms(cmd, ns.repeat, env, before)
+            if base is None:
+                base = t
+                print(f"{name:<10} {t:8.1f} ms")
+            else:
+                print(f"{name:<10} {t:8.1f} ms   (+{t - base:.1f} ms over bare python)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+IR 内存占用：lower 一个文件，统计 IR 节点数、每个节点的平均字节数和进程峰值 RSS。
+
+    python -m translator.examples.bench_ir_memory dataset/random1.c -I /path/to/csmith/include
+
+lowering 还不支持的函数会跳过并计数，不影响统计其余函数。
+"""
+from __future__ import annotations
+
+import argparse
+import resource
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+from translator.common.diagnostics import Diagnostic
+from translator.frontend.ast_snapshot import AstSnapshot
+from translator.frontend.clang_frontend import function_definitions, parse_file
+from translator.frontend.clang_to_ir import lower_function
+from translator.frontend.libclang import create_index
+from translator.ir.nodes import Function, Stmt, expr_children
+from translator.ir.types import Type
+
+
+def _stmt_children(s: Stmt) -> list:
+    out = []
+    for name in getattr(type(s), "__dataclass_fields__", ()):
+        if name == "span":
+            continue
+        v = getattr(s, name)
+        if isinstance(v, list):
+            out.extend(v)
+        elif v is not None and not isinstance(v, (str, Type)):
+            out.append(v)
+    return out
+
+
+def count_nodes(fns: list[Function]) -> tuple[Counter, int]:
+    """按类名统计 IR 节点个数；返回 (计数, 节点本身占用的字节数)。共享的节点只算一次。"""
+    seen: set[int] = set()
+    counts: Counter = Counter()
+    size = 0
+    stack: list = list(fns)
+    while stack:
+        n = stack.pop()
+        if id(n) in seen:
+            continue
+        seen.add(id(n))
+        counts[type(n).__name__] += 1
+        size += sys.getsizeof(n)
+        if hasattr(n, "__dict__"):
+            size += sys.getsizeof(n.__dict__)
+        # span 是每个节点独有的 int，算进节点本身
+        span = getattr(n, "span", None)
+        if span is not None:
+            size += sys.getsizeof(span)
+        if isinstance(n, Function):
+            stack.extend(n.params)
+            stack.append(n.body)
+            stack.append(n.ret_ty)
+        elif isinstance(n, Stmt):
+            stack.extend(_stmt_children(n))
+        elif isinstance(n, Type):
+            pass
+        else:
+            stack.append(n.ty)
+            stack.extend(expr_children(n))
+    return counts, size
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("source", nargs="?", default="dataset/random1.c")
+    ap.add_argument("-I", dest="include_dirs", action="append", default=[])
+    ns = ap.parse_args()
+
+    args = ["-std=c11", *(f"-I{d}" for d in ns.include_dirs)]
+    tu = parse_file(ns.source, index=create_index(), args=args)
+    snap = AstSnapshot.build(tu, function_definitions(tu))
+    del tu
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fns: list[Function] = []
+    skipped = 0
+    for c in snap.root_cursors():
+        try:
+            fns.append(lower_function(c))
+        except (AssertionError, NotImplementedError, KeyError, ValueError, Diagnostic):
+            skipped += 1
+    dt = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    counts, size = count_nodes(fns)
+    total = sum(counts.values())
+    # Linux 上 ru_maxrss 单位是 KiB，macOS 上是字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mib = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+    print(f"source        : {ns.source}")
+    print(f"functions     : {len(fns)} lowered, {skipped} skipped")
+    print(f"lowering      : {dt * 1000:8.2f} ms")
+    print(f"ir nodes      : {total}")
+    for name, n in counts.most_common():
+        print(f"  {name:<12}: {n}")
+    if total:
+        print(f"node bytes    : {size} ({size / total:.1f} B/node, objects only)")
+        print(f"traced        : {current} B live, {peak} B peak ({current / total:.1f} B/node incl. lists)")
+    print(f"peak rss      : {rss_mib:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+PCH 解析耗时对比：同一个文件分别用普通解析和 `-include-pch` 解析 N 次。
+
+    python -m translator.examples.bench_pch dataset/random1.c -I /path/to/csmith/include
+
+csmith.h 不在仓库里，需要用 -I 指向 csmith 的 runtime 目录。
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from clang import cindex
+
+from translator.frontend.libclang import create_index
+from translator.frontend.pch import build_pch
+
+
+def _time_parse(index: cindex.Index, filename: str, args: list[str], repeat: int) -> list[float]:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        tu = index.parse(filename, args=args)
+        out.append(time.perf_counter() - t0)
+        errors = [d for d in tu.diagnostics if d.severity >= cindex.Diagnostic.Error]
+        if errors:
+            raise SystemExit(f"parse error: {errors[0]}")
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("source", nargs="?", default="dataset/random1.c")
+    ap.add_argument("-I", dest="include_dirs", action="append", default=[])
+    ap.add_argument("--header", action="append", default=None, help="headers to precompile (default: csmith.h)")
+    ap.add_argument("-n", "--repeat", type=int, default=10)
+    ns = ap.parse_args()
+
+    args = ["-std=c11", *(f"-I{d}" for d in ns.include_dirs)]
+    headers = ns.header or ["csmith.h"]
+    index = create_index()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        pch = build_pch(headers, args, index=index, out_dir=tmp)
+        build = time.perf_counter() - t0
+
+        plain = _time_parse(index, ns.source, args, ns.repeat)
+        with_pch = _time_parse(index, ns.source, pch.parse_args(args), ns.repeat)
+
+    p, q = statistics.median(plain), statistics.median(with_pch)
+    print(f"source        : {ns.source}")
+    print(f"pch build     : {build * 1000:8.2f} ms (once per run)")
+    print(f"parse         : {p * 1000:8.2f} ms median of {ns.repeat}")
+    print(f"parse + pch   : {q * 1000:8.2f} ms median of {ns.repeat}")
+    print(f"delta         : {(p - q) * 1000:8.2f} ms/file ({p / q:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
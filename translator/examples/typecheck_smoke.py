@@ -1,27 +1,18 @@
 from __future__ import annotations
 
+import dataclasses
+import sys
+
 from translator.common.diagnostics import Diagnostic
-from translator.ir.typecheck import typecheck_function
+from translator.ir.typecheck import collect_diagnostics
 from translator.ir.types import Type
 from translator.ir.nodes import (
     Function, Block,
     VarDecl, Assign, Return, If, While,
-    Var, Literal, Binary, Unary, Cast,
+    Var, Literal, Binary, Unary,
     BinOp, UnOp,
 )
 
-# ---------- helpers ----------
-
-def run_case(name: str, fn: Function) -> None:
-    print(f"\n=== CASE: {name} ===")
-    try:
-        typecheck_function(fn)
-        print("PASS (typecheck ok)")
-    except Diagnostic as e:
-        print("FAIL (typecheck rejected)")
-        print(str(e))
-
-
 # ---------- cases ----------
 
 def case_ok() -> Function:
@@ -163,17 +154,38 @@ def case_unary_not_operand_not_bool() -> Function:
     return Function(name="main", params=[], ret_ty=Type.i32(), body=body)
 
 
+CASES = [
+    ("OK baseline", case_ok, False),
+    ("IF condition not Bool", case_if_cond_not_bool, True),
+    ("Assign type mismatch", case_assign_type_mismatch, True),
+    ("Return type mismatch", case_return_type_mismatch, True),
+    ("Logical operands not Bool", case_logical_operands_not_bool, True),
+    ("Comparison result not Bool", case_comparison_result_not_bool, True),
+    ("Bad literal python type", case_bad_literal_python_type, True),
+    ("Unary NOT operand not Bool", case_unary_not_operand_not_bool, True),
+]
+
+
 def main() -> None:
-    run_case("OK baseline", case_ok())
-    run_case("IF condition not Bool", case_if_cond_not_bool())
-    run_case("Assign type mismatch", case_assign_type_mismatch())
-    run_case("Return type mismatch", case_return_type_mismatch())
-    run_case("Logical operands not Bool", case_logical_operands_not_bool())
-    run_case("Comparison result not Bool", case_comparison_result_not_bool())
-    run_case("Bad literal python type", case_bad_literal_python_type())
-
-    # 如果你实现了 Unary/UnOp.NOT 且 typecheck 支持，可以打开这一行
-    run_case("Unary NOT operand not Bool", case_unary_not_operand_not_bool())
+    # 收集模式：所有 case 一遍检查完，函数名就是 case 名
+    fns = [dataclasses.replace(build(), name=name) for name, build, _ in CASES]
+    diags = collect_diagnostics(fns)
+    by_fn: dict[str, list[Diagnostic]] = {}
+    for d in diags:
+        by_fn.setdefault(d.function, []).append(d)
+
+    bad = 0
+    for name, _, expect_error in CASES:
+        got = by_fn.get(name, [])
+        ok = bool(got) == expect_error
+        bad += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+        for d in got:
+            print(f"      {d.code.value}: {d.message}")
+
+    if "--json" in sys.argv[1:]:
+        print(diags.to_json(indent=2))
+    print(f"\n{len(CASES) - bad}/{len(CASES)} cases behave as expected, {len(diags)} diagnostics")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+"""
+libclang AST 的扁平快照（struct-of-arrays）。
+
+lowering 时反复调用 cursor.get_children() / extent / spelling，每次都是一次
+ctypes FFI 调用。这里一次遍历就把需要的东西全部拷进几个平行数组：
+
+    kind[i]        CursorKind id
+    parent[i]      父节点下标（根为 -1）
+    first_child[i] 子节点起始下标（同一个父节点的子节点下标连续）
+    n_children[i]  子节点个数
+    start[i]/end[i] extent 的文件 offset
+    spelling[i]    在 strings 表里的下标（字符串去重）
+    file[i]        所在文件在 files 表里的下标（对应一份 TokenIndex）
+
+files 里的每个文件同时登记进 translator.common.source.SOURCES（source_ids），
+SnapCursor.span() 直接从 start / end 打包出 IR 节点的 span。
+
+之后 lower_function 通过 SnapCursor（只实现 lowering 用到的那部分 Cursor 接口）
+在纯 Python 里跑，TranslationUnit 可以立刻释放。
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Iterable, Iterator
+
+from clang.cindex import CursorKind
+
+from translator.common.source import SOURCES
+from translator.frontend.token_index import TokenIndex, extent_offsets, token_index_for
+
+# 只有这些 kind 的 spelling 会被 lowering 用到，其余节点不去取，省掉 FFI
+_SPELLING_KINDS = frozenset(
+    k.value for k in (
+        CursorKind.FUNCTION_DECL,
+        CursorKind.VAR_DECL,
+        CursorKind.PARM_DECL,
+        CursorKind.FIELD_DECL,
+        CursorKind.DECL_REF_EXPR,
+        CursorKind.MEMBER_REF_EXPR,
+        CursorKind.CALL_EXPR,
+        CursorKind.TYPE_REF,
+    )
+)
+
+
+class AstSnapshot:
+    __slots__ = (
+        "filename", "files", "file_tokens", "source_ids", "strings", "roots", "definitions",
+        "kind", "parent", "first_child", "n_children", "start", "end", "spelling", "file",
+    )
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.files: list[str] = []
+        self.file_tokens: list[TokenIndex | None] = []
+        # files 下标 -> SOURCES 里的 file_id，预先移到 span 里 file_id 的位置
+        self.source_ids: list[int] = []
+        self.strings: list[str] = [""]
+        self.roots: list[int] = []
+        self.definitions: set[int] = set()
+        self.kind = array("H")
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.n_children = array("i")
+        self.start = array("I")
+        self.end = array("I")
+        self.spelling = array("i")
+        self.file = array("H")
+
+    @staticmethod
+    def build(tu, cursors: Iterable) -> "AstSnapshot":
+        """
+        对 cursors（通常是主文件里的函数定义）各自的子树做一次遍历。
+        同一个父节点的子节点一次性分配连续下标，所以 children 就是一个区间。
+        """
+        snap = AstSnapshot(tu.spelling)
+        interned: dict[str, int] = {"": 0}
+        file_ids: dict[str, int] = {}
+
+        kind, parent = snap.kind, snap.parent
+        first_child, n_children = snap.first_child, snap.n_children
+        start, end, spelling, file = snap.start, snap.end, snap.spelling, snap.file
+        strings = snap.strings
+
+        def alloc(c, parent_id: int, file_id: int) -> int:
+            i = len(kind)
+            k = c._kind_id
+            kind.append(k)
+            parent.append(parent_id)
+            first_child.append(0)
+            n_children.append(0)
+            lo, hi = extent_offsets(c.extent)
+            start.append(lo)
+            end.append(hi)
+            sid = 0
+            if k in _SPELLING_KINDS:
+                s = c.spelling
+                sid = interned.get(s)
+                if sid is None:
+                    sid = len(strings)
+                    strings.append(s)
+                    interned[s] = sid
+            spelling.append(sid)
+            file.append(file_id)
+            return i
+
+        stack = []
+        for c in cursors:
+            f = c.extent.start.file
+            name = f.name if f is not None else ""
+            fid = file_ids.get(name)
+            if fid is None:
+                fid = len(snap.files)
+                file_ids[name] = fid
+                snap.files.append(name)
+                snap.file_tokens.append(token_index_for(c))
+                snap.source_ids.append(SOURCES.file_id(name) << 64)
+            i = alloc(c, -1, fid)
+            snap.roots.append(i)
+            if c.is_definition():
+                snap.definitions.add(i)
+            stack.append((c, i))
+
+        while stack:
+            c, i = stack.pop()
+            kids = list(c.get_children())
+            if not kids:
+                continue
+            first = len(kind)
+            first_child[i] = first
+            n_children[i] = len(kids)
+            fid = file[i]
+            for k in kids:
+                alloc(k, i, fid)
+            for offset, k in enumerate(kids):
+                stack.append((k, first + offset))
+        return snap
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def cursor(self, i: int) -> "SnapCursor":
+        return SnapCursor(self, i)
+
+    def root_cursors(self) -> list["SnapCursor"]:
+        return [SnapCursor(self, i) for i in self.roots]
+
+
+class _Location:
+    __slots__ = ("offset",)
+
+    def __init__(self, offset: int):
+        self.offset = offset
+
+
+class _Extent:
+    __slots__ = ("start", "end")
+
+    def __init__(self, start: int, end: int):
+        self.start = _Location(start)
+        self.end = _Location(end)
+
+
+class _Token:
+    __slots__ = ("spelling", "extent")
+
+    def __init__(self, spelling: str, start: int, end: int):
+        self.spelling = spelling
+        self.extent = _Extent(start, end)
+
+
+class SnapCursor:
+    """快照里一个节点的只读视图，接口对齐 lowering 用到的 clang.cindex.Cursor 子集。"""
+
+    __slots__ = ("snap", "i")
+
+    def __init__(self, snap: AstSnapshot, i: int):
+        self.snap = snap
+        self.i = i
+
+    @property
+    def kind(self) -> CursorKind:
+        return CursorKind.from_id(self.snap.kind[self.i])
+
+    @property
+    def spelling(self) -> str:
+        return self.snap.strings[self.snap.spelling[self.i]]
+
+    @property
+    def extent(self) -> _Extent:
+        return _Extent(self.snap.start[self.i], self.snap.end[self.i])
+
+    @property
+    def token_index(self) -> TokenIndex | None:
+        return self.snap.file_tokens[self.snap.file[self.i]]
+
+    def span(self) -> int:
+        """打包好的源码位置（见 translator.common.source）。"""
+        snap, i = self.snap, self.i
+        return snap.source_ids[snap.file[i]] | (snap.start[i] << 32) | snap.end[i]
+
+    def is_definition(self) -> bool:
+        return self.i in self.snap.definitions
+
+    def get_children(self) -> Iterator["SnapCursor"]:
+        snap = self.snap
+        first = snap.first_child[self.i]
+        for j in range(first, first + snap.n_children[self.i]):
+            yield SnapCursor(snap, j)
+
+    def get_tokens(self) -> Iterator[_Token]:
+        # TU 已经释放，只能从快照的 token 表里取
+        tokens = self.token_index
+        if tokens is None:
+            return
+        lo, hi = self.snap.start[self.i], self.snap.end[self.i]
+        for i in tokens.range(lo, hi):
+            yield _Token(tokens.spellings[i], tokens.starts[i], tokens.ends[i])
@@ -1,20 +1,186 @@
+import io
+from typing import Iterator, TextIO
+
 from clang import cindex
 from clang.cindex import Cursor, CursorKind
 from translator.frontend.clang_to_ir import *
 from translator.frontend.clang_to_ir import lower_function
-from translator.ir.typecheck import typecheck_function
+from translator.ir.typecheck import collect_diagnostics, typecheck_function
 from translator.backend.carbon_rules import DEFAULT_CARBON_RULES
 from translator.backend.carbon_emitter import CarbonEmitter
-
-cindex.Config.set_library_file(
-    "/opt/homebrew/opt/llvm/lib/libclang.dylib"
+from translator.common.diagnostics import Diagnostic, DiagnosticBag, ErrorCode
+from translator.frontend.ast_snapshot import AstSnapshot
+from translator.frontend.ir_cache import IRCache
+from translator.frontend.pch import PrecompiledHeader
+from translator.frontend.libclang import create_index
+from translator.frontend.selection import (
+    ALL_FUNCTIONS, DEFAULT_ARGS, FunctionSelection, default_args, parse_profile, select_functions,
 )
+from translator.ir.fold import fold_function
+from translator.ir.hashcons import ExprTable
+from translator.ir.nodes import Function
+from translator.pipeline import check_and_emit, emit_functions, write_functions
+
+def parse_file(filename: str, index: cindex.Index | None = None, args=None, options: int = 0,
+               unsaved_files=None) -> cindex.TranslationUnit:
+    """
+    解析一个源文件；有 error 级别的 clang 诊断时直接报 E_PARSE。
+    args 为 None 时按后缀用 selection.default_args。
+    unsaved_files 同 libclang：[(路径, 内容)]，用内存里的内容代替磁盘上的文件。
+    """
+    if index is None:
+        index = create_index()
+    tu = index.parse(filename, args=default_args(filename) if args is None else args, options=options,
+                     unsaved_files=unsaved_files)
+    check_parse_errors(tu)
+    return tu
+
+def check_parse_errors(tu: cindex.TranslationUnit) -> None:
+    for d in tu.diagnostics:
+        if d.severity >= cindex.Diagnostic.Error:
+            loc = d.location
+            where = f"{loc.file.name if loc.file else tu.spelling}:{loc.line}:{loc.column}"
+            raise Diagnostic(ErrorCode.E_PARSE, d.spelling, node_hint=where)
+
+def function_definitions(tu: cindex.TranslationUnit, selection: FunctionSelection = ALL_FUNCTIONS):
+    """最外层的函数定义（跳过只有声明的原型）；默认只要主文件里的。"""
+    return select_functions(tu, selection)
+
+def cache_args(filename: str, args=None, selection: FunctionSelection = ALL_FUNCTIONS,
+               profile: str = "default", share: bool = False) -> list[str]:
+    """
+    IR 缓存的 key 参数：clang 参数加上所有会改变 lowering 结果的选项。
+    iter_lower_file 读写缓存、invalidate_cached 删条目都用它，两边算出来的 key 才一致。
+    """
+    out = [*(default_args(filename) if args is None else args), *selection.cache_tag()]
+    # profile 会改变哪些函数能被 lower（fast 跳过头文件里的函数体），也要进 key
+    out.append(f"#profile={profile}")
+    if share:
+        out.append("#share")
+    return out
+
+def invalidate_cached(filename: str, cache: IRCache, args=None, selection: FunctionSelection = ALL_FUNCTIONS,
+                      profile: str = "default", share: bool = False) -> bool:
+    """删掉 filename 按这组选项 lower 的缓存条目（参数同 iter_lower_file），返回是否真的删了。"""
+    return cache.invalidate(filename, cache_args(filename, args, selection, profile, share))
+
+def iter_lower_file(filename: str, index: cindex.Index | None = None, args=None, cache: IRCache | None = None,
+                    pch: PrecompiledHeader | None = None, selection: FunctionSelection = ALL_FUNCTIONS,
+                    profile: str = "default", share: bool = False, unsaved_files=None) -> Iterator[Function]:
+    """
+    parse + lower 一个文件，按源码顺序一次产出一个函数的 IR。
+    给了 cache 时先查缓存，命中就完全不碰 libclang；未命中则解析，全部产出后
+    把结果连同 #include 依赖一起写回缓存（这时 IR 需要留到最后）。
+    pch 只影响解析速度，不进缓存 key（pch 的依赖照样参与校验）。
+    selection 决定 lower 哪些函数，profile 是 selection.PARSE_PROFILES 里的解析选项。
+    share=True 时表达式经过 hash-consing（整个文件一张 ExprTable），重复子树只保留一份。
+    常量折叠不在这里做：要等 typecheck 之后（见 pipeline.check_and_emit 的 optimize）。
+    unsaved_files 见 parse_file；给了就不查也不写缓存（缓存按磁盘内容做 key）。
+    """
+    args = default_args(filename) if args is None else args
+    if unsaved_files:
+        cache = None
+    key_args = cache_args(filename, args, selection, profile, share)
+    if cache is not None:
+        cached = cache.get(filename, key_args)
+        if cached is not None:
+            yield from cached
+            return
+
+    parse_args = args if pch is None else pch.parse_args(args)
+    tu = parse_file(filename, index=index, args=parse_args, options=parse_profile(profile).options,
+                    unsaved_files=unsaved_files)
+    deps = [inc.include.name for inc in tu.get_includes()] if cache is not None else []
 
-def dump_ast(filename: str):
-    index = cindex.Index.create()
+    functions: list[Function] | None = [] if cache is not None else None
+    table = ExprTable() if share else None
+    # 每次只把一个函数的子树拷进快照再 lower：TU 要活到最后一个函数，
+    # 但同一时刻只有一个函数的快照和 IR（有 cache 时 IR 要攒着写缓存）
+    for root in function_definitions(tu, selection):
+        snap = AstSnapshot.build(tu, [root])
+        fn = lower_function(snap.cursor(snap.roots[0]))
+        del snap
+        if table is not None:
+            fn = table.share_function(fn)
+        if functions is not None:
+            functions.append(fn)
+        yield fn
+        del fn
+
+    del tu
+    if cache is not None:
+        if pch is not None:
+            deps.extend(pch.deps)
+        cache.put(filename, key_args, functions, deps=deps)
+
+def lower_file(filename: str, index: cindex.Index | None = None, args=None, cache: IRCache | None = None,
+               pch: PrecompiledHeader | None = None, selection: FunctionSelection = ALL_FUNCTIONS,
+               profile: str = "default", share: bool = False, unsaved_files=None) -> list[Function]:
+    """iter_lower_file 的列表版本。"""
+    return list(iter_lower_file(filename, index=index, args=args, cache=cache, pch=pch,
+                                selection=selection, profile=profile, share=share,
+                                unsaved_files=unsaved_files))
+
+def translate_file(filename: str, index: cindex.Index | None = None, args=None, check: bool = True,
+                   cache: IRCache | None = None, pch: PrecompiledHeader | None = None,
+                   function_jobs: int | None = 1, selection: FunctionSelection = ALL_FUNCTIONS,
+                   profile: str = "default", share: bool = False, optimize: bool = False,
+                   unsaved_files=None) -> str:
+    """
+    一个文件走完整条流水线：parse -> lower -> typecheck -> (fold) -> emit。
+    function_jobs != 1 时 TU 只 lower 一次，之后按函数并行 typecheck + emit。
+    optimize=True 时在 typecheck 之后做常量折叠（translator.ir.fold）。
+    """
+    if function_jobs == 1:
+        out = io.StringIO()
+        translate_to_stream(filename, out, index=index, args=args, check=check, cache=cache, pch=pch,
+                            selection=selection, profile=profile, share=share, optimize=optimize,
+                            unsaved_files=unsaved_files)
+        return out.getvalue()
+    fns = lower_file(filename, index=index, args=args, cache=cache, pch=pch,
+                     selection=selection, profile=profile, share=share, unsaved_files=unsaved_files)
+    return "\n\n".join(emit_functions(fns, jobs=function_jobs, check=check, dag=share, optimize=optimize))
+
+def translate_to_stream(filename: str, out: TextIO, index: cindex.Index | None = None, args=None,
+                        check: bool = True, cache: IRCache | None = None, pch: PrecompiledHeader | None = None,
+                        selection: FunctionSelection = ALL_FUNCTIONS, profile: str = "default",
+                        share: bool = False, optimize: bool = False, unsaved_files=None) -> int:
+    """
+    流式版本：lower -> typecheck -> emit -> 写出 一次只处理一个函数，写完就丢掉它的快照和 IR。
+    峰值内存是 TU 本身加上最大的一个函数；给了 cache 时整个文件的 IR 要留到写缓存为止。返回函数个数。
+    """
+    fns = iter_lower_file(filename, index=index, args=args, cache=cache, pch=pch,
+                          selection=selection, profile=profile, share=share, unsaved_files=unsaved_files)
+    return write_functions(fns, out, check=check, dag=share, optimize=optimize)
+
+def check_file(filename: str, index: cindex.Index | None = None, args=None, cache: IRCache | None = None,
+               pch: PrecompiledHeader | None = None, selection: FunctionSelection = ALL_FUNCTIONS,
+               profile: str = "default", max_errors: int | None = None,
+               unsaved_files=None) -> DiagnosticBag:
+    """
+    只做 parse -> lower -> typecheck，并且不在第一个错误处停下：
+    返回整个文件的所有诊断（最多 max_errors 条）。
+    解析错误和 lowering 失败也记成一条诊断；lowering 失败时这个文件后面的函数不再检查。
+    """
+    diags = DiagnosticBag(limit=max_errors)
+    fns = iter_lower_file(filename, index=index, args=args, cache=cache, pch=pch,
+                          selection=selection, profile=profile, unsaved_files=unsaved_files)
+    try:
+        collect_diagnostics(fns, diags=diags)
+    except (Diagnostic, NotImplementedError) as e:
+        # 出错时正在取下一个函数，不属于上一个函数
+        diags.function = None
+        diags.add(e if isinstance(e, Diagnostic) else Diagnostic(ErrorCode.E_INTERNAL, f"cannot lower: {e}"))
+    return diags
+
+def dump_ast(filename: str, index: cindex.Index | None = None, selection: FunctionSelection = ALL_FUNCTIONS,
+             profile: str = "default", optimize: bool = False):
+    if index is None:
+        index = create_index()
     tu = index.parse(
         filename,
-        args=["-std=c11"],
+        args=default_args(filename),
+        options=parse_profile(profile).options,
     )
 
     def visit(node, indent=0):
@@ -22,19 +188,26 @@ def dump_ast(filename: str):
         for c in node.get_children():
             visit(c, indent + 1)
 
-    visit(tu.cursor)
-
+    # 只打印主文件里的顶层声明，头文件里成千上万的声明没意义
+    print("", tu.cursor.kind, tu.cursor.spelling, getattr(tu.cursor.type, "spelling", ""))
     for c in tu.cursor.get_children():
-        if c.kind == CursorKind.FUNCTION_DECL :
-            fn = lower_function(c)
-            #typecheck_function(fn)
-            emitter = CarbonEmitter(rules=DEFAULT_CARBON_RULES)
-            code = emitter.emit_function(fn)
-            print("=== Carbon ===")
-            print(code)
+        if selection.main_file_only and (c.location.file is None or c.location.file.name != tu.spelling):
+            continue
+        visit(c, 1)
+
+    for c in function_definitions(tu, selection):
+        fn = lower_function(c)
+        if optimize:
+            # 和流水线一样，只折叠检查过的 IR
+            typecheck_function(fn)
+            fn = fold_function(fn)
+        #typecheck_function(fn)
+        emitter = CarbonEmitter(rules=DEFAULT_CARBON_RULES)
+        code = emitter.emit_function(fn)
+        print("=== Carbon ===")
+        print(code)
 
 
 if __name__ == "__main__":
     dump_ast("dataset/test.c")
-    
 
@@ -1,4 +1,7 @@
 from clang.cindex import Cursor, CursorKind
+from translator.common.source import SOURCES, pack_span
+from translator.frontend.ast_snapshot import SnapCursor
+from translator.frontend.token_index import TokenIndex, extent_offsets, token_index_for
 from translator.ir.nodes import Literal, Var, Binary
 from translator.ir.types import Type
 from translator.ir.nodes import BinOp
@@ -10,20 +13,37 @@ OPS = {"+", "-", "*", "/", "%", "<", "<=", ">", ">=", "==", "!=", "&&", "||", "=
 UNARY_OPS = {"++", "--"}
 COMPOUND_OPS = {"+=": "+", "-=": "-", "*=": "*", "/=": "/"}
 
-def _as_block_from_stmt_cursor(c):
+_IS_EXPRESSION: dict = {}
+
+def _is_expression(kind) -> bool:
+    # CursorKind.is_expression() 每次都是一次 FFI 调用，按 kind 缓存
+    r = _IS_EXPRESSION.get(kind)
+    if r is None:
+        r = _IS_EXPRESSION[kind] = kind.is_expression()
+    return r
+
+def _span(cur) -> int:
+    """cursor 的源码位置（打包的 span）；快照节点直接查数组，真实 Cursor 要走 FFI。"""
+    if isinstance(cur, SnapCursor):
+        return cur.span()
+    f = cur.extent.start.file
+    lo, hi = extent_offsets(cur.extent)
+    return pack_span(SOURCES.file_id(f.name if f is not None else ""), lo, hi)
+
+def _as_block_from_stmt_cursor(c, tokens: TokenIndex | None = None):
     if c.kind == CursorKind.COMPOUND_STMT:
-        return lower_block(c)
+        return lower_block(c, tokens)
     else:
-        s = lower_stmt(c)
+        s = lower_stmt(c, tokens)
         return Block(stmts=[] if s is None else [s])
 
-def _lower_maybe_stmt(c):
+def _lower_maybe_stmt(c, tokens: TokenIndex | None = None):
     if c is None:
         return None
-    return lower_stmt(c)
+    return lower_stmt(c, tokens)
 
-def _true_expr():
-    return Literal(ty=Type.bool(), value=True)
+def _true_expr(span: int | None = None):
+    return Literal(ty=Type.bool(), value=True, span=span)
 
 def _find_token(cur, candidates: set[str]) -> str | None:
     for tok in cur.get_tokens():
@@ -31,14 +51,31 @@ def _find_token(cur, candidates: set[str]) -> str | None:
             return tok.spelling
     return None
 
-def _unary_op(cur) -> str | None:
+def _unary_op(cur, tokens: TokenIndex | None = None) -> str | None:
+    # 运算符只可能在操作数前（++i）或后（i++），不用扫操作数本身
+    if tokens is not None:
+        kids = list(cur.get_children())
+        if len(kids) == 1:
+            ext, child = cur.extent, kids[0].extent
+            op = tokens.find(ext.start.offset, child.start.offset, UNARY_OPS)
+            if op is None:
+                op = tokens.find(child.end.offset, ext.end.offset, UNARY_OPS)
+            if op is not None:
+                return op
     return _find_token(cur, UNARY_OPS)
 
-def _compound_op(cur) -> str | None:
+def _compound_op(cur, tokens: TokenIndex | None = None) -> str | None:
+    if tokens is not None:
+        kids = list(cur.get_children())
+        if len(kids) == 2:
+            op = tokens.find(kids[0].extent.end.offset, kids[1].extent.start.offset, COMPOUND_OPS)
+            if op is not None:
+                return op
     return _find_token(cur, set(COMPOUND_OPS.keys()))
 
-def _binary_operator_spelling(cur: Cursor) -> str:
-    kids = list(cur.get_children())
+def _binary_operator_spelling(cur: Cursor, tokens: TokenIndex | None = None, kids=None) -> str:
+    if kids is None:
+        kids = list(cur.get_children())
     if len(kids) != 2:
         raise NotImplementedError("binary operator without exactly 2 children")
 
@@ -47,6 +84,12 @@ def _binary_operator_spelling(cur: Cursor) -> str:
     lhs_end = lhs.extent.end.offset
     rhs_start = rhs.extent.start.offset
 
+    # 快路径：在 TU 级 token 表里查 lhs 与 rhs 之间的运算符
+    if tokens is not None:
+        op = tokens.find(lhs_end, rhs_start, OPS)
+        if op is not None:
+            return op
+
     candidates = []
     for tok in cur.get_tokens():
         s = tok.spelling
@@ -90,12 +133,14 @@ _BINOP_MAP = {
 _BOOL_RESULT = {BinOp.LT, BinOp.LE, BinOp.GT, BinOp.GE, BinOp.EQ, BinOp.NE, BinOp.LAND, BinOp.LOR}
 
 
-def lower_function(cursor):
+def lower_function(cursor, tokens: TokenIndex | None = None):
     assert cursor.kind == CursorKind.FUNCTION_DECL
+    if tokens is None:
+        tokens = token_index_for(cursor)
     body = None
     for c in cursor.get_children():
         if c.kind == CursorKind.COMPOUND_STMT:
-            body=lower_block(c)
+            body=lower_block(c, tokens)
 
     assert body is not None
     
@@ -106,17 +151,18 @@ def lower_function(cursor):
         body=body,
     )
 
-def lower_block(cur: Cursor) -> Block:
+def lower_block(cur: Cursor, tokens: TokenIndex | None = None) -> Block:
     stmts = []
     for child in cur.get_children():
-        s = lower_stmt(child)
+        s = lower_stmt(child, tokens)
         if s is None:
             continue
         stmts.append(s)
     return Block(stmts=stmts)
 
-def lower_stmt(cursor):
-    if cursor.kind == CursorKind.DECL_STMT:
+def lower_stmt(cursor, tokens: TokenIndex | None = None):
+    kind = cursor.kind
+    if kind == CursorKind.DECL_STMT:
         var_decl = next(cursor.get_children())
         assert var_decl.kind == CursorKind.VAR_DECL
 
@@ -125,57 +171,58 @@ def lower_stmt(cursor):
 
         children = list(var_decl.get_children())
         assert len(children) == 1
-        init = lower_expr(children[0])
+        init = lower_expr(children[0], tokens)
 
         return VarDecl(
-            var=Var(name=name, ty=ty),
+            var=Var(name=name, ty=ty, span=_span(var_decl)),
             init=init,
+            span=_span(cursor),
         )
 
-    if cursor.kind == CursorKind.RETURN_STMT:
+    if kind == CursorKind.RETURN_STMT:
         children = list(cursor.get_children())
         assert len(children) == 1
-        value = lower_expr(children[0])
-        return Return(value=value)
+        value = lower_expr(children[0], tokens)
+        return Return(value=value, span=_span(cursor))
     
-    if cursor.kind == CursorKind.WHILE_STMT:
+    if kind == CursorKind.WHILE_STMT:
         kids = list(cursor.get_children())
         assert len(kids) >= 2
-        cond = lower_expr(kids[0])
+        cond = lower_expr(kids[0], tokens)
 
         body_cur = kids[1]
         if body_cur.kind == CursorKind.COMPOUND_STMT:
-            body = lower_block(body_cur)
+            body = lower_block(body_cur, tokens)
         else:
-            body = Block(stmts=[lower_stmt(body_cur)])
-        return While(cond=cond, body=body)
+            body = Block(stmts=[lower_stmt(body_cur, tokens)])
+        return While(cond=cond, body=body, span=_span(cursor))
     
-    if cursor.kind == CursorKind.IF_STMT:
+    if kind == CursorKind.IF_STMT:
         kids = list(cursor.get_children())
         assert len(kids) in (2, 3)
-        cond = lower_expr(kids[0])
+        cond = lower_expr(kids[0], tokens)
 
         then_cur = kids[1]
-        then_body = lower_block(then_cur) if then_cur.kind == CursorKind.COMPOUND_STMT else Block(stmts=[lower_stmt(then_cur)])
+        then_body = lower_block(then_cur, tokens) if then_cur.kind == CursorKind.COMPOUND_STMT else Block(stmts=[lower_stmt(then_cur, tokens)])
 
         else_body = None
         if len(kids) == 3:
             else_cur = kids[2]
-            else_body = lower_block(else_cur) if else_cur.kind == CursorKind.COMPOUND_STMT else Block(stmts=[lower_stmt(else_cur)])
+            else_body = lower_block(else_cur, tokens) if else_cur.kind == CursorKind.COMPOUND_STMT else Block(stmts=[lower_stmt(else_cur, tokens)])
 
-        return If(cond=cond, then_body=then_body, else_body=else_body)
+        return If(cond=cond, then_body=then_body, else_body=else_body, span=_span(cursor))
     
-    if cursor.kind == CursorKind.COMPOUND_ASSIGNMENT_OPERATOR:
-        op_sp = _compound_op(cursor)
+    if kind == CursorKind.COMPOUND_ASSIGNMENT_OPERATOR:
+        op_sp = _compound_op(cursor, tokens)
         if op_sp is None:
             raise NotImplementedError("Unsupported compound assign operator")
 
         lhs_cur, rhs_cur = list(cursor.get_children())
-        lhs_ir = lower_expr(lhs_cur)
+        lhs_ir = lower_expr(lhs_cur, tokens)
         if not isinstance(lhs_ir, Var):
             raise NotImplementedError("compound assign lhs must be Var")
 
-        rhs_ir = lower_expr(rhs_cur)
+        rhs_ir = lower_expr(rhs_cur, tokens)
 
         # 把 "+=" desugar 成: lhs = lhs + rhs
         sym = COMPOUND_OPS[op_sp]
@@ -190,23 +237,25 @@ def lower_stmt(cursor):
         else:
             raise NotImplementedError(op_sp)
 
-        value = Binary(ty=lhs_ir.ty, op=bop, lhs=lhs_ir, rhs=rhs_ir)
-        return Assign(target=lhs_ir, value=value)
+        span = _span(cursor)
+        value = Binary(ty=lhs_ir.ty, op=bop, lhs=lhs_ir, rhs=rhs_ir, span=span)
+        return Assign(target=lhs_ir, value=value, span=span)
     
-    if cursor.kind == CursorKind.UNARY_OPERATOR:
-        op_sp = _unary_op(cursor)
+    if kind == CursorKind.UNARY_OPERATOR:
+        op_sp = _unary_op(cursor, tokens)
         if op_sp in {"++", "--"}:
             (child,) = list(cursor.get_children())
-            target = lower_expr(child)
+            target = lower_expr(child, tokens)
             if not isinstance(target, Var):
                 raise NotImplementedError("++/-- target must be Var")
 
-            one = Literal(ty=target.ty, value=1)
+            span = _span(cursor)
+            one = Literal(ty=target.ty, value=1, span=span)
             bop = BinOp.ADD if op_sp == "++" else BinOp.SUB
-            value = Binary(ty=target.ty, op=bop, lhs=target, rhs=one)
-            return Assign(target=target, value=value)
+            value = Binary(ty=target.ty, op=bop, lhs=target, rhs=one, span=span)
+            return Assign(target=target, value=value, span=span)
         
-    if cursor.kind == CursorKind.FOR_STMT:
+    if kind == CursorKind.FOR_STMT:
         kids = list(cursor.get_children())
         if not kids:
             raise NotImplementedError("Empty FOR_STMT")
@@ -218,72 +267,107 @@ def lower_stmt(cursor):
         cond_cur = head[1] if len(head) >= 2 else None
         inc_cur  = head[2] if len(head) >= 3 else None
 
-        init_stmt = _lower_maybe_stmt(init_cur)
+        init_stmt = _lower_maybe_stmt(init_cur, tokens)
 
-        cond_expr = _true_expr() if cond_cur is None else lower_expr(cond_cur)
+        span = _span(cursor)
+        cond_expr = _true_expr(span) if cond_cur is None else lower_expr(cond_cur, tokens)
 
-        inc_stmt = _lower_maybe_stmt(inc_cur)
+        inc_stmt = _lower_maybe_stmt(inc_cur, tokens)
 
-        body_block = _as_block_from_stmt_cursor(body_cur)
+        body_block = _as_block_from_stmt_cursor(body_cur, tokens)
         new_body = list(body_block.stmts)
         if inc_stmt is not None:
             new_body.append(inc_stmt)
 
-        loop = While(cond=cond_expr, body=Block(stmts=new_body))
+        loop = While(cond=cond_expr, body=Block(stmts=new_body), span=span)
 
         out = []
         if init_stmt is not None:
             out.append(init_stmt)
         out.append(loop)
-        a= BlockStmt(block=Block(stmts=out))
-        print(a)
-        return a
+        return BlockStmt(block=Block(stmts=out), span=span)
 
-    elif cursor.kind.is_expression():
-        op = _binary_operator_spelling(cursor)
+    elif kind == CursorKind.BINARY_OPERATOR:
+        # children 和运算符只取一次，直接交给 _lower_binary，不再让 lower_expr 重扫
+        kids = list(cursor.get_children())
+        op = _binary_operator_spelling(cursor, tokens, kids)
         if op == "=":
-            lhs_cur, rhs_cur = list(cursor.get_children())
-            lhs_ir = lower_expr(lhs_cur)
+            lhs_cur, rhs_cur = kids
+            lhs_ir = lower_expr(lhs_cur, tokens)
             if not isinstance(lhs_ir, Var):
                 raise NotImplementedError("assignment lhs must be Var")
-            rhs_ir = lower_expr(rhs_cur)
-            return Assign(target=lhs_ir, value=rhs_ir)
-        else:
-            e = lower_expr(cursor)
+            rhs_ir = lower_expr(rhs_cur, tokens)
+            return Assign(target=lhs_ir, value=rhs_ir, span=_span(cursor))
         # 你可以两种策略选一种：
         # 1) 统一包 ExprStmt（推荐）
-        return ExprStmt(expr=e)
-    raise NotImplementedError(cursor.kind)
+        span = _span(cursor)
+        return ExprStmt(expr=_lower_binary(kids, op, tokens, span), span=span)
+
+    elif _is_expression(kind):
+        return ExprStmt(expr=lower_expr(cursor, tokens), span=_span(cursor))
+    raise NotImplementedError(kind)
+
+
+
+def lower_expr(cursor: Cursor, tokens: TokenIndex | None = None):
+    # 显式栈做后序遍历：csmith 的表达式能嵌套几百层，递归会爆栈。
+    # 栈里放 cursor（待展开）或 (运算符, span)（二元运算：子树都 lower 完后再组装）
+    values = []
+    stack = [cursor]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, tuple):
+            rhs = values.pop()
+            lhs = values.pop()
+            values.append(_make_binary(item[0], lhs, rhs, item[1]))
+            continue
+
+        kind = item.kind
+        if kind == CursorKind.UNEXPOSED_EXPR:
+            children = list(item.get_children())
+            assert len(children) == 1
+            stack.append(children[0])
+            continue
 
+        if kind == CursorKind.INTEGER_LITERAL:
+            spelling = None
+            if tokens is not None:
+                spelling = tokens.at(item.extent.start.offset)
+            if spelling is None:
+                spelling = next(item.get_tokens()).spelling
+            value = int(spelling)
+            values.append(Literal(ty=Type.i32(), value=value, span=_span(item)))
+            continue
 
+        if kind == CursorKind.DECL_REF_EXPR:
+            name = item.spelling
+            values.append(Var(name=name, ty=Type.i32(), span=_span(item)))
+            continue
 
-def lower_expr(cursor: Cursor):
-    if cursor.kind == CursorKind.UNEXPOSED_EXPR:
-        children = list(cursor.get_children())
-        assert len(children) == 1
-        return lower_expr(children[0])
+        if kind == CursorKind.BINARY_OPERATOR:
+            kids = list(item.get_children())
+            assert len(kids) == 2
+            stack.append((_binary_operator_spelling(item, tokens, kids), _span(item)))
+            stack.append(kids[1])
+            stack.append(kids[0])
+            continue
 
-    if cursor.kind == CursorKind.INTEGER_LITERAL:
-        token = next(cursor.get_tokens())
-        value = int(token.spelling)
-        return Literal(ty=Type.i32(), value=value)
+        raise NotImplementedError(kind)
 
-    if cursor.kind == CursorKind.DECL_REF_EXPR:
-        name = cursor.spelling
-        return Var(name=name, ty=Type.i32())
+    (result,) = values
+    return result
 
-    if cursor.kind == CursorKind.BINARY_OPERATOR:
-        kids = list(cursor.get_children())
-        assert len(kids) == 2
-        lhs = lower_expr(kids[0])
-        rhs = lower_expr(kids[1])
 
-        op_sp = _binary_operator_spelling(cursor)
-        ir_op = _BINOP_MAP.get(op_sp)
-        if ir_op is None:
-            raise NotImplementedError(f"Unsupported binary operator: {op_sp}")
+def _lower_binary(kids, op_sp: str, tokens: TokenIndex | None = None, span: int | None = None):
+    lhs = lower_expr(kids[0], tokens)
+    rhs = lower_expr(kids[1], tokens)
+    return _make_binary(op_sp, lhs, rhs, span)
+
 
-        ty = Type.bool() if ir_op in _BOOL_RESULT else Type.i32()
-        return Binary(ty=ty, op=ir_op, lhs=lhs, rhs=rhs)
+def _make_binary(op_sp: str, lhs, rhs, span: int | None = None):
+    ir_op = _BINOP_MAP.get(op_sp)
+    if ir_op is None:
+        raise NotImplementedError(f"Unsupported binary operator: {op_sp}")
 
-    raise NotImplementedError(cursor.kind)
+    ty = Type.bool() if ir_op in _BOOL_RESULT else Type.i32()
+    return Binary(ty=ty, op=ir_op, lhs=lhs, rhs=rhs, span=span)
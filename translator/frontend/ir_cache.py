@@ -0,0 +1,215 @@
+"""
+lowered IR 的磁盘缓存（content-addressed）。
+
+key = sha256(翻译器版本, clang 参数, 源文件内容)。
+每个条目还记录本次解析用到的所有 #include 文件及其 hash，
+命中时逐个校验，头文件变了就当作未命中并删掉条目。
+
+布局：<root>/<key[:2]>/<key>.cir，每个条目一个文件、原子替换写入，
+多个 worker 进程共用同一个目录也没问题。LRU 用文件 mtime 记录最近使用时间。
+条目内容：u32 长度 + pickle 的 (源文件路径, 依赖表)，补齐到 8 字节后跟 translator.ir.binary 格式的函数
+（二进制 IR 里的数组按相对 buffer 开头的位置对齐）。
+
+key 不含路径：内容相同的两个文件共用一个条目。二进制 IR 里每个函数记着 span 所在的文件，
+命中时把写入时的源文件路径换成这次请求的路径，诊断才会指向请求的文件（头文件里的函数不动）。
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Iterable, Optional
+
+from translator import __version__
+from translator.ir import binary
+from translator.ir.nodes import Function
+
+# 条目格式变化时加一，旧缓存自动失效
+CACHE_FORMAT = 7
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# 本进程之外（其他 worker）写进来的条目看不到，每这么多次 put 重新扫一遍目录校准总大小
+_RESCAN_EVERY = 64
+
+_DEPS_LEN = struct.Struct("<I")
+
+
+def _ir_offset(deps_len: int) -> int:
+    """依赖表之后、补齐到 8 字节的二进制 IR 起点。"""
+    end = _DEPS_LEN.size + deps_len
+    return end + (-end % 8)
+
+
+def _file_digest(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class IRCache:
+    def __init__(self, root: str | os.PathLike, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        # 目录总大小的估计（第一次 put 时才扫描），put 时累加，超过 max_bytes 才真正 evict
+        self._size: Optional[int] = None
+        self._puts = 0
+
+    # ---- key ----
+
+    def key(self, source_path: str, args: Iterable[str]) -> Optional[str]:
+        try:
+            with open(source_path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        h = hashlib.sha256()
+        h.update(f"{CACHE_FORMAT}\0{__version__}\0".encode())
+        for a in args:
+            h.update(a.encode())
+            h.update(b"\0")
+        h.update(b"\1")
+        h.update(content)
+        return h.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.cir"
+
+    # ---- public API ----
+
+    def get(self, source_path: str, args: Iterable[str]) -> Optional[list[Function]]:
+        key = self.key(source_path, args)
+        if key is None:
+            return None
+        p = self._entry_path(key)
+        try:
+            with open(p, "rb") as f:
+                data = f.read()
+            (n,) = _DEPS_LEN.unpack_from(data, 0)
+            stored_path, deps = pickle.loads(data[_DEPS_LEN.size:_DEPS_LEN.size + n])
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, struct.error):
+            return None
+
+        # 头文件内容变了：条目作废
+        for dep, digest in deps.items():
+            if _file_digest(dep) != digest:
+                self._remove(p)
+                return None
+
+        try:
+            functions = []
+            f = binary.IRFile(memoryview(data)[_ir_offset(n):])
+            try:
+                for i in range(len(f)):
+                    ff = f.flat(i)
+                    if ff.source == stored_path:
+                        ff.source = source_path
+                    functions.append(ff.to_function())
+                    del ff
+            finally:
+                f.close()
+        except (ValueError, struct.error):
+            return None
+
+        try:
+            os.utime(p)
+        except OSError:
+            pass
+        return functions
+
+    def put(self, source_path: str, args: Iterable[str], functions: list[Function], deps: Iterable[str] = ()) -> None:
+        key = self.key(source_path, args)
+        if key is None:
+            return
+        dep_digests = {}
+        for d in deps:
+            if d not in dep_digests:
+                digest = _file_digest(d)
+                if digest is None:
+                    # 拿不到 hash 的依赖无法校验，干脆不缓存
+                    return
+                dep_digests[d] = digest
+
+        p = self._entry_path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            old_size = p.stat().st_size
+        except OSError:
+            old_size = 0
+        tmp = p.with_suffix(f".{os.getpid()}.tmp")
+        header = pickle.dumps((source_path, dep_digests), protocol=pickle.HIGHEST_PROTOCOL)
+        with open(tmp, "wb") as f:
+            f.write(_DEPS_LEN.pack(len(header)))
+            f.write(header)
+            f.write(b"\0" * (_ir_offset(len(header)) - _DEPS_LEN.size - len(header)))
+            binary.write_functions(f, functions)
+            new_size = f.tell()
+        os.replace(tmp, p)
+
+        self._puts += 1
+        if self._size is None or self._puts % _RESCAN_EVERY == 0:
+            self._size = self.size()
+        else:
+            self._size += new_size - old_size
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def invalidate(self, source_path: str, args: Iterable[str]) -> bool:
+        """
+        删掉 source_path 当前内容 + args 对应的条目。args 要和 put 时的完全一样：
+        前端写的条目用 clang_frontend.cache_args / invalidate_cached 算。
+        """
+        key = self.key(source_path, args)
+        if key is None:
+            return False
+        return self._remove(self._entry_path(key))
+
+    def clear(self) -> None:
+        for p in self._entries():
+            self._remove(p)
+        self._size = None
+
+    def size(self) -> int:
+        return sum(st.st_size for _, st in self._stats())
+
+    def evict(self) -> None:
+        """总大小超过 max_bytes 时，按最近使用时间从旧到新删除。要扫描整个目录，put 只在估计超限时调用。"""
+        stats = self._stats()
+        total = sum(st.st_size for _, st in stats)
+        self._size = total
+        if total <= self.max_bytes:
+            return
+        stats.sort(key=lambda x: x[1].st_mtime)
+        for p, st in stats:
+            if total <= self.max_bytes:
+                break
+            if self._remove(p):
+                total -= st.st_size
+        self._size = total
+
+    # ---- helpers ----
+
+    def _entries(self):
+        return self.root.glob("*/*.cir")
+
+    def _stats(self):
+        out = []
+        for p in self._entries():
+            try:
+                out.append((p, p.stat()))
+            except OSError:
+                pass
+        return out
+
+    @staticmethod
+    def _remove(p: Path) -> bool:
+        try:
+            p.unlink()
+            return True
+        except OSError:
+            return False
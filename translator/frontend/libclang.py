@@ -0,0 +1,189 @@
+"""
+libclang 的定位和加载。
+
+clang 的 python 绑定只在真正用 C/C++ 前端时才需要；libclang 本身要等第一次
+create_index() 才去找、才加载。查找顺序：
+
+  1. 环境变量 TRANSLATOR_LIBCLANG（库文件，或者放库文件的目录）
+  2. 当前解释器里 pip 的 libclang 包自带的 clang/native/（不起子进程，比读缓存还便宜）
+  3. 磁盘缓存 $XDG_CACHE_HOME/translator/libclang.json 里上次找到的路径（文件还在就直接用）
+  4. 其他候选位置：`llvm-config --libdir`、Homebrew / Xcode CommandLineTools / 各发行版的 llvm 安装目录
+  5. 都没有时不设置路径，交给 clang.cindex 按系统的库搜索路径自己找
+
+第 4 步找到的路径写回缓存，之后的进程不用再起 llvm-config 子进程、扫目录。
+缓存按 sys.prefix 分开记：不同的 venv / 解释器共用一个缓存文件，互不覆盖。
+缓存文件的位置可以用 TRANSLATOR_LIBCLANG_CACHE 改掉。
+"""
+from __future__ import annotations
+
+import glob
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+from typing import Iterator, Optional
+
+from translator.common.files import write_if_changed
+
+ENV_LIBRARY = "TRANSLATOR_LIBCLANG"
+ENV_CACHE = "TRANSLATOR_LIBCLANG_CACHE"
+
+if sys.platform == "darwin":
+    _LIB_PATTERNS = ("libclang.dylib",)
+elif sys.platform == "win32":
+    _LIB_PATTERNS = ("libclang.dll",)
+else:
+    _LIB_PATTERNS = ("libclang.so", "libclang.so.*", "libclang-*.so*")
+
+# 固定的安装位置；带 * 的按版本号从高到低试
+_KNOWN_DIRS = (
+    "/opt/homebrew/opt/llvm/lib",
+    "/usr/local/opt/llvm/lib",
+    "/Library/Developer/CommandLineTools/usr/lib",
+    "/Applications/Xcode.app/Contents/Developer/Toolchains/XcodeDefault.xctoolchain/usr/lib",
+    "/usr/lib/llvm-*/lib",
+    "/usr/lib64/llvm*",
+    "/usr/lib/x86_64-linux-gnu",
+    "/usr/lib/aarch64-linux-gnu",
+    "/usr/lib64",
+    "/usr/lib",
+    "/usr/local/lib",
+)
+
+# 本进程最终用的路径（None 表示交给 cindex 默认查找）
+_configured = False
+_library: Optional[str] = None
+
+
+def cache_path() -> str:
+    env = os.environ.get(ENV_CACHE)
+    if env:
+        return env
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "translator", "libclang.json")
+
+
+def _version_key(path: str) -> list:
+    """按路径里的数字排序，llvm-18 排在 llvm-9 前面。"""
+    parts = []
+    for chunk in path.replace("-", ".").replace("/", ".").split("."):
+        parts.append((1, int(chunk)) if chunk.isdigit() else (0, chunk))
+    return parts
+
+
+def _find_in_dir(directory: str) -> Optional[str]:
+    for pattern in _LIB_PATTERNS:
+        # libclang-cpp 是 C++ API 的库，不是 cindex 要的 C API
+        hits = [p for p in glob.glob(os.path.join(directory, pattern))
+                if os.path.isfile(p) and not os.path.basename(p).startswith("libclang-cpp")]
+        if hits:
+            return max(hits, key=_version_key)
+    return None
+
+
+def _llvm_config_libdir() -> Optional[str]:
+    exe = shutil.which("llvm-config")
+    if exe is None:
+        return None
+    try:
+        out = subprocess.run([exe, "--libdir"], capture_output=True, text=True, timeout=5, check=True)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _pip_dirs() -> Iterator[str]:
+    # pip install libclang：库文件就在 python 包旁边；find_spec 不会执行 clang/__init__
+    spec = importlib.util.find_spec("clang")
+    if spec is not None and spec.submodule_search_locations:
+        for loc in spec.submodule_search_locations:
+            yield os.path.join(loc, "native")
+
+
+def _candidate_dirs() -> Iterator[str]:
+    libdir = _llvm_config_libdir()
+    if libdir:
+        yield libdir
+    for d in _KNOWN_DIRS:
+        if glob.has_magic(d):
+            yield from sorted(glob.glob(d), key=_version_key, reverse=True)
+        else:
+            yield d
+
+
+def _load_cache() -> dict:
+    """缓存文件的内容：{sys.prefix: 库路径}。"""
+    try:
+        with open(cache_path(), "r", encoding="utf-8") as f:
+            paths = json.load(f).get("paths")
+    except (OSError, ValueError, AttributeError):
+        return {}
+    return paths if isinstance(paths, dict) else {}
+
+
+def _read_cache() -> Optional[str]:
+    path = _load_cache().get(sys.prefix)
+    return path if isinstance(path, str) and os.path.isfile(path) else None
+
+
+def _write_cache(path: str) -> None:
+    paths = _load_cache()
+    paths[sys.prefix] = path
+    try:
+        write_if_changed(cache_path(), json.dumps({"paths": paths}, sort_keys=True) + "\n")
+    except OSError:
+        # 缓存目录不可写只是下次还要再找一遍
+        pass
+
+
+def find_libclang(use_cache: bool = True) -> Optional[str]:
+    """按模块说明里的顺序找 libclang；找不到返回 None。"""
+    env = os.environ.get(ENV_LIBRARY)
+    if env:
+        return _find_in_dir(env) if os.path.isdir(env) else env
+    for d in _pip_dirs():
+        found = _find_in_dir(d)
+        if found is not None:
+            return found
+    if use_cache:
+        cached = _read_cache()
+        if cached is not None:
+            return cached
+    for d in _candidate_dirs():
+        found = _find_in_dir(d)
+        if found is not None:
+            if use_cache:
+                _write_cache(found)
+            return found
+    return None
+
+
+def configure() -> Optional[str]:
+    """
+    把找到的 libclang 交给 clang.cindex；只做一次，必须在第一次调用 libclang 之前。
+    返回用的路径（None：交给 cindex 默认查找）。
+    """
+    global _configured, _library
+    if _configured:
+        return _library
+    from clang import cindex
+
+    _configured = True
+    # 调用方自己 set_library_file 过（或者库已经加载）就不动它；
+    # library_path 不算，pip 版的 cindex 默认就指向自带的 native/
+    if cindex.Config.loaded or cindex.Config.library_file is not None:
+        _library = cindex.Config.library_file
+        return _library
+    _library = find_libclang()
+    if _library is not None:
+        cindex.Config.set_library_file(_library)
+    return _library
+
+
+def create_index():
+    """configure() 之后的 cindex.Index.create()；前端里创建 Index 都走这里。"""
+    configure()
+    from clang import cindex
+    return cindex.Index.create()
@@ -0,0 +1,114 @@
+"""
+预编译头（PCH）：把一组公共头文件（比如 csmith.h）每次运行只解析一次。
+
+build_pch() 生成一个 umbrella 头文件，把配置的头文件都 #include 进去，
+用 libclang 解析后 tu.save() 成 .pch；之后每个 TU 解析时带上
+`-include-pch <path>`，源码里的 `#include "csmith.h"` 因为 include guard
+直接被跳过，不再重新解析头文件。
+
+PCH 只能给同一种语言的 TU 用（C 的 PCH 加载进 C++ 的 TU 会直接解析失败），
+C / C++ 混合的目录用 build_pchs() 每种语言各建一个。
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from clang import cindex
+
+from translator.common.diagnostics import Diagnostic, ErrorCode
+from translator.frontend.libclang import create_index
+from translator.frontend.selection import DEFAULT_ARGS, DEFAULT_CXX_ARGS, source_language
+
+
+@dataclass(frozen=True)
+class PrecompiledHeader:
+    path: str                  # .pch 文件
+    headers: tuple[str, ...]   # umbrella 里 #include 的头文件
+    args: tuple[str, ...]      # 构建 pch 时的 clang 参数，使用时必须一致
+    deps: tuple[str, ...]      # pch 实际包含的所有文件（给 IR 缓存做依赖校验）
+    language: str = "c"        # "c" / "c++"，只能给同一种语言的源文件用
+
+    def parse_args(self, args: Iterable[str]) -> list[str]:
+        return [*args, "-include-pch", self.path]
+
+
+def _args_language(args: Iterable[str]) -> str:
+    for a in args:
+        if a.startswith("-std=c++") or a.startswith("-std=gnu++"):
+            return "c++"
+    return "c"
+
+
+def build_pch(
+    headers: Iterable[str],
+    args: Iterable[str],
+    index: Optional[cindex.Index] = None,
+    out_dir: Optional[str] = None,
+    language: Optional[str] = None,
+) -> PrecompiledHeader:
+    """
+    为 headers 构建一个 PCH。headers 按 `#include "..."` 的写法解析，
+    所以需要的 -I 路径要放在 args 里。
+    language（"c" / "c++"）不给时看 args 里的 -std。
+    """
+    headers = tuple(headers)
+    args = tuple(args)
+    if language is None:
+        language = _args_language(args)
+    if index is None:
+        index = create_index()
+    if out_dir is None:
+        out_dir = tempfile.mkdtemp(prefix="translator-pch-")
+
+    stem = "prelude" if language == "c" else "prelude-cxx"
+    umbrella = os.path.join(out_dir, f"{stem}.h")
+    with open(umbrella, "w", encoding="utf-8") as f:
+        for h in headers:
+            f.write(f'#include "{h}"\n')
+
+    tu = index.parse(
+        umbrella,
+        args=[*args, "-x", f"{language}-header"],
+        options=cindex.TranslationUnit.PARSE_INCOMPLETE,
+    )
+    for d in tu.diagnostics:
+        if d.severity >= cindex.Diagnostic.Error:
+            raise Diagnostic(ErrorCode.E_PARSE, f"cannot precompile {', '.join(headers)}: {d.spelling}")
+
+    pch_path = os.path.join(out_dir, f"{stem}.pch")
+    tu.save(pch_path)
+
+    deps = tuple(dict.fromkeys(inc.include.name for inc in tu.get_includes()))
+    return PrecompiledHeader(path=pch_path, headers=headers, args=args, deps=deps, language=language)
+
+
+def build_pchs(
+    headers: Iterable[str],
+    files: Iterable[str],
+    args: Optional[Iterable[str]] = None,
+    index: Optional[cindex.Index] = None,
+    out_dir: Optional[str] = None,
+) -> dict[str, PrecompiledHeader]:
+    """
+    files 里出现的每种语言各建一个 PCH，返回 {语言: PCH}（按 selection.source_language 挑）。
+    args 为 None 时和源文件一样按语言用默认参数（PCH 的参数必须和使用它的 TU 一致）。
+    clang 根本解析不了的组合（比如 C++ 配 -std=c11）跳过并在 stderr 提示，这种语言的文件不用 PCH。
+    """
+    headers = tuple(headers)
+    if index is None:
+        index = create_index()
+    if out_dir is None:
+        out_dir = tempfile.mkdtemp(prefix="translator-pch-")
+    out: dict[str, PrecompiledHeader] = {}
+    for language in dict.fromkeys(source_language(f) for f in files):
+        lang_args = args if args is not None else (DEFAULT_CXX_ARGS if language == "c++" else DEFAULT_ARGS)
+        try:
+            out[language] = build_pch(headers, lang_args, index=index, out_dir=out_dir, language=language)
+        except cindex.TranslationUnitLoadError as e:
+            print(f"[pch] cannot precompile headers as {language} ({e}); {language} files parse without a PCH",
+                  file=sys.stderr)
+    return out
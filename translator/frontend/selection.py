@@ -0,0 +1,129 @@
+"""
+只翻译需要的部分：函数选择 + 解析 profile。
+
+- FunctionSelection：按函数名 / 正则挑函数，默认只看主文件里的定义
+  （csmith.h 之类头文件里的 static 函数不再被 lower）。
+- ParseProfile：libclang TU flag 的命名组合。
+
+这个模块不 import clang：选项、profile 这些在不碰前端的地方（batch / translate 的参数处理）也会用到。
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from clang.cindex import TranslationUnit
+
+# 没有给 clang 参数时按后缀选：C 文件用 DEFAULT_ARGS，C++ 文件用 DEFAULT_CXX_ARGS
+DEFAULT_ARGS = ["-std=c11"]
+DEFAULT_CXX_ARGS = ["-std=c++14"]
+CXX_SUFFIXES = (".cc", ".cpp", ".cxx")
+
+
+def source_language(filename: str) -> str:
+    """clang 按后缀把 filename 当成 "c" 还是 "c++" 解析。"""
+    return "c++" if filename.endswith(CXX_SUFFIXES) else "c"
+
+
+def default_args(filename: str) -> list[str]:
+    """调用方没给 clang 参数时 filename 用的参数。"""
+    return DEFAULT_CXX_ARGS if source_language(filename) == "c++" else DEFAULT_ARGS
+
+# CXTranslationUnit_Flags（libclang C API 的稳定取值，和 cindex.TranslationUnit.PARSE_* 相同；
+# 后两个 python binding 没导出）
+PARSE_NONE = 0x0
+PARSE_DETAILED_PROCESSING_RECORD = 0x1
+PARSE_PRECOMPILED_PREAMBLE = 0x4
+PARSE_SKIP_FUNCTION_BODIES = 0x40
+CREATE_PREAMBLE_ON_FIRST_PARSE = 0x100
+LIMIT_SKIP_FUNCTION_BODIES_TO_PREAMBLE = 0x800
+
+
+@dataclass(frozen=True)
+class ParseProfile:
+    name: str
+    options: int
+    description: str = ""
+
+
+PARSE_PROFILES = {
+    "default": ParseProfile("default", PARSE_NONE, "plain parse, no preprocessing record"),
+    # 头文件（preamble）里的函数体直接跳过，主文件照常解析。
+    # 这个 flag 只对 preamble 生效，所以要第一次解析就建 preamble；
+    # 首次解析和 default 差不多，reparse（watch / daemon）会快很多。
+    "fast": ParseProfile(
+        "fast",
+        PARSE_SKIP_FUNCTION_BODIES
+        | LIMIT_SKIP_FUNCTION_BODIES_TO_PREAMBLE
+        | PARSE_PRECOMPILED_PREAMBLE
+        | CREATE_PREAMBLE_ON_FIRST_PARSE,
+        "skip function bodies in headers, keep a precompiled preamble for reparse",
+    ),
+    # dump_ast 查宏展开时用
+    "detailed": ParseProfile(
+        "detailed",
+        PARSE_DETAILED_PROCESSING_RECORD,
+        "keep macro definitions/expansions in the AST",
+    ),
+}
+
+
+def parse_profile(name: str) -> ParseProfile:
+    try:
+        return PARSE_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"unknown parse profile {name!r} (known: {', '.join(PARSE_PROFILES)})")
+
+
+@dataclass(frozen=True)
+class FunctionSelection:
+    names: frozenset[str] = field(default_factory=frozenset)
+    pattern: Optional[str] = None
+    main_file_only: bool = True
+
+    @staticmethod
+    def of(names: Iterable[str] = (), pattern: Optional[str] = None, main_file_only: bool = True) -> "FunctionSelection":
+        return FunctionSelection(names=frozenset(names), pattern=pattern, main_file_only=main_file_only)
+
+    def selects_all(self) -> bool:
+        return not self.names and self.pattern is None
+
+    def matches(self, name: str) -> bool:
+        if self.selects_all():
+            return True
+        if name in self.names:
+            return True
+        return self.pattern is not None and re.fullmatch(self.pattern, name) is not None
+
+    def cache_tag(self) -> list[str]:
+        """参与 IR 缓存 key 的部分：选择不同，缓存的函数列表也不同。"""
+        tag = [f"#main-file-only={int(self.main_file_only)}"]
+        if self.names:
+            tag.append("#names=" + ",".join(sorted(self.names)))
+        if self.pattern is not None:
+            tag.append(f"#pattern={self.pattern}")
+        return tag
+
+
+ALL_FUNCTIONS = FunctionSelection()
+
+
+def select_functions(tu: TranslationUnit, selection: FunctionSelection = ALL_FUNCTIONS) -> Iterator:
+    """最外层的、被 selection 选中的函数定义。"""
+    from clang.cindex import CursorKind
+
+    main = tu.spelling
+    for c in tu.cursor.get_children():
+        if c.kind != CursorKind.FUNCTION_DECL:
+            continue
+        # 先用名字过滤（纯 Python），再做需要 FFI 的位置 / 定义判断
+        if not selection.matches(c.spelling):
+            continue
+        if selection.main_file_only:
+            f = c.location.file
+            if f is None or f.name != main:
+                continue
+        if c.is_definition():
+            yield c
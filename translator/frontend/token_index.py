@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+import weakref
+from bisect import bisect_left
+from ctypes import byref, c_uint
+from typing import Iterable
+
+from clang.cindex import SourceLocation, SourceRange, conf
+
+
+def extent_offsets(extent) -> tuple[int, int]:
+    """
+    SourceRange -> (start, end) 文件 offset。
+    直接调 clang_getInstantiationLocation 只要 offset，不像 extent.start.offset
+    那样每次都构造 File / 行 / 列，大文件上能省下大半 FFI 开销。
+    """
+    lib = conf.lib
+    off = c_uint()
+    lib.clang_getInstantiationLocation(lib.clang_getRangeStart(extent), None, None, None, byref(off))
+    start = off.value
+    lib.clang_getInstantiationLocation(lib.clang_getRangeEnd(extent), None, None, None, byref(off))
+    return start, off.value
+
+
+class TokenIndex:
+    """
+    一个源文件的 token 表（按 offset 排序）。
+
+    每个文件只 lex 一次，之后运算符 / 字面量都通过二分查找区间得到，
+    不再对每个 cursor 调 get_tokens() 重新扫描整个 extent。
+    """
+
+    __slots__ = ("starts", "ends", "spellings")
+
+    def __init__(self, tokens: Iterable[tuple[int, int, str]]):
+        starts: list[int] = []
+        ends: list[int] = []
+        spellings: list[str] = []
+        for start, end, spelling in tokens:
+            starts.append(start)
+            ends.append(end)
+            spellings.append(spelling)
+        self.starts = starts
+        self.ends = ends
+        self.spellings = spellings
+
+    @staticmethod
+    def from_extent(tu, extent) -> "TokenIndex":
+        return TokenIndex(
+            (*extent_offsets(t.extent), t.spelling)
+            for t in tu.get_tokens(extent=extent)
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def at(self, offset: int) -> str | None:
+        """返回从 offset 开始的 token。"""
+        i = bisect_left(self.starts, offset)
+        if i < len(self.starts) and self.starts[i] == offset:
+            return self.spellings[i]
+        return None
+
+    def range(self, lo: int, hi: int) -> range:
+        """完全落在 [lo, hi) 内的 token 下标。"""
+        i = bisect_left(self.starts, lo)
+        j = i
+        n = len(self.starts)
+        while j < n and self.ends[j] <= hi:
+            j += 1
+        return range(i, j)
+
+    def find(self, lo: int, hi: int, candidates) -> str | None:
+        """[lo, hi) 区间内第一个属于 candidates 的 token。"""
+        i = bisect_left(self.starts, lo)
+        n = len(self.starts)
+        while i < n and self.ends[i] <= hi:
+            s = self.spellings[i]
+            if s in candidates:
+                return s
+            i += 1
+        return None
+
+
+# tu -> {文件名: TokenIndex}；tu 释放后自动清掉
+_INDEXES: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _file_extent(tu, filename: str):
+    if filename == tu.spelling:
+        return tu.cursor.extent
+    f = tu.get_file(filename)
+    size = os.path.getsize(filename)
+    return SourceRange.from_locations(
+        SourceLocation.from_offset(tu, f, 0),
+        SourceLocation.from_offset(tu, f, size),
+    )
+
+
+_NO_OWN_INDEX = object()
+
+
+def token_index_for(cursor) -> TokenIndex | None:
+    """cursor 所在文件的 TokenIndex（每个 tu 的每个文件只建一次）。"""
+    # AST 快照里的节点自带 token 表（TU 可能已经释放了）
+    own = getattr(cursor, "token_index", _NO_OWN_INDEX)
+    if own is not _NO_OWN_INDEX:
+        return own
+    f = cursor.extent.start.file
+    if f is None:
+        return None
+    tu = cursor.translation_unit
+    per_file = _INDEXES.get(tu)
+    if per_file is None:
+        per_file = {}
+        _INDEXES[tu] = per_file
+    index = per_file.get(f.name)
+    if index is None:
+        try:
+            index = TokenIndex.from_extent(tu, _file_extent(tu, f.name))
+        except OSError:
+            return None
+        per_file[f.name] = index
+    return index
+
+
+def invalidate_token_index(tu) -> None:
+    """tu.reparse() 之后 offset 全部失效，需要丢掉旧表。"""
+    _INDEXES.pop(tu, None)
@@ -0,0 +1,323 @@
+"""
+IR 的二进制格式：批量写出，按需用 mmap 零拷贝读回。
+
+格式建立在 FlatFunction（translator.ir.flat）上：每个函数的平行数组原样落盘，
+读回时直接在 mmap / bytes 上做 memoryview.cast，不拷贝、不构造节点对象；
+typecheck_flat_function / CarbonEmitter.emit_flat_function 可以直接在上面跑，
+需要对象 IR 时再 to_function()。
+
+    文件头   magic "CIR\\0" | u16 版本 | u8 字节序 | u8 保留 | u32 函数个数 | u64 索引偏移 | 4 字节填充
+    函数记录 （见 _encode_function；文件头 24 字节、每条记录补齐到 8 的倍数，
+             所以每条记录、记录里的每个数组相对文件开头都是按元素大小对齐的）
+    索引     函数个数 × (u64 偏移, u64 长度)
+
+数组按本机字节序存放；在字节序不同的机器上读时会拷贝并 byteswap。
+"""
+from __future__ import annotations
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Iterable, Iterator
+
+from translator.ir.flat import FlatFunction, flatten_function
+from translator.ir.nodes import Function
+from translator.ir.types import Signedness, Type
+
+MAGIC = b"CIR\0"
+# 格式变化时加一；读到别的版本直接报错
+FORMAT_VERSION = 3
+
+# 补齐到 24 字节：第一条记录从 8 的倍数开始
+_HEADER = struct.Struct("<4sHBBIQ4x")
+_INDEX_ENTRY = struct.Struct("<QQ")
+_COUNTS = struct.Struct("<8I")
+_BYTEORDER = {"little": 0, "big": 1}[sys.byteorder]
+
+# (字段名, typecode)，顺序即落盘顺序；长度来自 _COUNTS
+_EXPR_ARRAYS = (("e_op", "B"), ("e_sub", "B"), ("e_ty", "H"), ("e_a", "i"), ("e_b", "i"),
+                ("e_start", "I"), ("e_end", "I"))
+_STMT_ARRAYS = (("s_op", "B"), ("s_expr", "i"), ("s_name", "i"), ("s_ty", "i"), ("s_a", "i"), ("s_b", "i"),
+                ("s_start", "I"), ("s_end", "I"))
+_BLOCK_ARRAYS = (("b_start", "i"), ("b_len", "i"))
+
+_SIGNED = {None: 0, Signedness.SIGNED: 1, Signedness.UNSIGNED: 2}
+_SIGNED_BACK = {v: k for k, v in _SIGNED.items()}
+
+# 字面量 tag
+_LIT_BOOL, _LIT_INT, _LIT_FLOAT, _LIT_BIGINT = range(4)
+
+
+class IRFormatError(ValueError):
+    pass
+
+
+# ---------- 写 ----------
+
+class _Writer:
+    __slots__ = ("parts", "size")
+
+    def __init__(self):
+        self.parts: list[bytes] = []
+        self.size = 0
+
+    def raw(self, b) -> None:
+        self.parts.append(b)
+        self.size += len(b)
+
+    def pack(self, fmt: str, *values) -> None:
+        self.raw(struct.pack(fmt, *values))
+
+    def str(self, s: str) -> None:
+        b = s.encode("utf-8")
+        self.pack("<I", len(b))
+        self.raw(b)
+
+    def align(self, n: int = 8) -> None:
+        pad = -self.size % n
+        if pad:
+            self.raw(b"\0" * pad)
+
+
+def _encode_type(w: _Writer, ty: Type) -> None:
+    if type(ty) is not Type:
+        raise NotImplementedError(f"binary IR format does not support {type(ty).__name__}")
+    w.str(ty.kind)
+    w.pack("<iB", -1 if ty.bits is None else ty.bits, _SIGNED[ty.signed])
+
+
+def _encode_literal(w: _Writer, value) -> None:
+    if isinstance(value, bool):
+        w.pack("<BB", _LIT_BOOL, value)
+    elif isinstance(value, int):
+        if -(1 << 63) <= value < (1 << 63):
+            w.pack("<Bq", _LIT_INT, value)
+        else:
+            w.pack("<B", _LIT_BIGINT)
+            w.str(str(value))
+    elif isinstance(value, float):
+        w.pack("<Bd", _LIT_FLOAT, value)
+    else:
+        raise NotImplementedError(f"binary IR format does not support literal {value!r}")
+
+
+def _encode_function(ff: FlatFunction) -> list[bytes]:
+    """
+    一个函数记录：
+        名字 | source | 计数 | ret_ty | types | literals | names | params | (8 字节对齐) 各数组
+    """
+    w = _Writer()
+    w.str(ff.name)
+    w.str(ff.source)
+    w.raw(_COUNTS.pack(
+        len(ff.types), len(ff.literals), len(ff.names), len(ff.params),
+        len(ff.e_op), len(ff.s_op), len(ff.b_start), len(ff.b_stmts),
+    ))
+    _encode_type(w, ff.ret_ty)
+    for ty in ff.types:
+        _encode_type(w, ty)
+    for value in ff.literals:
+        _encode_literal(w, value)
+    for name in ff.names:
+        w.str(name)
+    for n, t in ff.params:
+        w.pack("<ii", n, t)
+    for group in (_EXPR_ARRAYS, _STMT_ARRAYS, _BLOCK_ARRAYS, (("b_stmts", "i"),)):
+        for field, code in group:
+            arr = getattr(ff, field)
+            w.align(arr.itemsize if isinstance(arr, array) else array(code).itemsize)
+            w.raw(arr.tobytes() if isinstance(arr, array) else bytes(arr))
+    w.align()
+    return w.parts
+
+
+def _as_flat(fn) -> FlatFunction:
+    return fn if isinstance(fn, FlatFunction) else flatten_function(fn)
+
+
+def write_functions(out: BinaryIO, fns: Iterable[Function | FlatFunction]) -> int:
+    """
+    把函数（对象 IR 或 FlatFunction）批量写进 out，一次处理一个函数，不在内存里攒整个文件。
+    out 需要可 seek（最后回填文件头）。返回函数个数。
+    """
+    base = out.tell()
+    out.write(_HEADER.pack(MAGIC, FORMAT_VERSION, _BYTEORDER, 0, 0, 0))
+    pos = _HEADER.size
+    index: list[tuple[int, int]] = []
+    for fn in fns:
+        parts = _encode_function(_as_flat(fn))
+        size = sum(len(p) for p in parts)
+        for p in parts:
+            out.write(p)
+        index.append((pos, size))
+        pos += size
+    index_offset = pos
+    for off, size in index:
+        out.write(_INDEX_ENTRY.pack(off, size))
+    end = out.tell()
+    out.seek(base)
+    out.write(_HEADER.pack(MAGIC, FORMAT_VERSION, _BYTEORDER, 0, len(index), index_offset))
+    out.seek(end)
+    return len(index)
+
+
+def dumps(fns: Iterable[Function | FlatFunction]) -> bytes:
+    """内存里的版本（进程间传输、嵌进缓存条目）。"""
+    import io
+    buf = io.BytesIO()
+    write_functions(buf, fns)
+    return buf.getvalue()
+
+
+def save(path: str, fns: Iterable[Function | FlatFunction]) -> int:
+    with open(path, "wb") as f:
+        return write_functions(f, fns)
+
+
+# ---------- 读 ----------
+
+class _Reader:
+    __slots__ = ("buf", "pos")
+
+    def __init__(self, buf: memoryview, pos: int):
+        self.buf = buf
+        self.pos = pos
+
+    def unpack(self, fmt: str):
+        s = struct.Struct(fmt)
+        values = s.unpack_from(self.buf, self.pos)
+        self.pos += s.size
+        return values
+
+    def str(self) -> str:
+        (n,) = self.unpack("<I")
+        s = str(self.buf[self.pos:self.pos + n], "utf-8")
+        self.pos += n
+        return s
+
+    def array(self, code: str, n: int, swap: bool):
+        itemsize = array(code).itemsize
+        self.pos += -self.pos % itemsize
+        view = self.buf[self.pos:self.pos + n * itemsize]
+        self.pos += n * itemsize
+        if swap and itemsize > 1:
+            a = array(code, view.tobytes())
+            a.byteswap()
+            return a
+        # 零拷贝：直接在底层 buffer 上按类型解释
+        return view.cast(code)
+
+
+def _decode_type(r: _Reader) -> Type:
+    kind = r.str()
+    bits, signed = r.unpack("<iB")
+    return Type(kind=kind, bits=None if bits < 0 else bits, signed=_SIGNED_BACK[signed])
+
+
+def _decode_literal(r: _Reader):
+    (tag,) = r.unpack("<B")
+    if tag == _LIT_BOOL:
+        return bool(r.unpack("<B")[0])
+    if tag == _LIT_INT:
+        return r.unpack("<q")[0]
+    if tag == _LIT_FLOAT:
+        return r.unpack("<d")[0]
+    if tag == _LIT_BIGINT:
+        return int(r.str())
+    raise IRFormatError(f"bad literal tag {tag}")
+
+
+class IRFile:
+    """
+    一个二进制 IR 文件 / buffer 的只读视图。只解析文件头和索引；
+    flat(i) 才解码第 i 个函数的小表（类型、名字、字面量），数组部分是 buffer 上的 memoryview。
+
+        with IRFile.open("out.cir") as f:
+            for ff in f:
+                print(emitter.emit_flat_function(ff))
+
+    返回的 FlatFunction 引用着底层 buffer，关闭之前要先丢掉它们（或者先 to_function()）。
+    """
+
+    def __init__(self, buf, _owner=None):
+        self._owner = _owner
+        self._buf = memoryview(buf)
+        magic, version, byteorder, _, n, index_offset = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise IRFormatError("not a binary IR file")
+        if version != FORMAT_VERSION:
+            raise IRFormatError(f"unsupported binary IR version {version} (expected {FORMAT_VERSION})")
+        self._swap = byteorder != _BYTEORDER
+        self._index = [
+            _INDEX_ENTRY.unpack_from(self._buf, index_offset + i * _INDEX_ENTRY.size) for i in range(n)
+        ]
+
+    @staticmethod
+    def open(path: str) -> "IRFile":
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return IRFile(mm, _owner=mm)
+
+    def close(self) -> None:
+        self._buf.release()
+        if self._owner is not None:
+            try:
+                self._owner.close()
+            except BufferError:
+                # 还有 FlatFunction 引用着 mmap：交给 GC，它们释放后 mmap 随之关闭
+                pass
+            self._owner = None
+
+    def __enter__(self) -> "IRFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def name(self, i: int) -> str:
+        """只读函数名，不解码记录的其余部分。"""
+        return _Reader(self._buf, self._index[i][0]).str()
+
+    def names(self) -> list[str]:
+        return [self.name(i) for i in range(len(self))]
+
+    def flat(self, i: int) -> FlatFunction:
+        r = _Reader(self._buf, self._index[i][0])
+        ff = FlatFunction(r.str(), None)
+        ff.source = r.str()
+        n_types, n_lits, n_names, n_params, n_exprs, n_stmts, n_blocks, n_block_stmts = r.unpack("<8I")
+        ff.ret_ty = _decode_type(r)
+        ff.types = [_decode_type(r) for _ in range(n_types)]
+        ff.literals = [_decode_literal(r) for _ in range(n_lits)]
+        ff.names = [r.str() for _ in range(n_names)]
+        ff.params = [r.unpack("<ii") for _ in range(n_params)]
+        for group, n in ((_EXPR_ARRAYS, n_exprs), (_STMT_ARRAYS, n_stmts), (_BLOCK_ARRAYS, n_blocks)):
+            for field, code in group:
+                setattr(ff, field, r.array(code, n, self._swap))
+        ff.b_stmts = r.array("i", n_block_stmts, self._swap)
+        return ff
+
+    def function(self, i: int) -> Function:
+        return self.flat(i).to_function()
+
+    def __iter__(self) -> Iterator[FlatFunction]:
+        for i in range(len(self)):
+            yield self.flat(i)
+
+
+def loads(buf) -> list[Function]:
+    """dumps 的逆操作，直接得到对象 IR（buffer 用完即可释放）。"""
+    f = IRFile(buf)
+    try:
+        return [f.function(i) for i in range(len(f))]
+    finally:
+        f.close()
+
+
+def load(path: str) -> list[Function]:
+    with IRFile.open(path) as f:
+        return [f.function(i) for i in range(len(f))]
@@ -0,0 +1,346 @@
+"""
+数组化（struct-of-arrays）的函数 IR。
+
+大函数里每个节点一个对象，遍历慢、内存也大。FlatFunction 把一个函数体
+存成几组平行的定长数组：
+
+  表达式（按后序排列，子节点下标总是小于父节点）
+    e_op[i]   opcode（LITERAL / VAR / BINARY / UNARY / CAST）
+    e_ty[i]   types 表里的下标（CAST 时就是 to_ty）
+    e_sub[i]  BinOp / UnOp 在 BIN_OPS / UN_OPS 里的下标
+    e_a[i]    LITERAL: literals 下标；VAR: names 下标；BINARY: lhs；UNARY / CAST: 操作数
+    e_b[i]    BINARY: rhs；其余 -1
+
+  语句（前序：先是语句自己的表达式，再是嵌套块）
+    s_op[i]   opcode（S_EXPR / S_VARDECL / ...）
+    s_expr[i] 语句的表达式（init / value / cond），没有则 -1
+    s_name[i], s_ty[i]  VarDecl / Assign 的变量名和类型
+    s_a[i], s_b[i]      If: then / else 块；While: body 块；BlockStmt: 块
+
+  块
+    b_start[k], b_len[k]  在 b_stmts 里的区间；块 0 是函数体
+
+  源码位置
+    e_start / e_end, s_start / s_end  节点 span 的 offset（NO_SPAN 表示没有）；
+    一个函数的节点都来自同一个文件，路径存在 source 里
+
+语句按前序展开，所以每条语句的表达式在 e_* 里是一段连续区间，而且整体
+单调递增 —— typecheck / emit 可以一遍线性扫过去，不需要栈。
+hash-consing 过的 DAG 也能直接转换：共享的子树只存一次。
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Optional
+
+from translator.ir.nodes import (
+    Assign, BinOp, Binary, Block, BlockStmt, Cast, Expr, ExprStmt, Function, If, Literal,
+    Return, Stmt, UnOp, Unary, Var, VarDecl, While, expr_children,
+)
+from translator.common.source import SOURCES, pack_span, unpack_span
+from translator.ir.types import Type
+
+# 表达式 opcode
+LITERAL, VAR, BINARY, UNARY, CAST = range(5)
+# 语句 opcode
+S_EXPR, S_VARDECL, S_ASSIGN, S_RETURN, S_IF, S_WHILE, S_BLOCK = range(7)
+
+BIN_OPS: tuple[BinOp, ...] = tuple(BinOp)
+UN_OPS: tuple[UnOp, ...] = tuple(UnOp)
+_BIN_INDEX = {op: i for i, op in enumerate(BIN_OPS)}
+_UN_INDEX = {op: i for i, op in enumerate(UN_OPS)}
+
+NO_SPAN = 0xFFFFFFFF
+
+
+class FlatFunction:
+    __slots__ = (
+        "name", "ret_ty", "params", "source",
+        "types", "literals", "names",
+        "e_op", "e_ty", "e_sub", "e_a", "e_b", "e_start", "e_end",
+        "s_op", "s_expr", "s_name", "s_ty", "s_a", "s_b", "s_start", "s_end",
+        "b_start", "b_len", "b_stmts",
+    )
+
+    def __init__(self, name: str, ret_ty: Type):
+        self.name = name
+        self.ret_ty = ret_ty
+        # 节点 span 所在的文件（没有 span 时为空）
+        self.source = ""
+        # [(names 下标, types 下标)]
+        self.params: list[tuple[int, int]] = []
+        self.types: list[Type] = []
+        self.literals: list = []
+        self.names: list[str] = []
+        self.e_op = array("B")
+        self.e_ty = array("H")
+        self.e_sub = array("B")
+        self.e_a = array("i")
+        self.e_b = array("i")
+        self.e_start = array("I")
+        self.e_end = array("I")
+        self.s_op = array("B")
+        self.s_expr = array("i")
+        self.s_name = array("i")
+        self.s_ty = array("i")
+        self.s_a = array("i")
+        self.s_b = array("i")
+        self.s_start = array("I")
+        self.s_end = array("I")
+        self.b_start = array("i")
+        self.b_len = array("i")
+        self.b_stmts = array("i")
+
+    def __len__(self) -> int:
+        """表达式节点个数。"""
+        return len(self.e_op)
+
+    def block_stmts(self, k: int) -> array:
+        start = self.b_start[k]
+        return self.b_stmts[start:start + self.b_len[k]]
+
+    def _span(self, starts, ends, i: int) -> Optional[int]:
+        start = starts[i]
+        if start == NO_SPAN:
+            return None
+        return pack_span(SOURCES.file_id(self.source), start, ends[i])
+
+    def expr_span(self, i: int) -> Optional[int]:
+        return self._span(self.e_start, self.e_end, i)
+
+    def stmt_span(self, i: int) -> Optional[int]:
+        return self._span(self.s_start, self.s_end, i)
+
+    # ---- 转回对象 IR ----
+
+    def expr(self, i: int, memo: Optional[dict[int, Expr]] = None) -> Expr:
+        """第 i 个表达式的对象形式；memo 在多次调用间共享时保留 DAG 结构。"""
+        if memo is None:
+            memo = {}
+        stack = [i]
+        while stack:
+            j = stack[-1]
+            if j in memo:
+                stack.pop()
+                continue
+            op = self.e_op[j]
+            a, b = self.e_a[j], self.e_b[j]
+            ty = self.types[self.e_ty[j]]
+            if op == BINARY:
+                if a not in memo or b not in memo:
+                    stack.append(b)
+                    stack.append(a)
+                    continue
+            elif op != LITERAL and op != VAR and a not in memo:
+                stack.append(a)
+                continue
+            span = self.expr_span(j)
+            if op == LITERAL:
+                memo[j] = Literal(ty=ty, value=self.literals[a], span=span)
+            elif op == VAR:
+                memo[j] = Var(ty=ty, name=self.names[a], span=span)
+            elif op == BINARY:
+                memo[j] = Binary(ty=ty, op=BIN_OPS[self.e_sub[j]], lhs=memo[a], rhs=memo[b], span=span)
+            elif op == UNARY:
+                memo[j] = Unary(ty=ty, op=UN_OPS[self.e_sub[j]], operand=memo[a], span=span)
+            else:
+                memo[j] = Cast(ty=ty, to_ty=ty, expr=memo[a], span=span)
+            stack.pop()
+        return memo[i]
+
+    def stmt(self, i: int, memo: Optional[dict[int, Expr]] = None) -> Stmt:
+        if memo is None:
+            memo = {}
+        op = self.s_op[i]
+        e = self.s_expr[i]
+        span = self.stmt_span(i)
+        if op == S_EXPR:
+            return ExprStmt(expr=self.expr(e, memo), span=span)
+        if op == S_VARDECL:
+            var = Var(ty=self.types[self.s_ty[i]], name=self.names[self.s_name[i]])
+            return VarDecl(var=var, init=None if e < 0 else self.expr(e, memo), span=span)
+        if op == S_ASSIGN:
+            target = Var(ty=self.types[self.s_ty[i]], name=self.names[self.s_name[i]])
+            return Assign(target=target, value=self.expr(e, memo), span=span)
+        if op == S_RETURN:
+            return Return(value=self.expr(e, memo), span=span)
+        if op == S_IF:
+            cond = self.expr(e, memo)
+            else_body = None if self.s_b[i] < 0 else self.block(self.s_b[i], memo)
+            return If(cond=cond, then_body=self.block(self.s_a[i], memo), else_body=else_body, span=span)
+        if op == S_WHILE:
+            return While(cond=self.expr(e, memo), body=self.block(self.s_a[i], memo), span=span)
+        return BlockStmt(block=self.block(self.s_a[i], memo), span=span)
+
+    def block(self, k: int, memo: Optional[dict[int, Expr]] = None) -> Block:
+        if memo is None:
+            memo = {}
+        return Block(stmts=[self.stmt(i, memo) for i in self.block_stmts(k)])
+
+    def to_function(self) -> Function:
+        params = [Var(ty=self.types[t], name=self.names[n]) for n, t in self.params]
+        return Function(name=self.name, params=params, ret_ty=self.ret_ty, body=self.block(0, {}))
+
+
+class _Builder:
+    def __init__(self, fn: Function):
+        self.ff = FlatFunction(fn.name, fn.ret_ty)
+        self._types: dict[Type, int] = {}
+        self._names: dict[str, int] = {}
+        self._literals: dict[tuple, int] = {}
+        # id(node) -> (node, 下标)：DAG 里共享的节点只存一次
+        self._done: dict[int, tuple[Expr, int]] = {}
+        # source 对应的 file_id；-1 表示还没见过带 span 的节点
+        self._file = -1
+
+    def span(self, span: Optional[int]) -> tuple[int, int]:
+        """span -> (start, end)；不在 source 文件里的 span 不保存。"""
+        if span is None:
+            return NO_SPAN, NO_SPAN
+        file_id, start, end = unpack_span(span)
+        if self._file < 0:
+            self._file = file_id
+            self.ff.source = SOURCES.path(file_id)
+        elif file_id != self._file:
+            return NO_SPAN, NO_SPAN
+        return start, end
+
+    def type_id(self, ty: Type) -> int:
+        i = self._types.get(ty)
+        if i is None:
+            i = self._types[ty] = len(self.ff.types)
+            self.ff.types.append(ty)
+        return i
+
+    def name_id(self, name: str) -> int:
+        i = self._names.get(name)
+        if i is None:
+            i = self._names[name] = len(self.ff.names)
+            self.ff.names.append(name)
+        return i
+
+    def literal_id(self, value) -> int:
+        # True == 1，key 里带上类型
+        key = (type(value), value)
+        i = self._literals.get(key)
+        if i is None:
+            i = self._literals[key] = len(self.ff.literals)
+            self.ff.literals.append(value)
+        return i
+
+    def expr(self, root: Expr) -> int:
+        ff, done = self.ff, self._done
+        stack: list[tuple[Expr, bool]] = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            hit = done.get(id(node))
+            if hit is not None and hit[0] is node:
+                continue
+            kids = expr_children(node)
+            if kids and not expanded:
+                stack.append((node, True))
+                for k in reversed(kids):
+                    stack.append((k, False))
+                continue
+            sub, a, b = 0, -1, -1
+            if isinstance(node, Literal):
+                op, a = LITERAL, self.literal_id(node.value)
+            elif isinstance(node, Var):
+                op, a = VAR, self.name_id(node.name)
+            elif isinstance(node, Binary):
+                op, sub = BINARY, _BIN_INDEX[node.op]
+                a, b = done[id(node.lhs)][1], done[id(node.rhs)][1]
+            elif isinstance(node, Unary):
+                op, sub, a = UNARY, _UN_INDEX[node.op], done[id(node.operand)][1]
+            elif isinstance(node, Cast):
+                op, a = CAST, done[id(node.expr)][1]
+            else:
+                raise NotImplementedError(f"No flat encoding for {type(node).__name__}")
+            done[id(node)] = (node, len(ff.e_op))
+            ff.e_op.append(op)
+            ff.e_ty.append(self.type_id(node.ty))
+            ff.e_sub.append(sub)
+            ff.e_a.append(a)
+            ff.e_b.append(b)
+            start, end = self.span(node.span)
+            ff.e_start.append(start)
+            ff.e_end.append(end)
+        return done[id(root)][1]
+
+    def stmt(self, s: Stmt) -> int:
+        ff = self.ff
+        i = len(ff.s_op)
+        op, e, name, ty, a, b = S_EXPR, -1, -1, -1, -1, -1
+        ff.s_op.append(0)
+        for arr in (ff.s_expr, ff.s_name, ff.s_ty, ff.s_a, ff.s_b):
+            arr.append(-1)
+        start, end = self.span(s.span)
+        ff.s_start.append(start)
+        ff.s_end.append(end)
+        # 先登记语句自己的表达式，再展开嵌套块：和 typecheck / emit 的访问顺序一致
+        if isinstance(s, ExprStmt):
+            e = self.expr(s.expr)
+        elif isinstance(s, VarDecl):
+            op, name, ty = S_VARDECL, self.name_id(s.var.name), self.type_id(s.var.ty)
+            if s.init is not None:
+                e = self.expr(s.init)
+        elif isinstance(s, Assign):
+            op, name, ty = S_ASSIGN, self.name_id(s.target.name), self.type_id(s.target.ty)
+            e = self.expr(s.value)
+        elif isinstance(s, Return):
+            op, e = S_RETURN, self.expr(s.value)
+        elif isinstance(s, If):
+            op, e = S_IF, self.expr(s.cond)
+            a = self.block(s.then_body)
+            if s.else_body is not None:
+                b = self.block(s.else_body)
+        elif isinstance(s, While):
+            op, e = S_WHILE, self.expr(s.cond)
+            a = self.block(s.body)
+        elif isinstance(s, BlockStmt):
+            op, a = S_BLOCK, self.block(s.block)
+        else:
+            raise NotImplementedError(f"No flat encoding for {type(s).__name__}")
+        ff.s_op[i] = op
+        ff.s_expr[i] = e
+        ff.s_name[i] = name
+        ff.s_ty[i] = ty
+        ff.s_a[i] = a
+        ff.s_b[i] = b
+        return i
+
+    def block(self, block: Block) -> int:
+        ff = self.ff
+        k = len(ff.b_start)
+        ff.b_start.append(0)
+        ff.b_len.append(0)
+        ids = [self.stmt(s) for s in block.stmts]
+        # 嵌套块先完成，所以 b_stmts 里各块的区间互不交叉
+        ff.b_start[k] = len(ff.b_stmts)
+        ff.b_len[k] = len(ids)
+        ff.b_stmts.extend(ids)
+        return k
+
+
+def flatten_function(fn: Function) -> FlatFunction:
+    b = _Builder(fn)
+    b.ff.params = [(b.name_id(p.name), b.type_id(p.ty)) for p in fn.params]
+    b.block(fn.body)
+    return b.ff
+
+
+def expr_refcounts(ff: FlatFunction) -> array:
+    """每个表达式被引用的次数（父节点 + 语句）；emit 时据此及时释放子表达式的代码。"""
+    refs = array("i", bytes(4 * len(ff.e_op)))
+    e_op, e_a, e_b = ff.e_op, ff.e_a, ff.e_b
+    for i in range(len(e_op)):
+        op = e_op[i]
+        if op == BINARY:
+            refs[e_a[i]] += 1
+            refs[e_b[i]] += 1
+        elif op == UNARY or op == CAST:
+            refs[e_a[i]] += 1
+    for e in ff.s_expr:
+        if e >= 0:
+            refs[e] += 1
+    return refs
@@ -0,0 +1,249 @@
+"""
+常量折叠 + 代数化简 + 块展平。
+
+- 字面量子表达式按 Type.bits / signed 做定宽回绕运算（和 i32 / u32 的机器语义一致）；
+  除以 0、有符号 INT_MIN / -1 这类 C 里未定义的情况不折叠，原样保留。
+- 恒等式：x + 0、x - 0、x * 1、x / 1、x * 0、x - x（同一个变量），
+  以及 bool 的 true && x、false || x、not not x 之类。
+  IR 里的表达式都没有副作用，丢掉操作数是安全的。
+- 条件为字面量的 if / while 直接选分支或删掉；化简成 y = y 的赋值删掉。
+- 不含 VarDecl 的 BlockStmt 展开进外层块（不影响作用域）；
+  块里只有一个 BlockStmt 时去掉多余的一层。
+
+浮点数不折叠（Python float 是 double，和 f32 的舍入不一致）。
+
+折叠在 typecheck 之后做（translator.pipeline 的 optimize）：if (0) / while (0) 的死分支
+被删掉之前已经检查过，-O 不会放过默认路径会拒绝的 IR。
+"""
+from __future__ import annotations
+
+from translator.ir.nodes import (
+    Assign, BinOp, Binary, Block, BlockStmt, Cast, Expr, ExprStmt, Function, If, Literal,
+    Return, Stmt, UnOp, Unary, Var, VarDecl, While, expr_children,
+)
+from translator.ir.types import Signedness, Type
+
+_CMP = {
+    BinOp.LT: lambda a, b: a < b,
+    BinOp.LE: lambda a, b: a <= b,
+    BinOp.GT: lambda a, b: a > b,
+    BinOp.GE: lambda a, b: a >= b,
+    BinOp.EQ: lambda a, b: a == b,
+    BinOp.NE: lambda a, b: a != b,
+}
+
+
+def wrap(value: int, ty: Type) -> int:
+    """把整数截到 ty 的位宽：无符号取模，有符号按补码解释。"""
+    bits = ty.bits
+    v = value & ((1 << bits) - 1)
+    if ty.signed == Signedness.SIGNED and v >> (bits - 1):
+        v -= 1 << bits
+    return v
+
+
+def _is_int(ty: Type) -> bool:
+    return ty.kind == "int" and ty.bits is not None
+
+
+def _int_lit(e: Expr):
+    """e 是整数字面量时返回按类型归一化后的值，否则 None。"""
+    if isinstance(e, Literal) and _is_int(e.ty) and type(e.value) is int:
+        return wrap(e.value, e.ty)
+    return None
+
+
+def _bool_lit(e: Expr):
+    if isinstance(e, Literal) and e.ty.kind == "bool" and type(e.value) is bool:
+        return e.value
+    return None
+
+
+def _fold_int_arith(op: BinOp, a: int, b: int, ty: Type):
+    if op == BinOp.ADD:
+        return wrap(a + b, ty)
+    if op == BinOp.SUB:
+        return wrap(a - b, ty)
+    if op == BinOp.MUL:
+        return wrap(a * b, ty)
+    if op == BinOp.DIV:
+        if b == 0:
+            return None
+        if ty.signed == Signedness.SIGNED and b == -1 and a == -(1 << (ty.bits - 1)):
+            return None
+        # C 的整数除法向 0 截断
+        q = abs(a) // abs(b)
+        return q if (a < 0) == (b < 0) else -q
+    return None
+
+
+def _fold_binary(e: Binary, lhs: Expr, rhs: Expr) -> Expr:
+    op, ty = e.op, e.ty
+    a, b = _int_lit(lhs), _int_lit(rhs)
+
+    if a is not None and b is not None and lhs.ty is rhs.ty:
+        if op in _CMP and ty.kind == "bool":
+            return Literal(ty=ty, value=_CMP[op](a, b), span=e.span)
+        if _is_int(ty) and ty is lhs.ty:
+            v = _fold_int_arith(op, a, b, ty)
+            if v is not None:
+                return Literal(ty=ty, value=v, span=e.span)
+
+    if _is_int(ty):
+        # 化简结果必须和原节点同类型：输入已经通过 typecheck，折叠后的 IR 也要保持类型一致
+        if op == BinOp.ADD:
+            if b == 0 and lhs.ty is ty:
+                return lhs
+            if a == 0 and rhs.ty is ty:
+                return rhs
+        elif op == BinOp.SUB:
+            if b == 0 and lhs.ty is ty:
+                return lhs
+            if isinstance(lhs, Var) and isinstance(rhs, Var) and lhs.name == rhs.name and lhs.ty is ty:
+                return Literal(ty=ty, value=0, span=e.span)
+        elif op == BinOp.MUL:
+            if b == 1 and lhs.ty is ty:
+                return lhs
+            if a == 1 and rhs.ty is ty:
+                return rhs
+            if (a == 0 or b == 0) and lhs.ty is ty and rhs.ty is ty:
+                return Literal(ty=ty, value=0, span=e.span)
+        elif op == BinOp.DIV:
+            if b == 1 and lhs.ty is ty:
+                return lhs
+
+    if ty.kind == "bool" and lhs.ty is ty and rhs.ty is ty:
+        p, q = _bool_lit(lhs), _bool_lit(rhs)
+        if op == BinOp.LAND:
+            if p is not None:
+                return rhs if p else lhs
+            if q is not None:
+                return lhs if q else rhs
+        elif op == BinOp.LOR:
+            if p is not None:
+                return lhs if p else rhs
+            if q is not None:
+                return rhs if q else lhs
+        elif op in (BinOp.EQ, BinOp.NE) and p is not None and q is not None:
+            return Literal(ty=ty, value=_CMP[op](p, q), span=e.span)
+
+    if lhs is e.lhs and rhs is e.rhs:
+        return e
+    return Binary(ty=ty, op=op, lhs=lhs, rhs=rhs, span=e.span)
+
+
+def _fold_unary(e: Unary, operand: Expr) -> Expr:
+    if e.op == UnOp.NOT and e.ty.kind == "bool":
+        p = _bool_lit(operand)
+        if p is not None:
+            return Literal(ty=e.ty, value=not p, span=e.span)
+        # not not x -> x
+        if isinstance(operand, Unary) and operand.op == UnOp.NOT and operand.operand.ty is e.ty:
+            return operand.operand
+    if operand is e.operand:
+        return e
+    return Unary(ty=e.ty, op=e.op, operand=operand, span=e.span)
+
+
+def _fold_cast(e: Cast, inner: Expr) -> Expr:
+    to = e.to_ty
+    if inner.ty is to:
+        return inner
+    v = _int_lit(inner)
+    if v is None and _bool_lit(inner) is not None:
+        v = int(_bool_lit(inner))
+    if v is not None:
+        if _is_int(to):
+            return Literal(ty=to, value=wrap(v, to), span=e.span)
+        if to.kind == "bool":
+            return Literal(ty=to, value=v != 0, span=e.span)
+    if inner is e.expr:
+        return e
+    return Cast(ty=to, to_ty=to, expr=inner, span=e.span)
+
+
+def fold_expr(expr: Expr) -> Expr:
+    """后序（显式栈）折叠一棵表达式；没有变化的子树原样复用。"""
+    values: list[Expr] = []
+    stack: list[tuple[Expr, bool]] = [(expr, False)]
+    while stack:
+        node, expanded = stack.pop()
+        kids = expr_children(node)
+        if kids and not expanded:
+            stack.append((node, True))
+            for k in reversed(kids):
+                stack.append((k, False))
+            continue
+        if isinstance(node, Binary):
+            rhs = values.pop()
+            lhs = values.pop()
+            values.append(_fold_binary(node, lhs, rhs))
+        elif isinstance(node, Unary):
+            values.append(_fold_unary(node, values.pop()))
+        elif isinstance(node, Cast):
+            values.append(_fold_cast(node, values.pop()))
+        else:
+            values.append(node)
+    return values[0]
+
+
+def _fold_stmts(stmts: list[Stmt]) -> list[Stmt]:
+    out: list[Stmt] = []
+    for s in stmts:
+        for r in _fold_stmt(s):
+            # 不声明变量的块展开进外层，不影响作用域
+            if isinstance(r, BlockStmt) and not any(isinstance(x, VarDecl) for x in r.block.stmts):
+                out.extend(r.block.stmts)
+            else:
+                out.append(r)
+    # 整个块只剩一个 BlockStmt：外面这层块已经提供了作用域
+    if len(out) == 1 and isinstance(out[0], BlockStmt):
+        return out[0].block.stmts
+    return out
+
+
+def fold_block(block: Block) -> Block:
+    return Block(stmts=_fold_stmts(block.stmts))
+
+
+def _fold_stmt(s: Stmt) -> list[Stmt]:
+    """折叠一条语句；结果可能是 0 条（删掉的死分支）或多条。"""
+    if isinstance(s, ExprStmt):
+        return [ExprStmt(expr=fold_expr(s.expr), span=s.span)]
+    if isinstance(s, VarDecl):
+        return [s if s.init is None else VarDecl(var=s.var, init=fold_expr(s.init), span=s.span)]
+    if isinstance(s, Assign):
+        value = fold_expr(s.value)
+        # 化简后变成 y = y 的赋值没有效果
+        if isinstance(value, Var) and value.name == s.target.name and value.ty is s.target.ty:
+            return []
+        return [Assign(target=s.target, value=value, span=s.span)]
+    if isinstance(s, Return):
+        return [Return(value=fold_expr(s.value), span=s.span)]
+    if isinstance(s, If):
+        cond = fold_expr(s.cond)
+        c = _bool_lit(cond)
+        if c is not None:
+            taken = s.then_body if c else s.else_body
+            if taken is None:
+                return []
+            body = fold_block(taken)
+            # 分支里的声明仍然需要自己的作用域
+            return [BlockStmt(block=body, span=s.span)] if body.stmts else []
+        else_body = None if s.else_body is None else fold_block(s.else_body)
+        if else_body is not None and not else_body.stmts:
+            else_body = None
+        return [If(cond=cond, then_body=fold_block(s.then_body), else_body=else_body, span=s.span)]
+    if isinstance(s, While):
+        cond = fold_expr(s.cond)
+        if _bool_lit(cond) is False:
+            return []
+        return [While(cond=cond, body=fold_block(s.body), span=s.span)]
+    if isinstance(s, BlockStmt):
+        body = fold_block(s.block)
+        return [BlockStmt(block=body, span=s.span)] if body.stmts else []
+    return [s]
+
+
+def fold_function(fn: Function) -> Function:
+    return Function(name=fn.name, params=fn.params, ret_ty=fn.ret_ty, body=fold_block(fn.body))
@@ -0,0 +1,140 @@
+"""
+表达式 hash-consing：结构相同的表达式只保留一个节点，IR 从树变成 DAG。
+
+csmith 代码里同一个变量引用 / 子表达式会重复成千上万次，lower 出来每次都是
+一个新对象。ExprTable 按 (节点类, 类型, 运算符, 子节点) 查表，相同结构直接
+返回已有节点；子节点本身已经规范化，所以按 identity 比较就够了。
+共享节点的 span 是它第一次出现的位置；语句的 span 原样保留。
+
+这一层是可选的：typecheck / emit 对树和 DAG 都能工作，遇到共享子树时
+按节点 memo，同一个子树只检查 / 生成一次。
+"""
+from __future__ import annotations
+
+from translator.ir.nodes import (
+    Binary, Block, BlockStmt, Cast, Expr, ExprStmt, Function, If, Literal, Return, Stmt,
+    Unary, Var, VarDecl, Assign, While, LiteralValue, BinOp, UnOp, expr_children,
+    stmt_blocks, stmt_exprs,
+)
+from translator.ir.types import Type
+
+
+class ExprTable:
+    __slots__ = ("_nodes", "hits")
+
+    def __init__(self):
+        # key -> 规范节点。key 里的子节点用 id()：节点被表引用着，id 不会被复用
+        self._nodes: dict[tuple, Expr] = {}
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _get(self, key: tuple, make) -> Expr:
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._nodes[key] = make()
+        else:
+            self.hits += 1
+        return node
+
+    def literal(self, ty: Type, value: LiteralValue, span: int | None = None) -> Literal:
+        # True == 1 且 hash 相同，key 里带上值的 Python 类型区分开
+        return self._get((Literal, ty, type(value), value), lambda: Literal(ty=ty, value=value, span=span))
+
+    def var(self, ty: Type, name: str, span: int | None = None) -> Var:
+        return self._get((Var, ty, name), lambda: Var(ty=ty, name=name, span=span))
+
+    def cast(self, to_ty: Type, expr: Expr, span: int | None = None) -> Cast:
+        return self._get((Cast, to_ty, id(expr)), lambda: Cast(ty=to_ty, to_ty=to_ty, expr=expr, span=span))
+
+    def unary(self, ty: Type, op: UnOp, operand: Expr, span: int | None = None) -> Unary:
+        return self._get((Unary, ty, op, id(operand)), lambda: Unary(ty=ty, op=op, operand=operand, span=span))
+
+    def binary(self, ty: Type, op: BinOp, lhs: Expr, rhs: Expr, span: int | None = None) -> Binary:
+        return self._get((Binary, ty, op, id(lhs), id(rhs)),
+                         lambda: Binary(ty=ty, op=op, lhs=lhs, rhs=rhs, span=span))
+
+    def intern(self, expr: Expr) -> Expr:
+        """把一棵已有的表达式树换成表里的规范节点（显式栈，不受嵌套深度限制）。"""
+        done: dict[int, Expr] = {}
+        stack: list[tuple[Expr, bool]] = [(expr, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in done:
+                continue
+            kids = expr_children(node)
+            if kids and not expanded:
+                stack.append((node, True))
+                for k in reversed(kids):
+                    stack.append((k, False))
+                continue
+            span = node.span
+            if isinstance(node, Literal):
+                out = self.literal(node.ty, node.value, span)
+            elif isinstance(node, Var):
+                out = self.var(node.ty, node.name, span)
+            elif isinstance(node, Binary):
+                out = self.binary(node.ty, node.op, done[id(node.lhs)], done[id(node.rhs)], span)
+            elif isinstance(node, Unary):
+                out = self.unary(node.ty, node.op, done[id(node.operand)], span)
+            elif isinstance(node, Cast):
+                out = self.cast(node.to_ty, done[id(node.expr)], span)
+            else:
+                raise NotImplementedError(f"hash-consing not supported for {type(node).__name__}")
+            done[id(node)] = out
+        return done[id(expr)]
+
+    def share_block(self, block: Block) -> Block:
+        return Block(stmts=[self.share_stmt(s) for s in block.stmts])
+
+    def share_stmt(self, stmt: Stmt) -> Stmt:
+        span = stmt.span
+        if isinstance(stmt, ExprStmt):
+            return ExprStmt(expr=self.intern(stmt.expr), span=span)
+        if isinstance(stmt, VarDecl):
+            init = None if stmt.init is None else self.intern(stmt.init)
+            return VarDecl(var=self.intern(stmt.var), init=init, span=span)
+        if isinstance(stmt, Assign):
+            return Assign(target=self.intern(stmt.target), value=self.intern(stmt.value), span=span)
+        if isinstance(stmt, Return):
+            return Return(value=self.intern(stmt.value), span=span)
+        if isinstance(stmt, If):
+            else_body = None if stmt.else_body is None else self.share_block(stmt.else_body)
+            return If(cond=self.intern(stmt.cond), then_body=self.share_block(stmt.then_body), else_body=else_body,
+                      span=span)
+        if isinstance(stmt, While):
+            return While(cond=self.intern(stmt.cond), body=self.share_block(stmt.body), span=span)
+        if isinstance(stmt, BlockStmt):
+            return BlockStmt(block=self.share_block(stmt.block), span=span)
+        raise NotImplementedError(f"hash-consing not supported for {type(stmt).__name__}")
+
+    def share_function(self, fn: Function) -> Function:
+        return Function(
+            name=fn.name,
+            params=[self.intern(p) for p in fn.params],
+            ret_ty=fn.ret_ty,
+            body=self.share_block(fn.body),
+        )
+
+
+def shared_exprs(fn: Function) -> set[int]:
+    """
+    函数里被引用不止一次的表达式节点（id 集合）。
+    普通的树返回空集；hash-consing 过的 DAG 里就是那些值得 memo 的子树。
+    """
+    refs: dict[int, int] = {}
+    blocks = [fn.body]
+    stack: list[Expr] = []
+    while blocks:
+        for s in blocks.pop().stmts:
+            stack.extend(stmt_exprs(s))
+            blocks.extend(stmt_blocks(s))
+    while stack:
+        e = stack.pop()
+        n = refs.get(id(e), 0)
+        refs[id(e)] = n + 1
+        if n == 0:
+            # 第一次见到才往下走，共享子树只遍历一次
+            stack.extend(expr_children(e))
+    return {i for i, n in refs.items() if n > 1}
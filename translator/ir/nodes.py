@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Optional, Union, List
 
@@ -23,22 +23,24 @@ class BinOp(str, Enum):
 class UnOp(str, Enum):
     NOT="NOT"   # !
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Expr:
     ty: Type
+    # 源码位置（translator.common.source 的打包 span），不参与比较
+    span: int | None = field(default=None, kw_only=True, compare=False, repr=False)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Literal(Expr):
     value: LiteralValue
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Var(Expr):
     name: str
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Cast(Expr):
     to_ty: Type
     expr: Expr
@@ -48,63 +50,98 @@ class Cast(Expr):
         object.__setattr__(self, "ty", self.to_ty)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Binary(Expr):
     op: BinOp
     lhs: Expr
     rhs: Expr
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Unary(Expr):
     op: UnOp
     operand: Expr
 
+def expr_children(expr: Expr) -> tuple:
+    """表达式的直接子节点（按求值顺序），给非递归遍历用。"""
+    if isinstance(expr, Binary):
+        return (expr.lhs, expr.rhs)
+    if isinstance(expr, Unary):
+        return (expr.operand,)
+    if isinstance(expr, Cast):
+        return (expr.expr,)
+    return ()
+
 # ---------- Statements ----------
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Stmt:
-    pass
+    span: int | None = field(default=None, kw_only=True, compare=False, repr=False)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ExprStmt(Stmt):
     expr: Expr
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class VarDecl(Stmt):
     var: Var
     init: Optional[Expr] = None
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Assign(Stmt):
     target: Var
     value: Expr
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Return(Stmt):
     value: Expr
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Block(Stmt):
     stmts: List[Stmt]
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class BlockStmt(Stmt):
     block: Block
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class If(Stmt):
     cond: Expr
     then_body: Block
     else_body: Block | None = None
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class While(Stmt):
     cond: Expr
     body: Block
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Function:
     name: str
     params: list[Var]
     ret_ty: Type
     body: Block
+
+
+def stmt_exprs(stmt: Stmt) -> tuple:
+    """语句直接引用的表达式（不含嵌套块里的）。"""
+    if isinstance(stmt, ExprStmt):
+        return (stmt.expr,)
+    if isinstance(stmt, VarDecl):
+        return (stmt.var,) if stmt.init is None else (stmt.var, stmt.init)
+    if isinstance(stmt, Assign):
+        return (stmt.target, stmt.value)
+    if isinstance(stmt, Return):
+        return (stmt.value,)
+    if isinstance(stmt, (If, While)):
+        return (stmt.cond,)
+    return ()
+
+def stmt_blocks(stmt: Stmt) -> tuple:
+    """语句直接包含的块。"""
+    if isinstance(stmt, If):
+        return (stmt.then_body,) if stmt.else_body is None else (stmt.then_body, stmt.else_body)
+    if isinstance(stmt, While):
+        return (stmt.body,)
+    if isinstance(stmt, BlockStmt):
+        return (stmt.block,)
+    return ()
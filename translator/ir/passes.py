@@ -0,0 +1,190 @@
+"""
+Pass manager：多个分析 / 变换共用一次遍历。
+
+typecheck、统计、emit 各自走一遍整棵树，加一个 pass 就多一次遍历。
+这里统一成一个访问协议（FunctionPass），PassManager 对每个函数只走一次：
+
+    begin_function(fn)
+    对每条语句（前序）：
+        语句自己的表达式（stmt_exprs）逐个后序遍历，每个节点调用
+            expr(node, kids)      kids 是这个 pass 对子节点返回的结果
+        stmt(stmt, results)       results 对应 stmt_exprs(stmt)，在嵌套块之前调用
+        嵌套块（stmt_blocks）里的语句递归处理
+        end_stmt(stmt, depth)     depth=0 是函数体的顶层语句
+    end_function(fn) -> 这个 pass 的结果
+
+没有覆盖的钩子不会被调用。每个 pass 的耗时分别累计在 PassManager.timings 里。
+内置的 pass：StatsPass（这里）、TypecheckPass（typecheck.py）、EmitPass（carbon_emitter.py）。
+"""
+from __future__ import annotations
+
+import time
+from collections import Counter
+from typing import Sequence
+
+from translator.ir.hashcons import shared_exprs
+from translator.ir.nodes import Expr, Function, Stmt, expr_children, stmt_blocks, stmt_exprs
+
+
+class FunctionPass:
+    name = "pass"
+
+    def begin_function(self, fn: Function) -> None:
+        pass
+
+    def expr(self, node: Expr, kids: list) -> object:
+        return None
+
+    def stmt(self, stmt: Stmt, results: list) -> None:
+        pass
+
+    def end_stmt(self, stmt: Stmt, depth: int) -> None:
+        pass
+
+    def end_function(self, fn: Function) -> object:
+        return None
+
+
+def _overrides(p: FunctionPass, hook: str) -> bool:
+    return getattr(type(p), hook) is not getattr(FunctionPass, hook)
+
+
+class PassManager:
+    def __init__(self, passes: Sequence[FunctionPass], timing: bool = True, dag: bool = False):
+        """
+        timing: 按 pass 统计耗时（每次钩子调用两次 perf_counter）。
+        dag: IR 经过 hash-consing 时打开，共享子树的结果只算一次（多一次只走唯一节点的预扫描）。
+        """
+        self.passes = list(passes)
+        self.timing = timing
+        self.dag = dag
+        self.timings: Counter = Counter()
+        self._expr_passes = [p for p in self.passes if _overrides(p, "expr")]
+        # stmt 钩子拿到的是自己那一列表达式结果：记下它在 _expr_passes 里的位置
+        self._stmt_passes = [
+            (p, self._expr_passes.index(p) if p in self._expr_passes else -1)
+            for p in self.passes if _overrides(p, "stmt")
+        ]
+        self._end_stmt_passes = [p for p in self.passes if _overrides(p, "end_stmt")]
+
+    def run(self, fn: Function) -> dict[str, object]:
+        """对 fn 跑一次所有 pass，返回 {pass 名: end_function 的结果}。"""
+        t_start = time.perf_counter()
+        for p in self.passes:
+            self._call(p, p.begin_function, fn)
+        self._shared = shared_exprs(fn) if self.dag else set()
+        self._memo: dict[int, tuple[Expr, tuple]] = {}
+        try:
+            self._block(fn.body.stmts, 0)
+            out = {p.name: self._call(p, p.end_function, fn) for p in self.passes}
+        finally:
+            self._memo = {}
+            self._shared = set()
+        self.timings["(total)"] += time.perf_counter() - t_start
+        return out
+
+    def report(self) -> str:
+        total = self.timings.get("(total)", 0.0)
+        hooks = sum(v for k, v in self.timings.items() if k != "(total)")
+        lines = [f"{name:<16} {secs * 1000:10.2f} ms" for name, secs in self.timings.items() if name != "(total)"]
+        if self.timing:
+            lines.append(f"{'(walk)':<16} {(total - hooks) * 1000:10.2f} ms")
+        lines.append(f"{'(total)':<16} {total * 1000:10.2f} ms")
+        return "\n".join(lines)
+
+    # ---- traversal ----
+
+    def _call(self, p: FunctionPass, hook, *args):
+        if not self.timing:
+            return hook(*args)
+        t0 = time.perf_counter()
+        try:
+            return hook(*args)
+        finally:
+            self.timings[p.name] += time.perf_counter() - t0
+
+    def _block(self, stmts: list[Stmt], depth: int) -> None:
+        call = self._call if self.timing else None
+        for s in stmts:
+            roots = stmt_exprs(s)
+            per_root = [self._expr(e) for e in roots] if self._expr_passes else []
+            for p, k in self._stmt_passes:
+                results = [r[k] for r in per_root] if k >= 0 else [None] * len(roots)
+                if call is None:
+                    p.stmt(s, results)
+                else:
+                    call(p, p.stmt, s, results)
+            for b in stmt_blocks(s):
+                self._block(b.stmts, depth + 1)
+            for p in self._end_stmt_passes:
+                if call is None:
+                    p.end_stmt(s, depth)
+                else:
+                    call(p, p.end_stmt, s, depth)
+
+    def _expr(self, root: Expr) -> tuple:
+        # 显式栈后序遍历，每个节点上依次调用所有 pass。
+        # 结果按 pass 分列存放（每个 pass 一个栈），子节点的结果直接切片，不为每个节点拼 tuple
+        passes = self._expr_passes
+        hooks = [(p.expr, p.name, []) for p in passes]
+        memo, shared = self._memo, self._shared
+        timing = self.timing
+        timings = self.timings
+        no_kids: list = []
+        # (节点, 子节点个数)；-1 表示还没展开
+        stack: list[tuple[Expr, int]] = [(root, -1)]
+        while stack:
+            node, n = stack.pop()
+            if n < 0:
+                if shared:
+                    hit = memo.get(id(node))
+                    if hit is not None and hit[0] is node:
+                        for (_, _, col), v in zip(hooks, hit[1]):
+                            col.append(v)
+                        continue
+                kids = expr_children(node)
+                if kids:
+                    stack.append((node, len(kids)))
+                    for k in reversed(kids):
+                        stack.append((k, -1))
+                    continue
+            for expr, name, col in hooks:
+                if n > 0:
+                    kid_results = col[-n:]
+                    del col[-n:]
+                else:
+                    kid_results = no_kids
+                if timing:
+                    t0 = time.perf_counter()
+                    col.append(expr(node, kid_results))
+                    timings[name] += time.perf_counter() - t0
+                else:
+                    col.append(expr(node, kid_results))
+            if shared and id(node) in shared:
+                memo[id(node)] = (node, tuple(col[-1] for _, _, col in hooks))
+        return tuple(col[0] for _, _, col in hooks)
+
+
+# ---------- 统计 ----------
+
+class StatsPass(FunctionPass):
+    """节点统计：各类节点个数、最大表达式深度。"""
+
+    name = "stats"
+
+    def begin_function(self, fn: Function) -> None:
+        self.counts: Counter = Counter()
+        self.max_depth = 0
+
+    def expr(self, node, kids):
+        self.counts[type(node).__name__] += 1
+        depth = 1 + max(kids, default=0)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return depth
+
+    def end_stmt(self, stmt, depth) -> None:
+        self.counts[type(stmt).__name__] += 1
+
+    def end_function(self, fn: Function) -> dict:
+        return {"nodes": dict(self.counts), "max_expr_depth": self.max_depth}
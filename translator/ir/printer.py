@@ -1,54 +1,121 @@
-from typing import List
+"""
+IR 的文本打印（调试 / diff 用）。
+
+一次显式栈遍历，语句和表达式共用一个栈，按行写进文本流；
+行先攒在缓冲里，够 _FLUSH_LINES 行再一次 write 出去，超大函数也不会
+在内存里拼出整段字符串。
+
+两种格式：
+  默认    每个节点一行，按层级缩进两个空格
+  compact 每个节点一行，行首是层级数字而不是缩进 —— 深层嵌套时行长不随深度增长，
+          适合把巨大函数的 IR 落盘后 diff
+"""
+from __future__ import annotations
+
+import io
+from typing import Iterable, TextIO
 
 from translator.ir.nodes import (
-    Expr, Literal, Var, Cast, Binary,
-    Stmt, Assign, Return, Block,
+    Assign, Binary, Block, BlockStmt, Cast, Expr, ExprStmt, Function, If, Literal,
+    Return, Stmt, Unary, Var, VarDecl, While,
 )
 
+# 攒够这么多行再写一次
+_FLUSH_LINES = 1024
+
+_INDENTS: list[str] = [""]
+
+
 def _indent(level: int) -> str:
-    return "  " * level
+    while len(_INDENTS) <= level:
+        _INDENTS.append(_INDENTS[-1] + "  ")
+    return _INDENTS[level]
+
+
+def _label(node) -> tuple[str, tuple]:
+    """节点自己那一行的内容和要继续打印的子节点（按输出顺序）。"""
+    if isinstance(node, Literal):
+        return f"Literal {node.value} : {node.ty.short()}", ()
+    if isinstance(node, Var):
+        return f"Var {node.name} : {node.ty.short()}", ()
+    if isinstance(node, Cast):
+        return f"Cast -> {node.to_ty.short()}", (node.expr,)
+    if isinstance(node, Binary):
+        return f"Binary {node.op.value} : {node.ty.short()}", (node.lhs, node.rhs)
+    if isinstance(node, Unary):
+        return f"Unary {node.op.value} : {node.ty.short()}", (node.operand,)
+    if isinstance(node, Block):
+        return "Block", tuple(node.stmts)
+    if isinstance(node, Assign):
+        return f"Assign {node.target.name}:{node.target.ty.short()} =", (node.value,)
+    if isinstance(node, Return):
+        return "Return", (node.value,)
+    if isinstance(node, VarDecl):
+        head = f"VarDecl {node.var.name}:{node.var.ty.short()}"
+        return (head, ()) if node.init is None else (head + " =", (node.init,))
+    if isinstance(node, ExprStmt):
+        return "ExprStmt", (node.expr,)
+    if isinstance(node, If):
+        kids = (node.cond, node.then_body) if node.else_body is None else (node.cond, node.then_body, node.else_body)
+        return "If", kids
+    if isinstance(node, While):
+        return "While", (node.cond, node.body)
+    if isinstance(node, BlockStmt):
+        return "BlockStmt", (node.block,)
+    if isinstance(node, Function):
+        params = ", ".join(f"{p.name}:{p.ty.short()}" for p in node.params)
+        return f"Function {node.name}({params}) -> {node.ret_ty.short()}", (node.body,)
+    kind = "Expr" if isinstance(node, Expr) else "Stmt"
+    return f"Unknown {kind}: {type(node).__name__}", ()
+
+
+def node_label(node) -> str:
+    """节点自己的一行描述（不含子树），诊断里用来指明出错的节点。"""
+    return _label(node)[0]
+
 
+def write_node(node, out: TextIO, level: int = 0, compact: bool = False) -> None:
+    """把 node（Function / 语句 / 块 / 表达式）及其子树写进 out，每行以换行结尾。"""
+    buf: list[str] = []
+    stack: list[tuple[object, int]] = [(node, level)]
+    while stack:
+        n, lv = stack.pop()
+        text, kids = _label(n)
+        buf.append(f"{lv} {text}\n" if compact else f"{_indent(lv)}{text}\n")
+        # 子节点逆序入栈，保证按原顺序输出
+        for k in reversed(kids):
+            stack.append((k, lv + 1))
+        if len(buf) >= _FLUSH_LINES:
+            out.write("".join(buf))
+            buf.clear()
+    if buf:
+        out.write("".join(buf))
 
-def print_stmt(stmt: Stmt, level: int = 0) -> str:
-    if isinstance(stmt, Block):
-        lines: List[str] = [f"{_indent(level)}Block"]
-        for s in stmt.stmts:
-            lines.append(print_stmt(s, level + 1))
-        return "\n".join(lines)
 
-    if isinstance(stmt, Assign):
-        head = f"{_indent(level)}Assign {stmt.target.name}:{stmt.target.ty.short()} ="
-        body = print_expr(stmt.value, level + 1)
-        return f"{head}\n{body}"
+def write_functions(fns: Iterable[Function], out: TextIO, compact: bool = False) -> int:
+    """逐个函数写出，函数之间空一行；返回函数个数。"""
+    n = 0
+    for fn in fns:
+        if n:
+            out.write("\n")
+        write_node(fn, out, compact=compact)
+        n += 1
+    return n
 
-    if isinstance(stmt, Return):
-        head = f"{_indent(level)}Return"
-        body = print_expr(stmt.value, level + 1)
-        return f"{head}\n{body}"
 
-    return f"Unknown Stmt: {type(stmt).__name__}"
+def _to_str(node, level: int, compact: bool) -> str:
+    out = io.StringIO()
+    write_node(node, out, level, compact)
+    return out.getvalue()[:-1]
 
 
-def print_expr(expr: Expr, level: int = 0) -> str:
-    if isinstance(expr, Literal):
-        return f"{_indent(level)}Literal {expr.value} : {expr.ty.short()}"
+def print_function(fn: Function, compact: bool = False) -> str:
+    return _to_str(fn, 0, compact)
 
-    if isinstance(expr, Var):
-        return f"{_indent(level)}Var {expr.name} : {expr.ty.short()}"
 
-    if isinstance(expr, Cast):
-        lines = [
-            f"{_indent(level)}Cast -> {expr.to_ty.short()}",
-            print_expr(expr.expr, level + 1),
-        ]
-        return "\n".join(lines)
+def print_stmt(stmt: Stmt, level: int = 0, compact: bool = False) -> str:
+    return _to_str(stmt, level, compact)
 
-    if isinstance(expr, Binary):
-        lines = [
-            f"{_indent(level)}Binary {expr.op.value} : {expr.ty.short()}",
-            print_expr(expr.lhs, level + 1),
-            print_expr(expr.rhs, level + 1),
-        ]
-        return "\n".join(lines)
 
-    return f"Unknown Expr: {type(expr).__name__}"
+def print_expr(expr: Expr, level: int = 0, compact: bool = False) -> str:
+    return _to_str(expr, level, compact)
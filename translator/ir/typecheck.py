@@ -1,32 +1,45 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterable, Optional
 
-from translator.common.diagnostics import Diagnostic, ErrorCode
+from translator.common.diagnostics import Diagnostic, DiagnosticBag, ErrorCode
 from translator.ir.types import Type
 from translator.ir.nodes import (
     # top-level
     Function, Block,
     # stmts
-    Stmt, VarDecl, Assign, Return, If, While,
+    Stmt, VarDecl, Assign, Return, If, While, BlockStmt,
     # exprs
     Expr, Literal, Var, Cast, Unary, Binary,
     # ops
-    BinOp, UnOp, ExprStmt
+    BinOp, UnOp, ExprStmt,
+    expr_children,
 )
+from translator.ir.flat import (
+    BIN_OPS, UN_OPS, LITERAL, VAR, BINARY, UNARY,
+    S_VARDECL, S_EXPR, S_ASSIGN, S_RETURN, S_IF, S_WHILE,
+    FlatFunction,
+)
+from translator.ir.passes import FunctionPass
+from translator.ir.printer import node_label
 
 # ---- helpers ----
 
+# id(node) -> (node, 类型)；存 node 本身保证 id 不会被复用
+ExprMemo = dict[int, tuple[Expr, Type]]
+
 def _hint(obj: object) -> str:
-    # 轻量 node hint：不依赖复杂位置系统，先把类型/关键字段打出来
+    # 只描述出错的节点本身（不展开子树）；位置信息走 span，显示时才换算行列
+    if isinstance(obj, _FlatRef):
+        return obj.label()
     try:
-        return repr(obj)
+        return node_label(obj)
     except Exception:
         return f"<{type(obj).__name__}>"
 
 def _err(msg: str, node: object) -> Diagnostic:
-    return Diagnostic(ErrorCode.E_INVALID_IR, msg, node_hint=_hint(node))
+    return Diagnostic(ErrorCode.E_INVALID_IR, msg, node_hint=_hint(node), span=getattr(node, "span", None))
 
 def _is_bool(t: Type) -> bool:
     return t.kind == "bool"
@@ -38,162 +51,391 @@ def _is_float(t: Type) -> bool:
     return t.kind == "float"
 
 def _same_type(a: Type, b: Type) -> bool:
-    return a == b
+    # Type 是规范化的（见 types._Interned），同一类型只有一个对象
+    return a is b
 
 def _is_numeric(t: Type) -> bool:
     return _is_int(t) or _is_float(t)
 
+# 收集模式的错误恢复：检查失败的表达式得到 ERROR，
+# 依赖它的节点 / 语句不再检查，避免一个错误连带报出一串
+ERROR = Type(kind="error")
+
+def _rule(diags: DiagnosticBag | None, rule, *args) -> None:
+    """执行一条语句级规则；收集模式下记下诊断继续，输入里有 ERROR 时跳过。"""
+    if diags is None:
+        rule(*args)
+        return
+    if any(a is ERROR for a in args):
+        return
+    try:
+        rule(*args)
+    except Diagnostic as d:
+        diags.add(d)
+
 # ---- public API ----
 
-def typecheck_function(fn: Function) -> None:
+def typecheck_function(fn: Function, diags: DiagnosticBag | None = None, dag: bool = False) -> None:
+    """
+    diags 为 None 时遇到第一个错误就抛 Diagnostic；
+    给了 DiagnosticBag 则是收集模式：错误记进 diags，整个函数检查完（或 diags 满了又丢掉一条）才返回。
+    dag=True 表示 fn 经过了 hash-consing，共享子树只检查一次。
+    """
     # params 是 Var 列表：只检查不重复（可选），以及类型合法性（可选）
     # 目前先不做复杂符号表，最小检查足够。
-    typecheck_block(fn.body, fn_ret_ty=fn.ret_ty)
+    # memo 在整个函数内共享；树形 IR 里没有重复的节点，不用为每个节点记一条
+    typecheck_block(fn.body, fn_ret_ty=fn.ret_ty, memo={} if dag else None, diags=diags)
+
+def collect_diagnostics(fns: Iterable[Function], max_errors: int | None = None,
+                        diags: DiagnosticBag | None = None, dag: bool = False) -> DiagnosticBag:
+    """一遍检查所有函数，返回全部诊断（最多 max_errors 条，丢掉第一条多出来的就停）。"""
+    if diags is None:
+        diags = DiagnosticBag(limit=max_errors)
+    for fn in fns:
+        if diags.truncated:
+            break
+        diags.function = fn.name
+        typecheck_function(fn, diags, dag=dag)
+    diags.function = None
+    return diags
 
-def typecheck_block(block: Block, fn_ret_ty: Type) -> None:
+def typecheck_block(block: Block, fn_ret_ty: Type, memo: ExprMemo | None = None,
+                    diags: DiagnosticBag | None = None) -> None:
     for s in block.stmts:
-        typecheck_stmt(s, fn_ret_ty=fn_ret_ty)
+        if diags is not None and diags.truncated:
+            return
+        typecheck_stmt(s, fn_ret_ty=fn_ret_ty, memo=memo, diags=diags)
 
-def typecheck_stmt(stmt: Stmt, fn_ret_ty: Type) -> None:
+def typecheck_stmt(stmt: Stmt, fn_ret_ty: Type, memo: ExprMemo | None = None,
+                   diags: DiagnosticBag | None = None) -> None:
     if isinstance(stmt, VarDecl):
         # init 的类型必须等于 var.ty，或者 init 是显式 Cast 到 var.ty
         if stmt.init is not None:
-            t = typecheck_expr(stmt.init)
-            if not _same_type(t, stmt.var.ty):
-                raise _err(
-                    f"VarDecl init type mismatch: var {stmt.var.name}:{stmt.var.ty.short()} "
-                    f"but init is {t.short()}",
-                    stmt,
-                )
+            _rule(diags, _check_vardecl, stmt.var.name, stmt.var.ty, typecheck_expr(stmt.init, memo, diags), stmt)
         return
 
     if isinstance(stmt, ExprStmt):
         # 只要 expr 本身能通过 typecheck 就行
-        typecheck_expr(stmt.expr)
+        typecheck_expr(stmt.expr, memo, diags)
         return
     
     if isinstance(stmt, Assign):
-        vt = stmt.target.ty
-        et = typecheck_expr(stmt.value)
-        if not _same_type(vt, et):
-            raise _err(
-                f"Assign type mismatch: target {stmt.target.name}:{vt.short()} "
-                f"but value is {et.short()}",
-                stmt,
-            )
+        _rule(diags, _check_assign, stmt.target.name, stmt.target.ty, typecheck_expr(stmt.value, memo, diags), stmt)
         return
 
     if isinstance(stmt, Return):
-        rt = typecheck_expr(stmt.value)
-        if not _same_type(rt, fn_ret_ty):
-            raise _err(
-                f"Return type mismatch: function returns {fn_ret_ty.short()} "
-                f"but returned expr is {rt.short()}",
-                stmt,
-            )
+        _rule(diags, _check_return, typecheck_expr(stmt.value, memo, diags), fn_ret_ty, stmt)
         return
 
     if isinstance(stmt, If):
-        ct = typecheck_expr(stmt.cond)
-        if not _is_bool(ct):
-            raise _err(f"If condition must be Bool, got {ct.short()}", stmt.cond)
-        typecheck_block(stmt.then_body, fn_ret_ty=fn_ret_ty)
+        _rule(diags, _check_cond, "If", typecheck_expr(stmt.cond, memo, diags), stmt.cond)
+        typecheck_block(stmt.then_body, fn_ret_ty=fn_ret_ty, memo=memo, diags=diags)
         if stmt.else_body is not None:
-            typecheck_block(stmt.else_body, fn_ret_ty=fn_ret_ty)
+            typecheck_block(stmt.else_body, fn_ret_ty=fn_ret_ty, memo=memo, diags=diags)
         return
 
     if isinstance(stmt, While):
-        ct = typecheck_expr(stmt.cond)
-        if not _is_bool(ct):
-            raise _err(f"While condition must be Bool, got {ct.short()}", stmt.cond)
-        typecheck_block(stmt.body, fn_ret_ty=fn_ret_ty)
+        _rule(diags, _check_cond, "While", typecheck_expr(stmt.cond, memo, diags), stmt.cond)
+        typecheck_block(stmt.body, fn_ret_ty=fn_ret_ty, memo=memo, diags=diags)
         return
 
-    raise _err(f"Unknown Stmt node: {type(stmt).__name__}", stmt)
+    if isinstance(stmt, BlockStmt):
+        # for 循环 desugar 出来的作用域块
+        typecheck_block(stmt.block, fn_ret_ty=fn_ret_ty, memo=memo, diags=diags)
+        return
 
-def typecheck_expr(expr: Expr) -> Type:
-    # Literal: value 的 Python 类型不强制（因为 bool 是 int 子类会坑）
-    # 真正的类型以 expr.ty 为准；这里做“基本一致性检查”（可选）
+    d = _err(f"Unknown Stmt node: {type(stmt).__name__}", stmt)
+    if diags is None:
+        raise d
+    diags.add(d)
+
+# ---- 语句级规则（对象 IR 和 FlatFunction 共用；node 只用于报错时的 hint） ----
+
+def _check_vardecl(name: str, var_ty: Type, t: Type, node: object) -> None:
+    if not _same_type(t, var_ty):
+        raise _err(
+            f"VarDecl init type mismatch: var {name}:{var_ty.short()} "
+            f"but init is {t.short()}",
+            node,
+        )
+
+def _check_assign(name: str, vt: Type, et: Type, node: object) -> None:
+    if not _same_type(vt, et):
+        raise _err(
+            f"Assign type mismatch: target {name}:{vt.short()} "
+            f"but value is {et.short()}",
+            node,
+        )
+
+def _check_return(rt: Type, fn_ret_ty: Type, node: object) -> None:
+    if not _same_type(rt, fn_ret_ty):
+        raise _err(
+            f"Return type mismatch: function returns {fn_ret_ty.short()} "
+            f"but returned expr is {rt.short()}",
+            node,
+        )
+
+def _check_cond(what: str, ct: Type, node: object) -> None:
+    if not _is_bool(ct):
+        raise _err(f"{what} condition must be Bool, got {ct.short()}", node)
+
+def typecheck_expr(expr: Expr, memo: ExprMemo | None = None, diags: DiagnosticBag | None = None) -> Type:
+    # 显式栈后序遍历：先算完子表达式的类型，再检查当前节点；
+    # 深度没有限制，报错顺序和逐层递归时一致（左子树 -> 右子树 -> 自身）
+    # memo: id(node) -> (node, 类型)，已经检查过的（共享）子树直接取结果
+    # diags: 收集模式，出错的节点类型记为 ERROR，继续检查兄弟子树
+    types: list[Type] = []
+    stack: list[tuple[Expr, bool]] = [(expr, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if memo is not None and not expanded:
+            hit = memo.get(id(node))
+            if hit is not None and hit[0] is node:
+                types.append(hit[1])
+                continue
+        kids = expr_children(node)
+        if kids and not expanded:
+            stack.append((node, True))
+            for k in reversed(kids):
+                stack.append((k, False))
+            continue
+        if kids:
+            kid_types = types[-len(kids):]
+            del types[-len(kids):]
+        else:
+            kid_types = []
+        if diags is None:
+            t = _check_expr_node(node, kid_types)
+        elif any(k is ERROR for k in kid_types):
+            t = ERROR
+        else:
+            try:
+                t = _check_expr_node(node, kid_types)
+            except Diagnostic as d:
+                diags.add(d)
+                t = ERROR
+        if memo is not None:
+            memo[id(node)] = (node, t)
+        types.append(t)
+    return types[0]
+
+def _check_expr_node(expr: Expr, kid_types: list[Type]) -> Type:
+    """检查单个表达式节点；kid_types 是 expr_children(expr) 已经算好的类型。"""
     if isinstance(expr, Literal):
-        # 可选一致性检查：根据 ty.kind 检查 value 的形态
-        if expr.ty.kind == "bool":
-            if not isinstance(expr.value, bool):
-                # 允许 0/1 吗？建议不允许，避免歧义
-                raise _err(f"Bool literal expects Python bool, got {type(expr.value).__name__}", expr)
-        elif expr.ty.kind == "int":
-            if isinstance(expr.value, bool) or not isinstance(expr.value, int):
-                raise _err(f"Int literal expects Python int, got {type(expr.value).__name__}", expr)
-        elif expr.ty.kind == "float":
-            if not isinstance(expr.value, float):
-                # 允许 int 自动当 float？不建议，保持显式
-                raise _err(f"Float literal expects Python float, got {type(expr.value).__name__}", expr)
-        # 返回其 IR 类型
-        return expr.ty
+        return _check_literal(expr.ty, expr.value, expr)
 
     if isinstance(expr, Var):
         return expr.ty
 
     if isinstance(expr, Cast):
-        inner_t = typecheck_expr(expr.expr)
-        # Cast 的结果类型必须等于 to_ty，并且 expr.ty 也应该等于 to_ty（你的 Cast.__post_init__ 应该保证）
-        if not _same_type(expr.ty, expr.to_ty):
-            raise _err(f"Cast node inconsistent: expr.ty={expr.ty.short()} but to_ty={expr.to_ty.short()}", expr)
-        # 允许哪些 cast？先放宽：numeric/bool 之间后续再收紧
-        # 最小守卫：至少 inner_t 必须是某种可 cast 的类型
-        if inner_t.kind not in ("int", "float", "bool"):
-            raise _err(f"Cast from unsupported type {inner_t.short()} to {expr.to_ty.short()}", expr)
-        return expr.to_ty
+        (inner_t,) = kid_types
+        return _check_cast(expr.ty, expr.to_ty, inner_t, expr)
 
     if isinstance(expr, Unary):
-        ot = typecheck_expr(expr.operand)
-        if expr.op == UnOp.NOT:
-            if not _is_bool(ot) or not _is_bool(expr.ty):
-                raise _err(f"Unary NOT expects Bool -> Bool, got {ot.short()} -> {expr.ty.short()}", expr)
-            return expr.ty
-        raise _err(f"Unknown UnOp {expr.op}", expr)
+        (ot,) = kid_types
+        return _check_unary(expr.op, expr.ty, ot, expr)
 
     if isinstance(expr, Binary):
-        lt = typecheck_expr(expr.lhs)
-        rt = typecheck_expr(expr.rhs)
-
-        # 1) 算术：int/float 同类型 -> 同类型
-        if expr.op in (BinOp.ADD, BinOp.SUB, BinOp.MUL, BinOp.DIV):
-            if not (_is_numeric(lt) and _same_type(lt, rt) and _same_type(expr.ty, lt)):
-                raise _err(
-                    f"Arithmetic expects same numeric types: lhs={lt.short()} rhs={rt.short()} result={expr.ty.short()}",
-                    expr,
-                )
-            return expr.ty
-
-        # 2) 比较：numeric 同类型 -> Bool
-        if expr.op in (BinOp.LT, BinOp.LE, BinOp.GT, BinOp.GE):
-            print(lt)
-            print(rt)
-            if not (_is_numeric(lt) and _same_type(lt, rt) and _is_bool(expr.ty)):
-                raise _err(
-                    f"Comparison expects same numeric types -> Bool: lhs={lt.short()} rhs={rt.short()} result={expr.ty.short()}",
-                    expr,
-                )
-            return expr.ty
-
-        # 3) 相等：同类型（int/float/bool）-> Bool
-        if expr.op in (BinOp.EQ, BinOp.NE):
-            if not (_same_type(lt, rt) and _is_bool(expr.ty) and (lt.kind in ("int", "float", "bool"))):
-                raise _err(
-                    f"Equality expects same (int/float/bool) types -> Bool: lhs={lt.short()} rhs={rt.short()} result={expr.ty.short()}",
-                    expr,
-                )
-            return expr.ty
-
-        # 4) 逻辑：Bool Bool -> Bool
-        if expr.op in (BinOp.LAND, BinOp.LOR):
-            if not (_is_bool(lt) and _is_bool(rt) and _is_bool(expr.ty)):
-                raise _err(
-                    f"Logical expects Bool Bool -> Bool: lhs={lt.short()} rhs={rt.short()} result={expr.ty.short()}",
-                    expr,
-                )
-            return expr.ty
-
-        raise _err(f"Unknown BinOp {expr.op}", expr)
+        lt, rt = kid_types
+        return _check_binary(expr.op, expr.ty, lt, rt, expr)
 
     raise _err(f"Unknown Expr node: {type(expr).__name__}", expr)
+
+# ---- 表达式级规则（对象 IR 和 FlatFunction 共用；node 只用于报错时的 hint） ----
+
+def _check_literal(ty: Type, value, node: object) -> Type:
+    # Literal: value 的 Python 类型不强制（因为 bool 是 int 子类会坑）
+    # 真正的类型以 expr.ty 为准；这里做“基本一致性检查”（可选）
+    if ty.kind == "bool":
+        if not isinstance(value, bool):
+            # 允许 0/1 吗？建议不允许，避免歧义
+            raise _err(f"Bool literal expects Python bool, got {type(value).__name__}", node)
+    elif ty.kind == "int":
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise _err(f"Int literal expects Python int, got {type(value).__name__}", node)
+    elif ty.kind == "float":
+        if not isinstance(value, float):
+            # 允许 int 自动当 float？不建议，保持显式
+            raise _err(f"Float literal expects Python float, got {type(value).__name__}", node)
+    # 返回其 IR 类型
+    return ty
+
+def _check_cast(ty: Type, to_ty: Type, inner_t: Type, node: object) -> Type:
+    # Cast 的结果类型必须等于 to_ty，并且 expr.ty 也应该等于 to_ty（你的 Cast.__post_init__ 应该保证）
+    if not _same_type(ty, to_ty):
+        raise _err(f"Cast node inconsistent: expr.ty={ty.short()} but to_ty={to_ty.short()}", node)
+    # 允许哪些 cast？先放宽：numeric/bool 之间后续再收紧
+    # 最小守卫：至少 inner_t 必须是某种可 cast 的类型
+    if inner_t.kind not in ("int", "float", "bool"):
+        raise _err(f"Cast from unsupported type {inner_t.short()} to {to_ty.short()}", node)
+    return to_ty
+
+def _check_unary(op: UnOp, ty: Type, ot: Type, node: object) -> Type:
+    if op == UnOp.NOT:
+        if not _is_bool(ot) or not _is_bool(ty):
+            raise _err(f"Unary NOT expects Bool -> Bool, got {ot.short()} -> {ty.short()}", node)
+        return ty
+    raise _err(f"Unknown UnOp {op}", node)
+
+def _check_binary(op: BinOp, ty: Type, lt: Type, rt: Type, node: object) -> Type:
+    # 1) 算术：int/float 同类型 -> 同类型
+    if op in (BinOp.ADD, BinOp.SUB, BinOp.MUL, BinOp.DIV):
+        if not (_is_numeric(lt) and _same_type(lt, rt) and _same_type(ty, lt)):
+            raise _err(
+                f"Arithmetic expects same numeric types: lhs={lt.short()} rhs={rt.short()} result={ty.short()}",
+                node,
+            )
+        return ty
+
+    # 2) 比较：numeric 同类型 -> Bool
+    if op in (BinOp.LT, BinOp.LE, BinOp.GT, BinOp.GE):
+        if not (_is_numeric(lt) and _same_type(lt, rt) and _is_bool(ty)):
+            raise _err(
+                f"Comparison expects same numeric types -> Bool: lhs={lt.short()} rhs={rt.short()} result={ty.short()}",
+                node,
+            )
+        return ty
+
+    # 3) 相等：同类型（int/float/bool）-> Bool
+    if op in (BinOp.EQ, BinOp.NE):
+        if not (_same_type(lt, rt) and _is_bool(ty) and (lt.kind in ("int", "float", "bool"))):
+            raise _err(
+                f"Equality expects same (int/float/bool) types -> Bool: lhs={lt.short()} rhs={rt.short()} result={ty.short()}",
+                node,
+            )
+        return ty
+
+    # 4) 逻辑：Bool Bool -> Bool
+    if op in (BinOp.LAND, BinOp.LOR):
+        if not (_is_bool(lt) and _is_bool(rt) and _is_bool(ty)):
+            raise _err(
+                f"Logical expects Bool Bool -> Bool: lhs={lt.short()} rhs={rt.short()} result={ty.short()}",
+                node,
+            )
+        return ty
+
+    raise _err(f"Unknown BinOp {op}", node)
+
+# ---- FlatFunction ----
+
+class _FlatRef:
+    """FlatFunction 里的一个节点；只有报错时才生成描述（和对象 IR 的 node_label 一致）。"""
+
+    __slots__ = ("ff", "kind", "i")
+
+    def __init__(self, ff: FlatFunction, kind: str, i: int):
+        self.ff = ff
+        self.kind = kind
+        self.i = i
+
+    @property
+    def span(self) -> Optional[int]:
+        return self.ff.expr_span(self.i) if self.kind == "expr" else self.ff.stmt_span(self.i)
+
+    def label(self) -> str:
+        ff, i = self.ff, self.i
+        if self.kind == "stmt":
+            op = ff.s_op[i]
+            if op in (S_VARDECL, S_ASSIGN):
+                head = "VarDecl" if op == S_VARDECL else "Assign"
+                tail = " =" if op == S_ASSIGN or ff.s_expr[i] >= 0 else ""
+                return f"{head} {ff.names[ff.s_name[i]]}:{ff.types[ff.s_ty[i]].short()}{tail}"
+            if op == S_RETURN:
+                return "Return"
+            return node_label(ff.stmt(i))
+        op = ff.e_op[i]
+        ty = ff.types[ff.e_ty[i]].short()
+        if op == LITERAL:
+            return f"Literal {ff.literals[ff.e_a[i]]} : {ty}"
+        if op == VAR:
+            return f"Var {ff.names[ff.e_a[i]]} : {ty}"
+        if op == BINARY:
+            return f"Binary {BIN_OPS[ff.e_sub[i]].value} : {ty}"
+        if op == UNARY:
+            return f"Unary {UN_OPS[ff.e_sub[i]].value} : {ty}"
+        return f"Cast -> {ty}"
+
+    def __repr__(self) -> str:
+        return self.label()
+
+def typecheck_flat_function(ff: FlatFunction) -> None:
+    """
+    直接在 FlatFunction 上做和 typecheck_function 一样的检查（报错信息、顺序都相同）。
+    表达式按后序存放、语句按前序存放，所以表达式类型一遍线性扫描就能算完，
+    每条语句只需把扫描推进到自己的表达式为止。
+    """
+    types = ff.types
+    e_op, e_ty, e_sub, e_a, e_b = ff.e_op, ff.e_ty, ff.e_sub, ff.e_a, ff.e_b
+    s_op, s_expr, s_name, s_ty = ff.s_op, ff.s_expr, ff.s_name, ff.s_ty
+    out: list[Type] = []
+
+    def check_upto(root: int) -> Type:
+        for i in range(len(out), root + 1):
+            op = e_op[i]
+            ty = types[e_ty[i]]
+            if op == LITERAL:
+                t = _check_literal(ty, ff.literals[e_a[i]], _FlatRef(ff, "expr", i))
+            elif op == VAR:
+                t = ty
+            elif op == BINARY:
+                t = _check_binary(BIN_OPS[e_sub[i]], ty, out[e_a[i]], out[e_b[i]], _FlatRef(ff, "expr", i))
+            elif op == UNARY:
+                t = _check_unary(UN_OPS[e_sub[i]], ty, out[e_a[i]], _FlatRef(ff, "expr", i))
+            else:
+                t = _check_cast(ty, ty, out[e_a[i]], _FlatRef(ff, "expr", i))
+            out.append(t)
+        return out[root]
+
+    def check_block(k: int) -> None:
+        for i in ff.block_stmts(k):
+            op = s_op[i]
+            e = s_expr[i]
+            if op == S_VARDECL:
+                if e >= 0:
+                    _check_vardecl(ff.names[s_name[i]], types[s_ty[i]], check_upto(e), _FlatRef(ff, "stmt", i))
+            elif op == S_EXPR:
+                check_upto(e)
+            elif op == S_ASSIGN:
+                _check_assign(ff.names[s_name[i]], types[s_ty[i]], check_upto(e), _FlatRef(ff, "stmt", i))
+            elif op == S_RETURN:
+                _check_return(check_upto(e), ff.ret_ty, _FlatRef(ff, "stmt", i))
+            elif op == S_IF:
+                _check_cond("If", check_upto(e), _FlatRef(ff, "expr", e))
+                check_block(ff.s_a[i])
+                if ff.s_b[i] >= 0:
+                    check_block(ff.s_b[i])
+            elif op == S_WHILE:
+                _check_cond("While", check_upto(e), _FlatRef(ff, "expr", e))
+                check_block(ff.s_a[i])
+            else:
+                check_block(ff.s_a[i])
+
+    check_block(0)
+
+# ---- pass manager ----
+
+class TypecheckPass(FunctionPass):
+    """和 typecheck_function 相同的检查（报错信息和顺序一致）。"""
+
+    name = "typecheck"
+
+    def begin_function(self, fn: Function) -> None:
+        self.ret_ty = fn.ret_ty
+
+    # 直接用节点检查函数当钩子，少一层调用
+    expr = staticmethod(_check_expr_node)
+
+    def stmt(self, stmt, results) -> None:
+        if isinstance(stmt, VarDecl):
+            if stmt.init is not None:
+                _check_vardecl(stmt.var.name, stmt.var.ty, results[1], stmt)
+        elif isinstance(stmt, Assign):
+            _check_assign(stmt.target.name, stmt.target.ty, results[1], stmt)
+        elif isinstance(stmt, Return):
+            _check_return(results[0], self.ret_ty, stmt)
+        elif isinstance(stmt, If):
+            _check_cond("If", results[0], stmt.cond)
+        elif isinstance(stmt, While):
+            _check_cond("While", results[0], stmt.cond)
+        elif not isinstance(stmt, (ExprStmt, BlockStmt)):
+            raise _err(f"Unknown Stmt node: {type(stmt).__name__}", stmt)
@@ -1,42 +1,83 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 from enum import Enum
 
 class Signedness(str, Enum):
     SIGNED = "signed"
     UNSIGNED = "unsigned"
 
-@dataclass(frozen=True)
-class Type:
+
+class _Interned(type):
+    """
+    Type 的元类：每种类型全局只有一个实例（规范类型表）。
+
+    Type(...) 先按调用参数查一次快表，未命中时才真正构造，再按
+    (类, 各字段值) 归一化 —— Type("int", 32, SIGNED) 和
+    Type(kind="int", bits=32, signed=SIGNED) 拿到的是同一个对象。
+    以后加的 struct / array / pointer 类型只要继承 Type（字段里引用的子类型
+    本身也是规范的），自动进同一张表。
+    """
+
+    def __call__(cls, *args, **kwargs):
+        call_key = (cls, args, tuple(kwargs.items())) if kwargs else (cls, args)
+        t = _BY_CALL.get(call_key)
+        if t is None:
+            t = super().__call__(*args, **kwargs)
+            key = (cls, *(getattr(t, f.name) for f in fields(t) if f.compare))
+            t = _TABLE.setdefault(key, t)
+            _BY_CALL[call_key] = t
+        return t
+
+
+# (类, 字段值...) -> 规范实例
+_TABLE: dict[tuple, "Type"] = {}
+# 构造参数 -> 规范实例（热路径上省掉构造和归一化）
+_BY_CALL: dict[tuple, "Type"] = {}
+
+
+# 规范化之后相等就是同一个对象，所以 eq=False：== / hash 都按 identity
+@dataclass(frozen=True, slots=True, eq=False)
+class Type(metaclass=_Interned):
     kind: str  # "int" | "bool" | "void"
     bits: int | None = None
     signed: Signedness | None = None
+    _short: str = field(init=False, repr=False, compare=False, default="")
+
+    def __post_init__(self):
+        object.__setattr__(self, "_short", self._compute_short())
+
+    def __reduce__(self):
+        # pickle / copy 回来时重新走规范表（进程池、IR 缓存）
+        return (type(self), tuple(getattr(self, f.name) for f in fields(self) if f.init))
 
     @staticmethod
     def i32() -> Type:
-        return Type(kind="int", bits=32, signed=Signedness.SIGNED)
+        return _I32
 
     @staticmethod
     def u32() -> Type:
-        return Type(kind="int", bits=32, signed=Signedness.UNSIGNED)
-    
+        return _U32
+
     @staticmethod
     def f32() -> "Type":
-        return Type(kind="float", bits=32)
+        return _F32
 
     @staticmethod
     def f64() -> "Type":
-        return Type(kind="float", bits=64)
+        return _F64
 
     @staticmethod
     def bool() -> Type:
-        return Type(kind="bool")
+        return _BOOL
 
     @staticmethod
     def void() -> Type:
-        return Type(kind="void")
+        return _VOID
 
     def short(self) -> str:
+        return self._short
+
+    def _compute_short(self) -> str:
         if self.kind == "int":
             s = "I" if self.signed == Signedness.SIGNED else "U"
             return f"{s}{self.bits}"
@@ -47,3 +88,11 @@ class Type:
         if self.kind == "float":
             return f"F{self.bits}"
         return self.kind
+
+
+_I32 = Type(kind="int", bits=32, signed=Signedness.SIGNED)
+_U32 = Type(kind="int", bits=32, signed=Signedness.UNSIGNED)
+_F32 = Type(kind="float", bits=32)
+_F64 = Type(kind="float", bits=64)
+_BOOL = Type(kind="bool")
+_VOID = Type(kind="void")